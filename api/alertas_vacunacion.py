@@ -0,0 +1,146 @@
+"""
+Alertas de vacunación paginadas por keyset.
+
+Las alertas son las filas de la proyección EstadoVacunaMascota (una por
+mascota y vacuna) en estado de alerta, ordenadas por (proxima_fecha,
+historial_id); el `id` de cada alerta es el del registro vigente del
+historial. En lugar de OFFSET, cada página continúa desde la última clave de
+la anterior (`cursor`), así que la página 200 cuesta lo mismo que la primera:
+el índice parcial estado_vacuna_alertas_idx (solo filas en alerta, con esas
+dos columnas como clave) se recorre desde ese punto.
+Los totales salen de una única consulta con agregados condicionales.
+"""
+
+import base64
+import uuid
+from datetime import date
+
+from django.db.models import Count, Q
+
+from .models import EstadoVacunaMascota
+
+ESTADOS_ALERTA = ('vencida', 'vencida_reinicio', 'proxima')
+ESTADOS_DEFECTO = ('vencida', 'proxima')
+LIMITE_DEFECTO = 50
+LIMITE_MAXIMO = 200
+
+CAMPOS = (
+    'historial_id', 'proxima_fecha', 'dosis_numero', 'estado', 'es_obligatoria', 'fecha_aplicacion',
+    'mascota_id', 'mascota__nombreMascota', 'mascota__especie',
+    'mascota__responsable__nombres', 'mascota__responsable__apellidos', 'mascota__responsable__telefono',
+    'vacuna_id', 'vacuna__nombre',
+    'historial__veterinario__trabajador__nombres', 'historial__veterinario__trabajador__apellidos',
+)
+
+
+class FiltroInvalido(ValueError):
+    """Parámetro de filtro o cursor con formato inválido"""
+
+    def __init__(self, parametro, mensaje):
+        self.parametro = parametro
+        super().__init__(mensaje)
+
+
+def codificar_cursor(proxima_fecha, historial_id):
+    valor = f'{proxima_fecha.isoformat()}|{historial_id}'
+    return base64.urlsafe_b64encode(valor.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    try:
+        fecha, historial_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return date.fromisoformat(fecha), uuid.UUID(historial_id)
+    except (ValueError, UnicodeDecodeError):
+        raise FiltroInvalido('cursor', 'Cursor de paginación inválido')
+
+
+def _uuid(parametro, valor):
+    try:
+        return uuid.UUID(valor)
+    except ValueError:
+        raise FiltroInvalido(parametro, f'{parametro} debe ser un UUID válido')
+
+
+def filtrar_alertas(params):
+    """
+    Queryset base (sin cursor) con los filtros del servidor:
+    estado (separados por coma), especie, vacuna, veterinario y es_obligatoria.
+    """
+    estados = ESTADOS_DEFECTO
+    if params.get('estado'):
+        estados = tuple(e.strip() for e in params['estado'].split(',') if e.strip())
+        invalidos = [e for e in estados if e not in ESTADOS_ALERTA]
+        if invalidos or not estados:
+            raise FiltroInvalido('estado', f'Estados válidos: {", ".join(ESTADOS_ALERTA)}')
+
+    qs = EstadoVacunaMascota.objects.filter(estado__in=estados, historial__isnull=False)
+
+    if params.get('especie'):
+        qs = qs.filter(mascota__especie__iexact=params['especie'])
+    if params.get('vacuna'):
+        qs = qs.filter(vacuna_id=_uuid('vacuna', params['vacuna']))
+    if params.get('veterinario'):
+        qs = qs.filter(historial__veterinario_id=_uuid('veterinario', params['veterinario']))
+    obligatoria = params.get('es_obligatoria')
+    if obligatoria:
+        if obligatoria.lower() not in ('true', 'false', '1', '0'):
+            raise FiltroInvalido('es_obligatoria', 'es_obligatoria debe ser true o false')
+        qs = qs.filter(es_obligatoria=obligatoria.lower() in ('true', '1'))
+    return qs
+
+
+def totales(qs):
+    """Totales del filtro completo en una sola consulta"""
+    return qs.order_by().aggregate(
+        total_alertas=Count('id'),
+        vencidas=Count('id', filter=Q(estado='vencida')),
+        vencidas_reinicio=Count('id', filter=Q(estado='vencida_reinicio')),
+        proximas=Count('id', filter=Q(estado='proxima')),
+        obligatorias=Count('id', filter=Q(es_obligatoria=True)),
+        mascotas_requieren_atencion=Count('mascota_id', distinct=True),
+    )
+
+
+def pagina(qs, cursor=None, limite=LIMITE_DEFECTO):
+    """
+    Devuelve (filas, siguiente_cursor). Pide limite + 1 filas para saber si hay
+    más páginas sin un COUNT adicional.
+    """
+    if cursor:
+        fecha, historial_id = decodificar_cursor(cursor)
+        # (proxima_fecha, historial_id) > cursor escrito como un rango sobre el índice
+        qs = qs.filter(proxima_fecha__gte=fecha).exclude(proxima_fecha=fecha, historial_id__lte=historial_id)
+
+    filas = list(qs.order_by('proxima_fecha', 'historial_id').values(*CAMPOS)[:limite + 1])
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = codificar_cursor(filas[-1]['proxima_fecha'], filas[-1]['historial_id'])
+
+    hoy = date.today()
+    return [_alerta(fila, hoy) for fila in filas], siguiente
+
+
+def _alerta(fila, hoy):
+    dias_restantes = (fila['proxima_fecha'] - hoy).days
+    vencida = dias_restantes < 0
+    nombres_vet = fila['historial__veterinario__trabajador__nombres']
+    return {
+        'id': str(fila['historial_id']),
+        'mascota_id': str(fila['mascota_id']),
+        'mascota_nombre': fila['mascota__nombreMascota'],
+        'mascota_especie': fila['mascota__especie'],
+        'vacuna_id': str(fila['vacuna_id']),
+        'vacuna_nombre': fila['vacuna__nombre'],
+        'es_obligatoria': fila['es_obligatoria'],
+        'fecha_aplicacion': fila['fecha_aplicacion'],
+        'proxima_fecha': fila['proxima_fecha'],
+        'dias_restantes': dias_restantes,
+        'estado': fila['estado'],
+        'prioridad': 'alta' if vencida else 'media',
+        'dosis_numero': fila['dosis_numero'],
+        'responsable_nombre': f"{fila['mascota__responsable__nombres']} {fila['mascota__responsable__apellidos']}",
+        'responsable_telefono': fila['mascota__responsable__telefono'],
+        'veterinario_nombre': f"{nombres_vet} {fila['historial__veterinario__trabajador__apellidos']}" if nombres_vet else None,
+        'color': 'red' if vencida else 'yellow',
+    }
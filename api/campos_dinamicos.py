@@ -0,0 +1,112 @@
+"""
+Campos dinámicos (`?fields=` / `?omit=`) con poda de la consulta.
+
+`CamposDinamicosMixin` quita del serializer los campos no solicitados en las
+lecturas (GET). `PodaCamposFilter`, registrado como filtro por defecto de DRF,
+ajusta además el queryset del listado o detalle: select_related solo de las
+relaciones que leen los campos que quedan y only() de sus columnas. Cada
+serializer declara en CAMPOS_CONSULTA las rutas que usan sus campos calculados
+(SerializerMethodField); los campos con `source` simple se resuelven solos. Si
+algún campo no se puede resolver (None, propiedades, anidados) se mantiene el
+queryset original.
+
+    GET /api/mascotas/?fields=id,nombreMascota,especie,nombrecompletoResponsable
+    GET /api/veterinarios/?omit=horarios_trabajo,dias_trabajo
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.permissions import SAFE_METHODS
+
+PARAMETRO_CAMPOS = 'fields'
+PARAMETRO_OMITIR = 'omit'
+
+
+def _lista(valor):
+    return {c.strip() for c in valor.split(',') if c.strip()} if valor else None
+
+
+def campos_solicitados(request):
+    """(campos, omitir) de la query string; (None, None) si no aplica al request"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    params = getattr(request, 'query_params', request.GET)
+    return _lista(params.get(PARAMETRO_CAMPOS)), _lista(params.get(PARAMETRO_OMITIR))
+
+
+def _ruta_modelo(modelo, source):
+    """Ruta ORM ('a__b') de un source con columnas propias, o None si no es una columna"""
+    partes = source.split('.')
+    for i, parte in enumerate(partes):
+        try:
+            campo = modelo._meta.get_field(parte)
+        except FieldDoesNotExist:
+            return None
+        if not campo.concrete or campo.many_to_many:
+            return None
+        if i < len(partes) - 1:
+            if not campo.is_relation:
+                return None
+            modelo = campo.related_model
+    return '__'.join(partes)
+
+
+class CamposDinamicosMixin:
+    """
+    Serializer con `?fields=` / `?omit=`. También acepta los argumentos
+    `campos` y `omitir` al instanciarlo desde código.
+    """
+    # campo -> rutas ORM que lee; () si solo necesita la PK, None si no se puede podar
+    CAMPOS_CONSULTA = {}
+
+    def __init__(self, *args, **kwargs):
+        campos = kwargs.pop('campos', None)
+        omitir = kwargs.pop('omitir', None)
+        super().__init__(*args, **kwargs)
+        if campos is None and omitir is None:
+            campos, omitir = campos_solicitados(self.context.get('request'))
+        for nombre in list(self.fields):
+            if (campos is not None and nombre not in campos) or (omitir and nombre in omitir):
+                self.fields.pop(nombre)
+
+    @classmethod
+    def optimizar_queryset(cls, queryset, request):
+        campos, omitir = campos_solicitados(request)
+        if campos is None and omitir is None:
+            return queryset
+
+        modelo = queryset.model
+        solo, relaciones = {modelo._meta.pk.name}, set()
+        # Columnas del orden: la paginación por cursor las lee de cada página
+        from .paginacion import clave_orden
+        solo.update(campo.name for campo, _ in clave_orden(queryset) or ())
+        for nombre, campo in cls(context={'request': request}).fields.items():
+            if nombre in cls.CAMPOS_CONSULTA:
+                rutas = cls.CAMPOS_CONSULTA[nombre]
+            else:
+                ruta = _ruta_modelo(modelo, campo.source) if campo.source != '*' else None
+                rutas = (ruta,) if ruta else None
+            if rutas is None:
+                return queryset
+            for ruta in rutas:
+                partes = ruta.split('__')
+                relaciones.update('__'.join(partes[:i]) for i in range(1, len(partes)))
+                solo.add(ruta)
+
+        return queryset.select_related(None).prefetch_related(None).select_related(*relaciones).only(*solo)
+
+
+def optimizar_queryset(queryset, request, serializer_class):
+    """Poda el queryset si lo serializa un CamposDinamicosMixin de su mismo modelo"""
+    meta = getattr(serializer_class, 'Meta', None)
+    if (not hasattr(serializer_class, 'optimizar_queryset') or not hasattr(queryset, 'model')
+            or getattr(meta, 'model', None) is not queryset.model):
+        return queryset
+    return serializer_class.optimizar_queryset(queryset, request)
+
+
+class PodaCamposFilter(BaseFilterBackend):
+    """Aplica la poda de CamposDinamicosMixin al queryset de la vista"""
+
+    def filter_queryset(self, request, queryset, view):
+        return optimizar_queryset(queryset, request, view.get_serializer_class())
@@ -0,0 +1,135 @@
+"""
+Motor de conflictos de horario para citas.
+
+Carga una sola vez las citas activas de un veterinario en un día (junto con su
+servicio) y construye un índice ordenado de intervalos ocupados [inicio, fin)
+en minutos desde la medianoche. El intervalo incluye el tiempo de preparación
+(antes de la hora de la cita) y el de limpieza (después de la atención).
+
+Las consultas de solapamiento se resuelven con búsqueda binaria sobre los
+inicios más un máximo acumulado de los fines, sin volver a consultar la BD.
+"""
+
+from bisect import bisect_left
+
+from .choices import EstadoCita
+from .models import Cita
+
+# Estados que ocupan la agenda del veterinario
+ESTADOS_ACTIVOS = (EstadoCita.PENDIENTE, EstadoCita.CONFIRMADA, EstadoCita.REPROGRAMADA)
+
+
+def a_minutos(hora):
+    """Convierte un datetime.time a minutos desde la medianoche"""
+    return hora.hour * 60 + hora.minute + hora.second / 60
+
+
+def intervalo_servicio(hora, servicio):
+    """
+    Intervalo ocupado por un servicio que inicia a `hora`:
+    [hora - preparación, hora + duración + limpieza)
+    """
+    inicio = a_minutos(hora)
+    return (
+        inicio - (servicio.tiempo_preparacion or 0),
+        inicio + (servicio.duracion_minutos or 0) + (servicio.tiempo_limpieza or 0)
+    )
+
+
+class IndiceIntervalos:
+    """
+    Índice inmutable de intervalos [inicio, fin) ordenados por inicio.
+
+    `max_fin[i]` es el mayor fin entre los intervalos 0..i, lo que permite
+    saber en O(log n) si existe algún solapamiento aunque los intervalos
+    almacenados se solapen entre sí.
+    """
+
+    def __init__(self, intervalos):
+        # intervalos: iterable de (inicio, fin, dato)
+        ordenados = sorted(intervalos, key=lambda x: (x[0], x[1]))
+        self.inicios = [i[0] for i in ordenados]
+        self.fines = [i[1] for i in ordenados]
+        self.datos = [i[2] for i in ordenados]
+        self.max_fin = []
+        acumulado = float('-inf')
+        for fin in self.fines:
+            acumulado = max(acumulado, fin)
+            self.max_fin.append(acumulado)
+
+    def __len__(self):
+        return len(self.inicios)
+
+    def hay_solapamiento(self, inicio, fin):
+        """True si algún intervalo del índice se solapa con [inicio, fin)"""
+        limite = bisect_left(self.inicios, fin)
+        return limite > 0 and self.max_fin[limite - 1] > inicio
+
+    def solapamientos(self, inicio, fin):
+        """Datos de los intervalos que se solapan con [inicio, fin), en orden"""
+        resultado = []
+        i = bisect_left(self.inicios, fin) - 1
+        while i >= 0 and self.max_fin[i] > inicio:
+            if self.fines[i] > inicio:
+                resultado.append(self.datos[i])
+            i -= 1
+        resultado.reverse()
+        return resultado
+
+
+class AgendaDia:
+    """Citas activas de un veterinario en una fecha, indexadas por intervalo"""
+
+    def __init__(self, veterinario, fecha, excluir_cita_id=None):
+        self.veterinario = veterinario
+        self.fecha = fecha
+
+        citas = Cita.objects.filter(
+            veterinario=veterinario,
+            fecha=fecha,
+            estado__in=ESTADOS_ACTIVOS
+        ).select_related('servicio', 'mascota')
+        if excluir_cita_id:
+            citas = citas.exclude(id=excluir_cita_id)
+
+        intervalos = []
+        for cita in citas:
+            # Las citas cuyo servicio admite solapamiento no bloquean la agenda
+            if cita.servicio.permite_overlap:
+                continue
+            inicio, fin = intervalo_servicio(cita.hora, cita.servicio)
+            intervalos.append((inicio, fin, cita))
+        self.indice = IndiceIntervalos(intervalos)
+
+    def conflictos(self, hora, servicio=None, duracion_minutos=None):
+        """
+        Citas que chocan con una nueva cita a `hora`.
+        Con servicio se usa su intervalo completo; sin servicio, [hora, hora + duracion_minutos).
+        """
+        if servicio is not None:
+            if servicio.permite_overlap:
+                return []
+            inicio, fin = intervalo_servicio(hora, servicio)
+        else:
+            inicio = a_minutos(hora)
+            fin = inicio + (duracion_minutos or 0)
+        return self.indice.solapamientos(inicio, fin)
+
+    def tiene_conflicto(self, hora, servicio):
+        if servicio.permite_overlap:
+            return False
+        return self.indice.hay_solapamiento(*intervalo_servicio(hora, servicio))
+
+
+def respuesta_conflicto(cita_conflicto):
+    """Cuerpo de error estándar para un conflicto de horario (HTTP 409)"""
+    return {
+        'error': f'El veterinario ya tiene una cita a las {cita_conflicto.hora}',
+        'error_code': 'TIME_CONFLICT',
+        'cita_existente': {
+            'id': str(cita_conflicto.id),
+            'hora': str(cita_conflicto.hora),
+            'servicio': cita_conflicto.servicio.nombre,
+            'mascota': cita_conflicto.mascota.nombreMascota
+        }
+    }
@@ -0,0 +1,108 @@
+"""
+Contexto del usuario autenticado por request.
+
+`JWTAuthenticationContexto` reemplaza a la autenticación JWT de simplejwt:
+carga el usuario junto con su trabajador, veterinario y especialidad en una
+sola consulta select_related y deja el resultado en `request.contexto`. Las
+vistas usan `obtener_contexto(request)` en lugar de recorrer
+`request.user.trabajador.veterinario` (una consulta por cada salto).
+"""
+
+from dataclasses import dataclass
+
+from django.core.exceptions import ObjectDoesNotExist
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .choices import Rol
+
+RELACIONES = ('trabajador__veterinario__especialidad',)
+
+
+@dataclass(frozen=True)
+class ContextoUsuario:
+    """Usuario autenticado con su trabajador, veterinario y especialidad ya resueltos"""
+    usuario: object
+    trabajador: object = None
+    veterinario: object = None
+
+    @property
+    def especialidad(self):
+        return self.veterinario.especialidad if self.veterinario else None
+
+    @property
+    def rol(self):
+        return (self.usuario.rol or '').lower() if self.usuario else ''
+
+    @property
+    def es_veterinario(self):
+        return self.rol == Rol.VETERINARIO
+
+
+def _relacion(objeto, nombre):
+    """Relación inversa uno a uno cargada por select_related (None si no existe)"""
+    try:
+        return getattr(objeto, nombre) if objeto is not None else None
+    except ObjectDoesNotExist:
+        return None
+
+
+def construir_contexto(usuario):
+    trabajador = _relacion(usuario, 'trabajador')
+    return ContextoUsuario(usuario, trabajador, _relacion(trabajador, 'veterinario'))
+
+
+def cargar_usuario(usuario_id):
+    from .models import Usuario
+    return Usuario.objects.select_related(*RELACIONES).get(id=usuario_id)
+
+
+def obtener_contexto(request):
+    """
+    Contexto del request. Si la autenticación no lo dejó (ej. sesión o
+    force_authenticate en pruebas), lo resuelve una vez con una consulta.
+    """
+    contexto = getattr(request, 'contexto', None)
+    if contexto is None or contexto.usuario is not request.user:
+        usuario = request.user
+        if usuario is not None and usuario.is_authenticated:
+            usuario = cargar_usuario(usuario.pk)
+        contexto = construir_contexto(usuario)
+        request.contexto = contexto
+    return contexto
+
+
+class JWTAuthenticationContexto(JWTAuthentication):
+    """JWTAuthentication que resuelve usuario, trabajador, veterinario y especialidad en una consulta"""
+
+    def authenticate(self, request):
+        resultado = super().authenticate(request)
+        if resultado is not None:
+            # En el HttpRequest subyacente: visible también desde request.contexto en DRF
+            request._request.contexto = construir_contexto(resultado[0])
+        return resultado
+
+    def get_user(self, validated_token):
+        """Igual que JWTAuthentication.get_user, con las relaciones del contexto en la misma consulta"""
+        try:
+            usuario_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('El token no contiene un identificador de usuario reconocible')
+
+        try:
+            usuario = self.user_model.objects.select_related(*RELACIONES).get(
+                **{api_settings.USER_ID_FIELD: usuario_id}
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed('Usuario no encontrado', code='user_not_found')
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not usuario.is_active:
+            raise AuthenticationFailed('Usuario inactivo', code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(usuario.password):
+                raise AuthenticationFailed('La contraseña del usuario cambió', code='password_changed')
+
+        return usuario
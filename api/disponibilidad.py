@@ -0,0 +1,338 @@
+"""
+Motor de disponibilidad basado en mapas de bits.
+
+Cada día de un veterinario se representa como un entero de 288 bits (gránulos
+de 5 minutos): el bit i está encendido si el intervalo [i*5, i*5+5) minutos
+está libre. El mapa se construye a partir del HorarioTrabajo (jornada menos
+descanso) restando los intervalos de las citas activas (con preparación y
+limpieza, igual que el motor de conflictos).
+
+Los mapas se guardan en la caché de Django por (veterinario, fecha). Cada
+veterinario tiene un número de versión que forma parte de la clave; los
+signals de Cita y HorarioTrabajo (del veterinario anterior y del nuevo si se
+reasignan) y los cambios de duración de un Servicio lo incrementan al
+confirmar la transacción, invalidando todos sus días. La versión es un contador en la BD (VersionCache,
+ver api/versiones.py), así que la invalidación la ven todos los procesos
+aunque cada uno tenga su propia caché local.
+
+Buscar huecos para un servicio es una serie de AND/desplazamientos sobre el
+entero, sin consultas a la BD.
+"""
+
+import uuid
+from datetime import timedelta
+
+from django.core.cache import cache
+
+from . import versiones
+from .conflictos import ESTADOS_ACTIVOS, a_minutos
+from .models import Cita, HorarioTrabajo
+from .slots import horario_vigente
+
+GRANULO_MINUTOS = 5
+GRANULOS_DIA = 24 * 60 // GRANULO_MINUTOS
+MAPA_VACIO = 0
+
+# Los mapas se invalidan por versión; el TTL solo limita la memoria usada
+CACHE_TIMEOUT_MAPAS = 60 * 60
+
+
+def _bits(desde, hasta):
+    """Máscara con los gránulos [desde, hasta) encendidos"""
+    desde = max(desde, 0)
+    hasta = min(hasta, GRANULOS_DIA)
+    if hasta <= desde:
+        return 0
+    return ((1 << (hasta - desde)) - 1) << desde
+
+
+def _granulos_contenidos(inicio_min, fin_min):
+    """Gránulos completamente dentro de [inicio_min, fin_min)"""
+    return _bits(-(-int(inicio_min) // GRANULO_MINUTOS), int(fin_min) // GRANULO_MINUTOS)
+
+
+def _granulos_tocados(inicio_min, fin_min):
+    """Gránulos que se solapan con [inicio_min, fin_min)"""
+    return _bits(int(inicio_min) // GRANULO_MINUTOS, -(-int(fin_min) // GRANULO_MINUTOS))
+
+
+def mapa_jornada(horario, fecha=None):
+    """Mapa de la jornada de un HorarioTrabajo menos su descanso"""
+    if fecha is not None and not horario_vigente(horario, fecha):
+        return MAPA_VACIO
+    mapa = _granulos_contenidos(a_minutos(horario.hora_inicio), a_minutos(horario.hora_fin))
+    if horario.tiene_descanso and horario.hora_inicio_descanso and horario.hora_fin_descanso:
+        mapa &= ~_granulos_tocados(
+            a_minutos(horario.hora_inicio_descanso), a_minutos(horario.hora_fin_descanso)
+        )
+    return mapa
+
+
+def granulos_necesarios(duracion_minutos):
+    return max(1, -(-int(duracion_minutos) // GRANULO_MINUTOS))
+
+
+def inicios_libres(mapa, duracion_minutos):
+    """
+    Máscara de los gránulos donde comienza un bloque libre de `duracion_minutos`.
+    Usa duplicación: tras cada paso, el bit i indica un bloque libre de
+    longitud `cubierto` empezando en i.
+    """
+    restante = granulos_necesarios(duracion_minutos)
+    resultado = mapa
+    cubierto = 1
+    # resultado cubre `cubierto` gránulos; se duplica hasta alcanzar lo necesario
+    while cubierto * 2 <= restante:
+        resultado &= resultado >> cubierto
+        cubierto *= 2
+    if cubierto < restante:
+        resultado &= resultado >> (restante - cubierto)
+    return resultado
+
+
+def bloque_libre(mapa, inicio_min, fin_min):
+    """True si todo el intervalo [inicio_min, fin_min) está libre"""
+    bloque = _granulos_tocados(inicio_min, fin_min)
+    return bloque != 0 and mapa & bloque == bloque
+
+
+def posiciones(mascara):
+    """Índices de los bits encendidos, de menor a mayor"""
+    resultado = []
+    while mascara:
+        bajo = mascara & -mascara
+        resultado.append(bajo.bit_length() - 1)
+        mascara ^= bajo
+    return resultado
+
+
+def intervalos_libres(mapa):
+    """Lista de (inicio_min, fin_min) de los tramos libres consecutivos"""
+    intervalos = []
+    i = 0
+    while mapa >> i:
+        resto = mapa >> i
+        # Saltar gránulos ocupados
+        salto = (resto & -resto).bit_length() - 1
+        i += salto
+        resto >>= salto
+        # Longitud del tramo libre = cantidad de unos consecutivos
+        largo = (~resto & (resto + 1)).bit_length() - 1
+        intervalos.append((i * GRANULO_MINUTOS, (i + largo) * GRANULO_MINUTOS))
+        i += largo
+    return intervalos
+
+
+def huecos_servicio(mapa, servicio):
+    """
+    Horas de inicio (en minutos) donde cabe el servicio completo:
+    [hora - preparación, hora + duración + limpieza) debe estar libre.
+    """
+    preparacion = servicio.tiempo_preparacion or 0
+    total = preparacion + (servicio.duracion_minutos or 0) + (servicio.tiempo_limpieza or 0)
+    return [p * GRANULO_MINUTOS + preparacion for p in posiciones(inicios_libres(mapa, total))]
+
+
+# ========================================
+# CACHÉ E INVALIDACIÓN
+# ========================================
+
+def _clave_version(veterinario_id):
+    return f'disponibilidad:{veterinario_id}'
+
+
+def _clave_mapa(veterinario_id, fecha, version):
+    return f'disponibilidad:mapa:{veterinario_id}:{fecha.isoformat()}:{version}'
+
+
+def _normalizar_ids(veterinario_ids):
+    return [v if isinstance(v, uuid.UUID) else uuid.UUID(str(v)) for v in veterinario_ids]
+
+
+def invalidar_veterinario(veterinario_id):
+    """Invalida todos los mapas cacheados de un veterinario (en todos los procesos)"""
+    versiones.incrementar(_clave_version(veterinario_id))
+
+
+def construir_mapas(veterinario_ids, fecha_desde, fecha_hasta):
+    """
+    Construye los mapas de todos los veterinarios y días del rango con dos
+    consultas (horarios y citas). Devuelve {(veterinario_id, fecha): mapa}.
+    """
+    veterinario_ids = _normalizar_ids(veterinario_ids)
+    horarios = {}
+    for horario in HorarioTrabajo.objects.filter(veterinario_id__in=veterinario_ids, activo=True):
+        horarios.setdefault((horario.veterinario_id, horario.dia_semana), horario)
+
+    mapas = {}
+    fecha = fecha_desde
+    while fecha <= fecha_hasta:
+        for veterinario_id in veterinario_ids:
+            horario = horarios.get((veterinario_id, fecha.weekday()))
+            mapas[(veterinario_id, fecha)] = mapa_jornada(horario, fecha) if horario else MAPA_VACIO
+        fecha += timedelta(days=1)
+
+    citas = Cita.objects.filter(
+        veterinario_id__in=veterinario_ids,
+        fecha__range=(fecha_desde, fecha_hasta),
+        estado__in=ESTADOS_ACTIVOS,
+        servicio__permite_overlap=False
+    ).values_list(
+        'veterinario_id', 'fecha', 'hora',
+        'servicio__duracion_minutos', 'servicio__tiempo_preparacion', 'servicio__tiempo_limpieza'
+    )
+    for veterinario_id, fecha, hora, duracion, preparacion, limpieza in citas:
+        clave = (veterinario_id, fecha)
+        if mapas.get(clave):
+            inicio = a_minutos(hora)
+            mapas[clave] &= ~_granulos_tocados(
+                inicio - (preparacion or 0), inicio + (duracion or 0) + (limpieza or 0)
+            )
+    return mapas
+
+
+def obtener_mapas(veterinario_ids, fecha_desde, fecha_hasta):
+    """
+    Mapas de disponibilidad del rango, desde la caché cuando es posible.
+    Solo se reconstruyen (en bloque) los veterinarios con algún día faltante.
+    """
+    veterinario_ids = _normalizar_ids(veterinario_ids)
+    version_actual = versiones.versiones([_clave_version(v) for v in veterinario_ids])
+
+    claves = {}
+    fecha = fecha_desde
+    while fecha <= fecha_hasta:
+        for veterinario_id in veterinario_ids:
+            version = version_actual[_clave_version(veterinario_id)]
+            claves[_clave_mapa(veterinario_id, fecha, version)] = (veterinario_id, fecha)
+        fecha += timedelta(days=1)
+
+    cacheados = cache.get_many(list(claves))
+    mapas = {claves[k]: v for k, v in cacheados.items()}
+
+    faltantes = {v for k, (v, f) in claves.items() if k not in cacheados}
+    if faltantes:
+        nuevos = construir_mapas(faltantes, fecha_desde, fecha_hasta)
+        mapas.update(nuevos)
+        cache.set_many(
+            {k: nuevos[c] for k, c in claves.items() if c in nuevos},
+            CACHE_TIMEOUT_MAPAS
+        )
+    return mapas
+
+
+def obtener_mapa(veterinario_id, fecha):
+    veterinario_id = _normalizar_ids([veterinario_id])[0]
+    return obtener_mapas([veterinario_id], fecha, fecha)[(veterinario_id, fecha)]
+
+
+# ========================================
+# BÚSQUEDA DEL PRÓXIMO HUECO DISPONIBLE
+# ========================================
+
+# Los mapas se piden por bloques para poder detenerse apenas hay resultados
+DIAS_POR_BLOQUE = 7
+
+
+def _mascara_inicio(minutos, preparacion):
+    """Bit de inicio de bloque para una cita a `minutos` (0 si cae fuera de la grilla)"""
+    inicio = minutos - preparacion
+    if inicio < 0 or inicio % GRANULO_MINUTOS:
+        return 0
+    return 1 << int(inicio // GRANULO_MINUTOS)
+
+
+def primer_hueco(mapa, servicio, minuto_minimo=0, permitidos=None):
+    """
+    Hora (en minutos) más temprana >= minuto_minimo donde cabe el servicio,
+    o None. `permitidos` restringe los inicios de bloque posibles (máscara).
+    """
+    preparacion = servicio.tiempo_preparacion or 0
+    total = preparacion + (servicio.duracion_minutos or 0) + (servicio.tiempo_limpieza or 0)
+    inicios = inicios_libres(mapa, total)
+    if minuto_minimo:
+        desde = max(0, -(-int(minuto_minimo - preparacion) // GRANULO_MINUTOS))
+        inicios &= ~((1 << desde) - 1)
+    if permitidos is not None:
+        inicios &= permitidos
+    if not inicios:
+        return None
+    return ((inicios & -inicios).bit_length() - 1) * GRANULO_MINUTOS + preparacion
+
+
+def _inicios_con_consultorio(servicio, veterinario_ids, fecha_desde, fecha_hasta):
+    """
+    Para servicios con requiere_consultorio_especial: máscara de inicios
+    permitidos según los SlotTiempo libres con consultorio abierto asignado
+    (y habilitados para el servicio), por (veterinario, fecha). Una consulta.
+    """
+    from django.db.models import Q
+    from django.utils import timezone
+    from .choices import Disponibilidad
+    from .models import SlotTiempo
+
+    preparacion = servicio.tiempo_preparacion or 0
+    mascaras = {}
+    slots = SlotTiempo.objects.filter(
+        fecha__range=(fecha_desde, fecha_hasta),
+        disponible=True,
+        veterinario_id__in=veterinario_ids,
+        consultorio__disponible=Disponibilidad.ABIERTO
+    ).filter(
+        Q(reservado_hasta__isnull=True) | Q(reservado_hasta__lt=timezone.now()),
+        Q(servicio_permitido__isnull=True) | Q(servicio_permitido=servicio)
+    ).values_list('veterinario_id', 'fecha', 'hora_inicio')
+    for veterinario_id, fecha, hora_inicio in slots:
+        clave = (veterinario_id, fecha)
+        mascaras[clave] = mascaras.get(clave, 0) | _mascara_inicio(a_minutos(hora_inicio), preparacion)
+    return mascaras
+
+
+def buscar_proximos(servicio, veterinario_ids, fecha_desde, limite=5, horizonte_dias=60, minuto_minimo=0):
+    """
+    Primeros `limite` huecos donde cabe el servicio completo, avanzando día a
+    día sobre todos los veterinarios. Se devuelve como máximo un hueco (el más
+    temprano) por veterinario y día, ordenados por (fecha, hora).
+
+    `minuto_minimo` descarta las horas anteriores en el primer día (ej. ahora).
+    Devuelve una lista de (fecha, minutos, veterinario_id).
+    """
+    veterinario_ids = _normalizar_ids(veterinario_ids)
+    resultados = []
+    if not veterinario_ids or limite <= 0:
+        return resultados
+
+    fecha_fin = fecha_desde + timedelta(days=horizonte_dias - 1)
+    bloque_desde = fecha_desde
+    while bloque_desde <= fecha_fin and len(resultados) < limite:
+        bloque_hasta = min(bloque_desde + timedelta(days=DIAS_POR_BLOQUE - 1), fecha_fin)
+        mapas = obtener_mapas(veterinario_ids, bloque_desde, bloque_hasta)
+        con_consultorio = None
+        if servicio.requiere_consultorio_especial:
+            con_consultorio = _inicios_con_consultorio(servicio, veterinario_ids, bloque_desde, bloque_hasta)
+
+        fecha = bloque_desde
+        while fecha <= bloque_hasta and len(resultados) < limite:
+            del_dia = []
+            for veterinario_id in veterinario_ids:
+                mapa = mapas[(veterinario_id, fecha)]
+                if not mapa:
+                    continue
+                permitidos = None
+                if con_consultorio is not None:
+                    permitidos = con_consultorio.get((veterinario_id, fecha), 0)
+                    if not permitidos:
+                        continue
+                minutos = primer_hueco(
+                    mapa, servicio,
+                    minuto_minimo if fecha == fecha_desde else 0,
+                    permitidos
+                )
+                if minutos is not None:
+                    del_dia.append((fecha, minutos, veterinario_id))
+            del_dia.sort(key=lambda x: (x[1], str(x[2])))
+            resultados.extend(del_dia[:limite - len(resultados)])
+            fecha += timedelta(days=1)
+
+        bloque_desde = bloque_hasta + timedelta(days=1)
+    return resultados
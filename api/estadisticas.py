@@ -0,0 +1,135 @@
+"""
+Contadores y estadísticas agregadas con caché.
+
+Cada grupo (vacunación, catálogo de vacunas, especialidades, trabajadores,
+productos, mascotas) se calcula con una sola consulta
+aggregate(Count(..., filter=Q(...))) y se guarda en la caché de Django durante
+CACHE_TIMEOUT_ESTADISTICAS segundos. Cada grupo tiene un número de versión en
+la clave: los signals de los modelos de origen y las escrituras en bloque
+llaman a `invalidar`, que lo incrementa.
+
+A diferencia de los mapas de disponibilidad y la matriz de permisos, la
+versión vive en la propia caché de Django y no en VersionCache: los contadores
+son informativos y no justifican una escritura en la BD por cada alta de
+mascota o salida de stock. Con la LocMemCache configurada por defecto cada
+worker tiene su propia caché, así que una invalidación solo la ve el proceso
+que la hizo y los demás pueden mostrar contadores con hasta
+CACHE_TIMEOUT_ESTADISTICAS (60) segundos de atraso. Con un backend compartido
+(Redis, Memcached) la invalidación llega a todos de inmediato.
+"""
+
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Especialidad, HistorialVacunacion, Mascota, Producto, Trabajador, Vacuna
+
+CACHE_TIMEOUT_ESTADISTICAS = 60
+
+VACUNACION = 'vacunacion'
+VACUNAS = 'vacunas'
+ESPECIALIDADES = 'especialidades'
+TRABAJADORES = 'trabajadores'
+PRODUCTOS = 'productos'
+MASCOTAS = 'mascotas'
+
+
+def _clave_version(grupo):
+    return f'estadisticas:version:{grupo}'
+
+
+def invalidar(*grupos):
+    """Descarta los contadores cacheados de los grupos indicados"""
+    for grupo in grupos:
+        clave = _clave_version(grupo)
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, 1, None)
+
+
+def _cacheado(grupo, calcular, sufijo=''):
+    version = cache.get(_clave_version(grupo), 0)
+    clave = f'estadisticas:{grupo}:{version}{sufijo}'
+    valor = cache.get(clave)
+    if valor is None:
+        valor = calcular()
+        cache.set(clave, valor, CACHE_TIMEOUT_ESTADISTICAS)
+    return valor
+
+
+def estadisticas_vacunacion(hoy=None):
+    """Registros aplicados, vencidos y próximos a vencer (30 días) del historial"""
+    hoy = hoy or date.today()
+
+    def calcular():
+        totales = HistorialVacunacion.objects.order_by().aggregate(
+            total=Count('id'),
+            vencidas=Count('id', filter=Q(proxima_fecha__lt=hoy)),
+            proximas_30_dias=Count('id', filter=Q(
+                proxima_fecha__gte=hoy, proxima_fecha__lte=hoy + timedelta(days=30)
+            )),
+        )
+        total = totales['total']
+        return {
+            'total_vacunas_aplicadas': total,
+            'vacunas_vencidas': totales['vencidas'],
+            'vacunas_proximas_30_dias': totales['proximas_30_dias'],
+            'porcentaje_cumplimiento': round((total - totales['vencidas']) / total * 100, 2) if total > 0 else 0
+        }
+
+    # Los umbrales dependen de la fecha: la clave incluye el día
+    return _cacheado(VACUNACION, calcular, sufijo=f':{hoy.isoformat()}')
+
+
+def estadisticas_vacunas():
+    """Catálogo de vacunas: total, activas, inactivas y obligatorias"""
+    return _cacheado(VACUNAS, lambda: Vacuna.objects.order_by().aggregate(
+        total=Count('id'),
+        activas=Count('id', filter=Q(estado='Activo')),
+        inactivas=Count('id', filter=Q(estado='Inactivo')),
+        obligatorias=Count('id', filter=Q(es_obligatoria=True)),
+    ))
+
+
+def estadisticas_especialidades():
+    return _cacheado(ESPECIALIDADES, lambda: Especialidad.objects.order_by().aggregate(
+        total=Count('id'),
+        activas=Count('id', filter=Q(estado__iexact='activo')),
+    ))
+
+
+def estadisticas_trabajadores():
+    return _cacheado(TRABAJADORES, lambda: Trabajador.objects.order_by().aggregate(
+        total=Count('id'),
+        activos=Count('id', filter=Q(estado__iexact='activo')),
+        veterinarios=Count('id', filter=Q(usuario__rol='veterinario', estado__iexact='activo')),
+    ))
+
+
+def estadisticas_productos():
+    return _cacheado(PRODUCTOS, lambda: Producto.objects.order_by().aggregate(
+        total=Count('id'),
+        activos=Count('id', filter=Q(estado__iexact='activo')),
+        sin_stock=Count('id', filter=Q(estado__iexact='activo', stock=0)),
+    ))
+
+
+def estadisticas_mascotas():
+    return _cacheado(MASCOTAS, lambda: Mascota.objects.order_by().aggregate(
+        total=Count('id'),
+        activas=Count('id', filter=Q(estado='Activo')),
+    ))
+
+
+def contadores(hoy=None):
+    """Todos los contadores del dashboard (una consulta por grupo no cacheado)"""
+    return {
+        ESPECIALIDADES: estadisticas_especialidades(),
+        TRABAJADORES: estadisticas_trabajadores(),
+        PRODUCTOS: estadisticas_productos(),
+        MASCOTAS: estadisticas_mascotas(),
+        VACUNAS: estadisticas_vacunas(),
+        VACUNACION: estadisticas_vacunacion(hoy),
+    }
@@ -0,0 +1,195 @@
+"""
+Máquina de estados del historial de vacunación.
+
+Antes se ejecutaba en cada GET de alertas_dashboard; ahora corre como proceso
+batch (`python manage.py actualizar_estados_vacunacion`). Las transiciones
+dependen de umbrales relativos a "hoy" (hoy-180, hoy-7, hoy, hoy+30). Con una
+marca de agua (fecha de la ejecución anterior) solo se procesan:
+  - las filas cuya proxima_fecha cruzó algún umbral entre ambas fechas, y
+  - las filas modificadas desde el inicio de la ejecución anterior.
+Sin marca de agua se procesa la tabla completa.
+"""
+
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import HistorialVacunacion, EjecucionProceso
+
+NOMBRE_PROCESO = 'actualizar_estados_vacunacion'
+
+DIAS_LIMPIEZA = 7        # vencidas hace más de una semana -> completado
+DIAS_REINICIO = 180      # vencidas hace más de 6 meses -> vencida_reinicio
+DIAS_PROXIMA = 30        # aplicadas que vencen en los próximos 30 días -> proxima
+
+
+def _alcance(desde_fecha, desde_momento, inicio, fin):
+    """
+    Filtro de marca de agua: proxima_fecha en [inicio, fin) (el umbral se movió
+    sobre esas fechas desde la ejecución anterior) o fila modificada desde entonces.
+    """
+    if desde_fecha is None:
+        return Q()
+    return Q(proxima_fecha__gte=inicio, proxima_fecha__lt=fin) | Q(actualizado__gte=desde_momento)
+
+
+def _progresar_multidosis(candidatas, fecha_hoy):
+    """
+    Crea la siguiente dosis de los registros multi-dosis vencidos, en bloque:
+      1. una consulta con los candidatos y otra con las dosis siguientes existentes
+      2. bulk_create de las nuevas dosis
+      3. un UPDATE que marca los registros anteriores como completados
+    Debe ejecutarse dentro de una transacción.
+    """
+    registros = list(candidatas.select_related('vacuna').only(
+        'id', 'mascota_id', 'vacuna_id', 'veterinario_id', 'dosis_numero',
+        'vacuna__intervalo_dosis_semanas'
+    ))
+    if not registros:
+        return 0
+
+    # Anti-join: dosis siguientes que ya existen para las mascotas/vacunas candidatas
+    existentes = set(HistorialVacunacion.objects.filter(
+        mascota_id__in={r.mascota_id for r in registros},
+        vacuna_id__in={r.vacuna_id for r in registros},
+        dosis_numero__gt=1
+    ).order_by().values_list('mascota_id', 'vacuna_id', 'dosis_numero'))
+
+    nuevas = []
+    completados = []
+    for registro in registros:
+        clave = (registro.mascota_id, registro.vacuna_id, registro.dosis_numero + 1)
+        # La siguiente dosis ya existe o la generó un registro duplicado de la misma dosis
+        if clave in existentes:
+            continue
+        existentes.add(clave)
+        nuevas.append(HistorialVacunacion(
+            mascota_id=registro.mascota_id,
+            vacuna_id=registro.vacuna_id,
+            fecha_aplicacion=None,  # NULL - se llena al aplicarla realmente
+            proxima_fecha=fecha_hoy + timedelta(weeks=registro.vacuna.intervalo_dosis_semanas),
+            veterinario_id=registro.veterinario_id,
+            dosis_numero=registro.dosis_numero + 1,
+            estado='proxima',
+            observaciones=f'Dosis {registro.dosis_numero + 1} creada automáticamente tras vencimiento de dosis {registro.dosis_numero}'
+        ))
+        completados.append(registro.id)
+
+    if nuevas:
+        HistorialVacunacion.objects.bulk_create(nuevas, batch_size=500)
+        # La dosis anterior queda reemplazada por la siguiente
+        HistorialVacunacion.objects.filter(id__in=completados).update(
+            estado='completado', actualizado=timezone.now()
+        )
+    return len(nuevas)
+
+
+def actualizar_estados(fecha_hoy=None, desde_fecha=None, desde_momento=None):
+    """
+    Aplica las transiciones de estado del historial de vacunación.
+
+    Args:
+        fecha_hoy: fecha de referencia (default hoy)
+        desde_fecha / desde_momento: marca de agua de la ejecución anterior;
+            None procesa todas las filas
+
+    Returns:
+        dict con la cantidad de filas afectadas por cada transición
+    """
+    hoy = fecha_hoy or date.today()
+    ahora = timezone.now()
+    previo = desde_fecha or hoy
+
+    fecha_limpieza = hoy - timedelta(days=DIAS_LIMPIEZA)
+    fecha_reinicio = hoy - timedelta(days=DIAS_REINICIO)
+    fecha_proxima = hoy + timedelta(days=DIAS_PROXIMA)
+
+    def alcance(desplazamiento_dias):
+        """Filas cuyo umbral `proxima_fecha < hoy + desplazamiento` se cruzó desde la marca"""
+        return _alcance(
+            desde_fecha, desde_momento,
+            previo + timedelta(days=desplazamiento_dias),
+            hoy + timedelta(days=desplazamiento_dias)
+        )
+
+    resultado = {}
+    with transaction.atomic():
+        # 1. Vencidas hace más de una semana -> completado (proxima_fecha <= hoy-7)
+        resultado['completadas'] = HistorialVacunacion.objects.filter(
+            alcance(-DIAS_LIMPIEZA + 1),
+            proxima_fecha__lte=fecha_limpieza,
+            estado='vencida'
+        ).update(estado='completado', actualizado=ahora)
+
+        # 2. Aplicadas que pasaron su fecha (pero hace menos de 180 días) -> vencida
+        resultado['vencidas'] = HistorialVacunacion.objects.filter(
+            alcance(0),
+            proxima_fecha__lt=hoy,
+            proxima_fecha__gte=fecha_reinicio,
+            estado='aplicada'
+        ).update(estado='vencida', actualizado=ahora)
+
+        # 3. Muy vencidas (más de 180 días) -> vencida_reinicio
+        resultado['vencidas_reinicio'] = HistorialVacunacion.objects.filter(
+            alcance(-DIAS_REINICIO),
+            proxima_fecha__lt=fecha_reinicio,
+            estado__in=['aplicada', 'vencida']
+        ).update(estado='vencida_reinicio', actualizado=ahora)
+
+        # 4. Aplicadas que vencen en los próximos 30 días -> proxima
+        resultado['proximas'] = HistorialVacunacion.objects.filter(
+            alcance(DIAS_PROXIMA + 1),
+            proxima_fecha__gte=hoy,
+            proxima_fecha__lte=fecha_proxima,
+            estado='aplicada'
+        ).update(estado='proxima', actualizado=ahora)
+
+        # 5. Progresión automática de multi-dosis (vencidas con dosis pendientes)
+        candidatas = HistorialVacunacion.objects.filter(
+            alcance(0),
+            proxima_fecha__lt=hoy,
+            estado='vencida',
+            dosis_numero__lt=F('vacuna__dosis_total')
+        )
+        resultado['dosis_creadas'] = _progresar_multidosis(candidatas, hoy)
+
+        # 6. Proyección EstadoVacunaMascota: pares modificados por esta ejecución
+        #    (las escrituras en bloque no disparan signals) y estados que dependen de hoy
+        from .proyeccion_vacunas import recalcular, refrescar_estados
+        modificados = HistorialVacunacion.objects.filter(
+            actualizado__gte=ahora
+        ).order_by().values_list('mascota_id', 'vacuna_id').distinct()
+        resultado['proyeccion'] = recalcular(modificados, hoy) + refrescar_estados(hoy)
+
+    from .estadisticas import VACUNACION, invalidar
+    invalidar(VACUNACION)
+
+    return resultado
+
+
+def ejecutar_con_marca(fecha_hoy=None, completo=False):
+    """
+    Ejecuta actualizar_estados usando y actualizando la marca de agua guardada
+    en EjecucionProceso. Devuelve (resultado, marca_anterior).
+    """
+    hoy = fecha_hoy or date.today()
+    inicio = timezone.now()
+    marca, _ = EjecucionProceso.objects.get_or_create(nombre=NOMBRE_PROCESO)
+
+    # Una marca posterior a la fecha pedida (ej. reproceso de una fecha pasada) no sirve
+    usar_marca = not completo and marca.fecha_referencia and marca.fecha_referencia <= hoy
+    anterior = marca.fecha_referencia if usar_marca else None
+
+    resultado = actualizar_estados(
+        hoy,
+        desde_fecha=anterior,
+        desde_momento=marca.ultima_ejecucion if usar_marca else None
+    )
+
+    marca.ultima_ejecucion = inicio
+    marca.fecha_referencia = hoy
+    marca.resultado = resultado
+    marca.save()
+    return resultado, anterior
@@ -0,0 +1,148 @@
+"""
+Movimientos de inventario.
+
+Todas las salidas de stock pasan por `descontar_stock`: un UPDATE condicional
+(stock >= cantidad) con F('stock') - cantidad, sin leer y volver a escribir el
+producto, de modo que dos aplicaciones simultáneas nunca pierden una
+actualización ni dejan el stock en negativo. Cada cambio queda registrado en
+MovimientoStock; `python manage.py recalcular_stock` reconstruye Producto.stock
+a partir de ese libro.
+"""
+
+from django.db.models import F, Sum
+
+from .estadisticas import PRODUCTOS, invalidar
+from .models import MovimientoStock, Producto
+
+
+class StockInsuficiente(Exception):
+    """El producto no tiene unidades suficientes para la salida solicitada"""
+
+    def __init__(self, producto, cantidad):
+        self.producto = producto
+        self.cantidad = cantidad
+        nombre = getattr(producto, 'nombre', producto)
+        super().__init__(f'Stock insuficiente de "{nombre}" para descontar {cantidad} unidad(es)')
+
+
+def descontar_stock(producto, cantidad, tipo, motivo='', historial_vacunacion=None, servicio_adicional=None):
+    """
+    Descuenta `cantidad` unidades de forma atómica y registra el movimiento.
+    Lanza StockInsuficiente si el stock actual no alcanza (no se modifica nada).
+    Debe ejecutarse dentro de una transacción.
+    """
+    if cantidad <= 0:
+        return None
+    actualizados = Producto.objects.filter(id=producto.id, stock__gte=cantidad).update(
+        stock=F('stock') - cantidad
+    )
+    if not actualizados:
+        raise StockInsuficiente(producto, cantidad)
+    invalidar(PRODUCTOS)
+    return MovimientoStock.objects.create(
+        producto_id=producto.id,
+        tipo=tipo,
+        cantidad=-cantidad,
+        motivo=motivo,
+        historial_vacunacion=historial_vacunacion,
+        servicio_adicional=servicio_adicional
+    )
+
+
+def devolver_stock(producto, cantidad, motivo='', servicio_adicional=None):
+    """Reingresa `cantidad` unidades (anulación de una salida) y registra el movimiento"""
+    if cantidad <= 0:
+        return None
+    Producto.objects.filter(id=producto.id).update(stock=F('stock') + cantidad)
+    invalidar(PRODUCTOS)
+    return MovimientoStock.objects.create(
+        producto_id=producto.id,
+        tipo='devolucion',
+        cantidad=cantidad,
+        motivo=motivo,
+        servicio_adicional=servicio_adicional
+    )
+
+
+def descontar_vacunaciones(producto, registros):
+    """
+    Salida en bloque para los registros de una jornada de vacunación (una unidad
+    por registro): un solo UPDATE condicional y un bulk_create de movimientos.
+    """
+    if not registros:
+        return 0
+    cantidad = len(registros)
+    actualizados = Producto.objects.filter(id=producto.id, stock__gte=cantidad).update(
+        stock=F('stock') - cantidad
+    )
+    if not actualizados:
+        raise StockInsuficiente(producto, cantidad)
+    invalidar(PRODUCTOS)
+    MovimientoStock.objects.bulk_create([
+        MovimientoStock(
+            producto_id=producto.id,
+            tipo='vacunacion',
+            cantidad=-1,
+            motivo=f'Jornada de vacunación - dosis #{registro.dosis_numero}',
+            historial_vacunacion_id=registro.id
+        )
+        for registro in registros
+    ], batch_size=500)
+    return cantidad
+
+
+def sincronizar_servicio_adicional(servicio_adicional):
+    """
+    Ajusta el stock para que las salidas registradas del ServicioAdicional
+    coincidan con su producto y cantidad actuales (alta, cambio de cantidad o
+    de producto). Es idempotente: compara contra el propio libro de movimientos.
+    """
+    registrado = dict(
+        MovimientoStock.objects.filter(servicio_adicional_id=servicio_adicional.id).order_by()
+        .values('producto_id').annotate(total=Sum('cantidad')).values_list('producto_id', 'total')
+    )
+    esperado = {}
+    if servicio_adicional.producto_id and servicio_adicional.cantidad > 0:
+        esperado[servicio_adicional.producto_id] = -servicio_adicional.cantidad
+
+    for producto_id in set(registrado) | set(esperado):
+        diferencia = esperado.get(producto_id, 0) - (registrado.get(producto_id) or 0)
+        producto = servicio_adicional.producto if producto_id == servicio_adicional.producto_id else Producto(id=producto_id)
+        if diferencia < 0:
+            descontar_stock(
+                producto, -diferencia, 'venta',
+                motivo=f'Cita {servicio_adicional.cita_id}',
+                servicio_adicional=servicio_adicional
+            )
+        elif diferencia > 0:
+            devolver_stock(
+                producto, diferencia,
+                motivo=f'Cita {servicio_adicional.cita_id}',
+                servicio_adicional=servicio_adicional
+            )
+
+
+def recalcular_stock(productos=None):
+    """
+    Recalcula Producto.stock como la suma de sus movimientos (una consulta
+    agregada y un UPDATE por producto descuadrado). Los productos sin
+    movimientos no se tocan.
+
+    Returns:
+        lista de (producto, stock_anterior, stock_libro) para los productos corregidos
+    """
+    movimientos = MovimientoStock.objects.order_by()
+    if productos is not None:
+        movimientos = movimientos.filter(producto_id__in=productos)
+    totales = dict(movimientos.values('producto_id').annotate(total=Sum('cantidad')).values_list('producto_id', 'total'))
+
+    corregidos = []
+    for producto in Producto.objects.filter(id__in=totales.keys()).only('id', 'nombre', 'stock'):
+        total = max(totales[producto.id], 0)
+        if producto.stock != total:
+            corregidos.append((producto, producto.stock, total))
+    for producto, _, total in corregidos:
+        Producto.objects.filter(id=producto.id).update(stock=total)
+    if corregidos:
+        invalidar(PRODUCTOS)
+    return corregidos
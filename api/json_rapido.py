@@ -0,0 +1,128 @@
+"""
+Renderer y parser JSON rápidos para DRF.
+
+Con `orjson` instalado, las respuestas y los cuerpos JSON se procesan con él;
+sin él (o con UNICODE_JSON/COMPACT_JSON desactivados, o con indentación pedida
+por el navegador de la API) se usan JSONRenderer/JSONParser de DRF tal cual.
+
+La salida es byte a byte la del JSONRenderer de DRF: fechas, horas y
+datetimes no se dejan a orjson sino al mismo `encoders.JSONEncoder` de DRF
+(isoformat, sufijo 'Z' en UTC), igual que Decimal (string o float según
+COERCE_DECIMAL_TO_STRING); los UUID salen con el mismo formato de
+`str(uuid)`, y se escapan U+2028/U+2029. Si orjson no puede con un valor
+(enteros de más de 64 bits, que al leer convertiría en float) se usa la ruta
+estándar, con su mismo resultado o error; también con claves de dict que no
+son str, que orjson rechaza. Lo mismo con NaN/Infinity, que orjson escribiría
+como null: si la salida tiene algún null se busca un float no finito en los
+datos y, si lo hay, responde el renderer de DRF (ValueError con STRICT_JSON,
+NaN/Infinity sin él).
+
+Los float menores que 1e-4 o de 1e16 en adelante los escribe distinto cada
+uno (DRF usa repr: 1e-05 y 1e+16; orjson 0.00001 y 1e16). Si la salida de
+orjson tiene un número con esa forma, responde el renderer de DRF.
+"""
+
+import math
+import re
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import json
+
+try:
+    import orjson
+except ImportError:  # ruta estándar de DRF (json de la librería estándar)
+    orjson = None
+
+if orjson is not None:
+    OPCIONES_ORJSON = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+# 20 dígitos seguidos pueden superar uint64: orjson los leería como float.
+# translate + `in` recorre el cuerpo en C, mucho más rápido que una regex.
+DIGITOS_A_CERO = bytes.maketrans(b'123456789', b'0' * 9)
+DIGITOS_FUERA_DE_RANGO = b'0' * 20
+
+# orjson escribe los float < 1e-4 con cuatro ceros decimales iniciales y los
+# >= 1e16 (y los muy pequeños) con exponente al final del número. Un string
+# con esa forma solo provoca la ruta estándar, con la misma salida.
+CEROS_INICIALES = b'0.0000'
+EXPONENTE = re.compile(rb'e-?[0-9]{1,3}(?:[,}\]]|\Z)')
+
+SEPARADORES_LINEA = (('\u2028'.encode(), b'\\u2028'), ('\u2029'.encode(), b'\\u2029'))
+
+ESCALARES = frozenset({str, int, bool, type(None)})
+
+
+def _tiene_no_finitos(valor):
+    """True si hay algún float NaN/Infinity en los datos (orjson los escribiría como null)"""
+    if isinstance(valor, float):
+        return not math.isfinite(valor)
+    if isinstance(valor, dict):
+        valores = valor.values()
+    elif isinstance(valor, (list, tuple)):
+        valores = valor
+    else:
+        return False
+    for item in valores:
+        if type(item) not in ESCALARES and _tiene_no_finitos(item):
+            return True
+    return False
+
+
+def _tiene_float_distinto(ret):
+    """True si la salida de orjson tiene algún float que DRF escribiría de otra forma"""
+    return CEROS_INICIALES in ret or EXPONENTE.search(ret) is not None
+
+
+class JSONRendererRapido(JSONRenderer):
+    """JSONRenderer con orjson y la misma salida que el de DRF"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=OPCIONES_ORJSON)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'null' in ret and _tiene_no_finitos(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        if _tiene_float_distinto(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Igual que DRF: JSON que además es un subconjunto estricto de JavaScript
+        if b'\xe2\x80' in ret:
+            for separador, escapado in SEPARADORES_LINEA:
+                ret = ret.replace(separador, escapado)
+        return ret
+
+
+class JSONParserRapido(JSONParser):
+    """JSONParser con orjson; si orjson rechaza el cuerpo, se repite con la ruta estándar de DRF"""
+    renderer_class = JSONRendererRapido
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        contenido = stream.read() if stream is not None else b''
+        if DIGITOS_FUERA_DE_RANGO not in contenido.translate(DIGITOS_A_CERO):
+            try:
+                return orjson.loads(contenido)
+            except orjson.JSONDecodeError:
+                pass
+
+        # Mismo resultado (o el mismo error) que JSONParser sobre los bytes ya leídos
+        try:
+            parse_constant = json.strict_constant if self.strict else None
+            return json.loads(contenido.decode(encoding), parse_constant=parse_constant)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
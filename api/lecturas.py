@@ -0,0 +1,192 @@
+"""
+Ruta de lectura rápida para los listados más consultados.
+
+Calendarios del día (veterinario y recepción), agenda profesional y alertas
+del dashboard se construyen desde proyecciones `.values()`: una sola consulta
+con las columnas unidas ya anotadas en SQL (nombre del responsable y del
+veterinario, duración total del servicio) y sin instanciar modelos ni
+serializers por fila. Cada función devuelve exactamente el mismo JSON que el
+recorrido de objetos al que reemplaza.
+"""
+
+from datetime import date
+
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Concat
+
+from .choices import EstadoCita
+from .models import Cita, EstadoVacunaMascota
+
+ESTADOS_CITA = dict(EstadoCita.ESTADO_CHOICES)
+
+
+def _nombre(prefijo):
+    """'nombres apellidos' de la relación indicada, concatenado en SQL"""
+    return Concat(f'{prefijo}__nombres', Value(' '), f'{prefijo}__apellidos', output_field=CharField())
+
+
+def _citas_dia(fecha, veterinario_id=None):
+    citas = Cita.objects.filter(fecha=fecha).exclude(estado='cancelada')
+    if veterinario_id:
+        citas = citas.filter(veterinario_id=veterinario_id)
+    return citas.annotate(
+        responsable_nombre=_nombre('mascota__responsable'),
+        servicio_duracion_total=(
+            F('servicio__duracion_minutos') + F('servicio__tiempo_preparacion') + F('servicio__tiempo_limpieza')
+        ),
+    )
+
+
+CAMPOS_CITA = (
+    'id', 'hora', 'estado', 'notas',
+    'mascota_id', 'mascota__nombreMascota', 'mascota__especie', 'mascota__raza',
+    'mascota__responsable_id', 'responsable_nombre', 'mascota__responsable__telefono',
+    'servicio_id', 'servicio__nombre', 'servicio__categoria', 'servicio_duracion_total', 'servicio__precio',
+)
+
+
+def _cita(fila):
+    return {
+        'id': str(fila['id']),
+        'hora': str(fila['hora']),
+        'estado': fila['estado'],
+        'mascota': {
+            'id': str(fila['mascota_id']),
+            'nombre': fila['mascota__nombreMascota'],
+            'especie': fila['mascota__especie'],
+            'raza': fila['mascota__raza']
+        },
+        'responsable': {
+            'id': str(fila['mascota__responsable_id']),
+            'nombre': fila['responsable_nombre'],
+            'telefono': fila['mascota__responsable__telefono']
+        },
+        'servicio': {
+            'id': str(fila['servicio_id']),
+            'nombre': fila['servicio__nombre'],
+            'categoria': fila['servicio__categoria'],
+            'duracion_minutos': fila['servicio_duracion_total'],
+            'precio': str(fila['servicio__precio'])
+        },
+        'notas': fila['notas'] or ''
+    }
+
+
+def calendario_veterinario(veterinario_id, fecha):
+    """Citas del día de un veterinario (mi-calendario), ordenadas por hora"""
+    filas = _citas_dia(fecha, veterinario_id).order_by('hora').values(*CAMPOS_CITA)
+    return [_cita(fila) for fila in filas]
+
+
+def calendario_recepcion(fecha, veterinario_id=None):
+    """Citas del día agrupadas por veterinario (calendario-recepcion)"""
+    filas = _citas_dia(fecha, veterinario_id).annotate(
+        veterinario_nombre=_nombre('veterinario__trabajador'),
+    ).order_by('veterinario', 'hora').values(
+        *CAMPOS_CITA, 'veterinario_id', 'veterinario_nombre', 'veterinario__especialidad__nombre'
+    )
+    veterinarios = {}
+    for fila in filas:
+        vet_id = str(fila['veterinario_id'])
+        grupo = veterinarios.get(vet_id)
+        if grupo is None:
+            grupo = veterinarios[vet_id] = {
+                'veterinario': {
+                    'id': vet_id,
+                    'nombre': fila['veterinario_nombre'],
+                    'especialidad': fila['veterinario__especialidad__nombre']
+                },
+                'citas': []
+            }
+        grupo['citas'].append(_cita(fila))
+    return list(veterinarios.values())
+
+
+def agenda_dia(fecha, veterinario_id=None):
+    """
+    Agenda de CitaProfesionalViewSet.agenda_dia: citas por veterinario con los
+    campos de CitaProfesionalSerializer. Devuelve (agenda, total_citas).
+    """
+    filas = Cita.objects.filter(fecha=fecha)
+    if veterinario_id:
+        filas = filas.filter(veterinario__id=veterinario_id)
+    filas = filas.annotate(
+        veterinario_nombre=Concat(
+            'veterinario__trabajador__nombres', Value(' '), 'veterinario__trabajador__apellidos',
+            Value(' - '), 'veterinario__especialidad__nombre', output_field=CharField()
+        ),
+    ).order_by('veterinario', 'hora').values_list(
+        'id', 'fecha', 'hora', 'mascota_id', 'mascota__nombreMascota',
+        'veterinario_id', 'veterinario_nombre', 'servicio_id', 'servicio__nombre', 'estado', 'notas',
+    )
+
+    agenda = {}
+    total = 0
+    for (cita_id, fecha_cita, hora, mascota_id, mascota_nombre,
+         vet_id, vet_nombre, servicio_id, servicio_nombre, estado, notas) in filas:
+        vet_key = str(vet_id)
+        grupo = agenda.get(vet_key)
+        if grupo is None:
+            grupo = agenda[vet_key] = {'veterinario': vet_nombre, 'citas': []}
+        grupo['citas'].append({
+            'id': str(cita_id),
+            'fecha': fecha_cita.isoformat(),
+            'hora': hora.isoformat(),
+            'mascota': str(mascota_id),
+            'mascota_nombre': mascota_nombre,
+            'veterinario': str(vet_id),
+            'veterinario_nombre': vet_nombre,
+            'servicio': str(servicio_id),
+            'servicio_nombre': servicio_nombre,
+            'estado': estado,
+            'estado_display': ESTADOS_CITA.get(estado, estado),
+            'notas': notas
+        })
+        total += 1
+    return agenda, total
+
+
+def alertas_dashboard(hoy=None):
+    """
+    Alertas vencidas/próximas desde la proyección EstadoVacunaMascota.
+    Devuelve (alertas, vencidas, proximas).
+    """
+    hoy = hoy or date.today()
+    filas = EstadoVacunaMascota.objects.filter(
+        estado__in=['vencida', 'proxima']
+    ).annotate(
+        responsable_nombre=_nombre('mascota__responsable'),
+    ).order_by('proxima_fecha').values_list(
+        'historial_id', 'mascota_id', 'mascota__nombreMascota', 'mascota__especie',
+        'vacuna_id', 'vacuna__nombre', 'es_obligatoria', 'fecha_aplicacion', 'proxima_fecha', 'dosis_numero',
+        'responsable_nombre', 'mascota__responsable__telefono',
+        'historial__veterinario__trabajador__nombres', 'historial__veterinario__trabajador__apellidos',
+    )
+
+    alertas = []
+    vencidas = 0
+    for (historial_id, mascota_id, mascota_nombre, especie, vacuna_id, vacuna_nombre, obligatoria,
+         fecha_aplicacion, proxima_fecha, dosis, responsable, telefono, vet_nombres, vet_apellidos) in filas:
+        dias_restantes = (proxima_fecha - hoy).days
+        vencida = dias_restantes < 0
+        vencidas += vencida
+        alertas.append({
+            'id': str(historial_id),
+            'mascota_id': str(mascota_id),
+            'mascota_nombre': mascota_nombre,
+            'mascota_especie': especie,
+            'vacuna_id': str(vacuna_id),
+            'vacuna_nombre': vacuna_nombre,
+            'es_obligatoria': obligatoria,
+            'fecha_aplicacion': fecha_aplicacion,
+            'proxima_fecha': proxima_fecha,
+            'dias_restantes': dias_restantes,
+            'estado': 'vencida' if vencida else 'proxima',
+            'prioridad': 'alta' if vencida else 'media',
+            'dosis_numero': dosis,
+            'responsable_nombre': responsable,
+            'responsable_telefono': telefono,
+            'veterinario_nombre': f"{vet_nombres} {vet_apellidos}" if vet_nombres is not None else None,
+            'color': 'red' if vencida else 'yellow'
+        })
+    return alertas, vencidas, len(alertas) - vencidas
@@ -0,0 +1,63 @@
+"""
+Actualiza los estados del historial de vacunación (proceso batch).
+
+Uso:
+    python manage.py actualizar_estados_vacunacion
+    python manage.py actualizar_estados_vacunacion --completo
+    python manage.py actualizar_estados_vacunacion --fecha 2025-06-01
+
+Aplica las transiciones vencida / vencida_reinicio / proxima / completado y
+crea la siguiente dosis de los protocolos multi-dosis vencidos; luego refresca
+la proyección EstadoVacunaMascota. Usa la marca de agua guardada en
+EjecucionProceso para procesar solo las filas cuya proxima_fecha cruzó un
+umbral (o que cambiaron) desde la última ejecución.
+Pensado para correr diariamente desde cron.
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Actualiza los estados del historial de vacunación desde la última ejecución'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Ignorar la marca de agua y procesar todo el historial',
+        )
+        parser.add_argument(
+            '--fecha',
+            help='Fecha de referencia YYYY-MM-DD (default: hoy)',
+        )
+
+    def handle(self, *args, **options):
+        from api.estados_vacunacion import ejecutar_con_marca
+
+        fecha = None
+        if options['fecha']:
+            try:
+                fecha = datetime.strptime(options['fecha'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f"Fecha inválida: {options['fecha']} (formato esperado YYYY-MM-DD)")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            '\n=== Actualización de estados de vacunación ==='
+        ))
+
+        resultado, anterior = ejecutar_con_marca(fecha, completo=options['completo'])
+
+        if anterior:
+            self.stdout.write(f'  Marca de agua: cambios desde {anterior}')
+        else:
+            self.stdout.write(self.style.WARNING('  Sin marca de agua: procesando todo el historial'))
+
+        self.stdout.write(f"  Completadas (vencidas > 7 días)... {self.style.SUCCESS(str(resultado['completadas']))}")
+        self.stdout.write(f"  Vencidas...                      {self.style.SUCCESS(str(resultado['vencidas']))}")
+        self.stdout.write(f"  Vencidas con reinicio...         {self.style.SUCCESS(str(resultado['vencidas_reinicio']))}")
+        self.stdout.write(f"  Próximas...                      {self.style.SUCCESS(str(resultado['proximas']))}")
+        self.stdout.write(f"  Dosis siguientes creadas...      {self.style.SUCCESS(str(resultado['dosis_creadas']))}")
+        self.stdout.write(f"  Proyección de estados...         {self.style.SUCCESS(str(resultado['proyeccion']))}")
+        self.stdout.write(self.style.SUCCESS('\nEstados actualizados.\n'))
@@ -0,0 +1,670 @@
+"""
+Benchmarks y verificaciones de equivalencia de los motores de rendimiento.
+
+Uso:
+    python manage.py benchmark_rendimiento
+    python manage.py benchmark_rendimiento --caso conflictos --iteraciones 20000
+    python manage.py benchmark_rendimiento --caso disponibilidad --dias 14
+    python manage.py benchmark_rendimiento --caso protocolos --iteraciones 50000
+    python manage.py benchmark_rendimiento --caso contexto --iteraciones 200
+    python manage.py benchmark_rendimiento --caso lecturas --iteraciones 20000
+    python manage.py benchmark_rendimiento --caso json --iteraciones 200
+
+Cada caso compara la implementación optimizada contra un oráculo simple
+(fuerza bruta) sobre datos aleatorios reproducibles (--semilla), falla si
+algún resultado difiere y reporta los tiempos de ambos. El caso de
+disponibilidad lee los datos existentes sin escribir. El de contexto compara
+la autenticación con un token JWT real de un veterinario existente contra la
+de simplejwt más el recorrido de relaciones. El de lecturas compara el costo
+por fila de calendarios, agenda y alertas armados desde proyecciones values
+contra el recorrido de modelos que reemplazan. El de json renderiza y vuelve a
+leer las respuestas de los endpoints más grandes con el renderer/parser rápido
+y con los de DRF, y exige bytes idénticos.
+
+Las reservas concurrentes, la progresión de multi-dosis y las consultas por
+request de los endpoints que usan `request.contexto` y de los listados de
+citas se prueban en api/tests.py (python manage.py test api).
+"""
+
+import random
+import time as time_module
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta benchmarks de rendimiento contra oráculos de fuerza bruta'
+
+    CASOS = ['conflictos', 'disponibilidad', 'protocolos', 'contexto', 'lecturas', 'json']
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--caso',
+            choices=self.CASOS,
+            action='append',
+            help='Caso a ejecutar (se puede repetir; default: todos)',
+        )
+        parser.add_argument(
+            '--iteraciones',
+            type=int,
+            default=5000,
+            help='Número de consultas aleatorias por caso (default: 5000)',
+        )
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=7,
+            help='Días a partir de hoy para los casos con BD (default: 7)',
+        )
+        parser.add_argument(
+            '--semilla',
+            type=int,
+            default=42,
+            help='Semilla del generador aleatorio (default: 42)',
+        )
+
+    def handle(self, *args, **options):
+        casos = options['caso'] or self.CASOS
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Benchmark de rendimiento ==='))
+
+        for caso in casos:
+            rng = random.Random(options['semilla'])
+            getattr(self, f'_caso_{caso}')(rng, options)
+
+        self.stdout.write(self.style.SUCCESS('\nBenchmarks completados.\n'))
+
+    def _veterinario_con_usuario(self):
+        from api.models import Veterinario
+        return Veterinario.objects.select_related('trabajador__usuario').filter(
+            trabajador__usuario__is_active=True
+        ).first()
+
+    def _cabecera_jwt(self, usuario):
+        """Cabecera Authorization con un access token real (mismos claims que el login)"""
+        from api.serializers import CustomTokenObtainPairSerializer
+        return f'Bearer {CustomTokenObtainPairSerializer.get_token(usuario).access_token}'
+
+    def _reportar(self, nombre, t_optimizado, t_oraculo, detalle=''):
+        factor = t_oraculo / t_optimizado if t_optimizado > 0 else float('inf')
+        self.stdout.write(self.style.SUCCESS(
+            f'  {nombre}: OK {detalle}optimizado {t_optimizado * 1000:.1f} ms, '
+            f'oráculo {t_oraculo * 1000:.1f} ms (x{factor:.1f})'
+        ))
+
+    # ========================================
+    # CONFLICTOS DE CITAS
+    # ========================================
+
+    def _caso_conflictos(self, rng, options):
+        from api.conflictos import IndiceIntervalos
+
+        iteraciones = options['iteraciones']
+        # Día de 08:00 a 20:00 con citas de duración variable (pueden solaparse)
+        intervalos = []
+        for n in range(rng.randint(40, 80)):
+            inicio = rng.randint(8 * 60, 20 * 60)
+            intervalos.append((inicio, inicio + rng.choice([15, 20, 30, 45, 60, 90, 120]), n))
+        consultas = []
+        for _ in range(iteraciones):
+            inicio = rng.randint(7 * 60, 21 * 60)
+            consultas.append((inicio, inicio + rng.choice([10, 30, 45, 60, 180])))
+
+        t0 = time_module.perf_counter()
+        indice = IndiceIntervalos(intervalos)
+        optimizado = [indice.solapamientos(a, b) for a, b in consultas]
+        existe = [indice.hay_solapamiento(a, b) for a, b in consultas]
+        t_optimizado = time_module.perf_counter() - t0
+
+        t0 = time_module.perf_counter()
+        oraculo = [
+            [d for ini, fin, d in sorted(intervalos, key=lambda x: (x[0], x[1])) if ini < b and fin > a]
+            for a, b in consultas
+        ]
+        t_oraculo = time_module.perf_counter() - t0
+
+        for i, (a, b) in enumerate(consultas):
+            if sorted(optimizado[i]) != sorted(oraculo[i]) or existe[i] != bool(oraculo[i]):
+                raise CommandError(
+                    f'conflictos: resultado distinto para [{a}, {b}): '
+                    f'{optimizado[i]} != {oraculo[i]}'
+                )
+
+        self._reportar(
+            'Conflictos de citas', t_optimizado, t_oraculo,
+            f'({len(intervalos)} citas, {len(consultas)} consultas) '
+        )
+
+    # ========================================
+    # DISPONIBILIDAD (MAPAS DE BITS)
+    # ========================================
+
+    def _caso_disponibilidad(self, rng, options):
+        from datetime import date, timedelta
+        from django.db.models import Q
+        from django.utils import timezone
+        from api.conflictos import AgendaDia, a_minutos
+        from api.disponibilidad import (
+            GRANULO_MINUTOS, construir_mapas, granulos_necesarios, huecos_servicio, obtener_mapas
+        )
+        from api.models import HorarioTrabajo, Servicio, SlotTiempo
+        from api.slots import horario_vigente
+
+        fecha_desde = date.today()
+        fecha_hasta = fecha_desde + timedelta(days=options['dias'] - 1)
+        horarios = {}
+        for horario in HorarioTrabajo.objects.filter(activo=True):
+            horarios.setdefault((horario.veterinario_id, horario.dia_semana), horario)
+        veterinario_ids = sorted({v for v, _ in horarios}, key=str)
+        servicio = Servicio.objects.filter(permite_overlap=False).order_by('nombre').first()
+        if not veterinario_ids or not servicio:
+            self.stdout.write(self.style.WARNING(
+                '  Disponibilidad: SKIP (se requieren horarios de trabajo y al menos un servicio)'
+            ))
+            return
+
+        preparacion = servicio.tiempo_preparacion or 0
+        total = servicio.duracion_total_minutos()
+        dias = [fecha_desde + timedelta(days=i) for i in range(options['dias'])]
+
+        # 1. Correctitud: el mapa ofrece exactamente las horas del motor de conflictos
+        #    con el bloque redondeado a gránulos completos; ninguna choca sin redondear
+        mapas = construir_mapas(veterinario_ids, fecha_desde, fecha_hasta)
+        total_redondeado = granulos_necesarios(total) * GRANULO_MINUTOS
+        no_ofrecidas = 0
+        for veterinario_id in veterinario_ids:
+            for fecha in dias:
+                horario = horarios.get((veterinario_id, fecha.weekday()))
+                agenda = AgendaDia(veterinario_id, fecha)
+                ofrecidas = set(huecos_servicio(mapas[(veterinario_id, fecha)], servicio))
+
+                oraculo = set()
+                oraculo_redondeado = set()
+                if horario and horario_vigente(horario, fecha):
+                    ini_jornada, fin_jornada = a_minutos(horario.hora_inicio), a_minutos(horario.hora_fin)
+                    for inicio in range(0, 24 * 60, GRANULO_MINUTOS):
+                        for fin, horas in ((inicio + total, oraculo), (inicio + total_redondeado, oraculo_redondeado)):
+                            if inicio < ini_jornada or fin > fin_jornada:
+                                continue
+                            if (horario.tiene_descanso and horario.hora_inicio_descanso and horario.hora_fin_descanso
+                                    and inicio < a_minutos(horario.hora_fin_descanso)
+                                    and fin > a_minutos(horario.hora_inicio_descanso)):
+                                continue
+                            if agenda.indice.hay_solapamiento(inicio, fin):
+                                continue
+                            horas.add(inicio + preparacion)
+
+                if not ofrecidas <= oraculo:
+                    raise CommandError(
+                        f'disponibilidad: horas en conflicto ofrecidas para {veterinario_id} {fecha}: '
+                        f'{sorted(ofrecidas - oraculo)}'
+                    )
+                if not oraculo_redondeado <= ofrecidas:
+                    raise CommandError(
+                        f'disponibilidad: horas libres no ofrecidas para {veterinario_id} {fecha}: '
+                        f'{sorted(oraculo_redondeado - ofrecidas)}'
+                    )
+                no_ofrecidas += len(oraculo - ofrecidas)
+
+        # 2. Recorrido actual: slots disponibles de `disponibles` + búsqueda de tramos consecutivos
+        t0 = time_module.perf_counter()
+        for veterinario_id in veterinario_ids:
+            for fecha in dias:
+                slots = list(SlotTiempo.objects.filter(
+                    veterinario_id=veterinario_id,
+                    fecha=fecha,
+                    disponible=True
+                ).filter(
+                    Q(reservado_hasta__isnull=True) | Q(reservado_hasta__lt=timezone.now())
+                ).order_by('hora_inicio').values_list('hora_inicio', 'hora_fin'))
+                inicio_tramo = fin_tramo = None
+                for hora_inicio, hora_fin in slots:
+                    if fin_tramo != hora_inicio:
+                        inicio_tramo = hora_inicio
+                    fin_tramo = hora_fin
+                    if a_minutos(fin_tramo) - a_minutos(inicio_tramo) >= total:
+                        break
+        t_oraculo = time_module.perf_counter() - t0
+
+        # 3. Motor de mapas: una construcción en frío y consultas posteriores desde caché
+        t0 = time_module.perf_counter()
+        obtener_mapas(veterinario_ids, fecha_desde, fecha_hasta)
+        t_frio = time_module.perf_counter() - t0
+
+        t0 = time_module.perf_counter()
+        mapas = obtener_mapas(veterinario_ids, fecha_desde, fecha_hasta)
+        for veterinario_id in veterinario_ids:
+            for fecha in dias:
+                huecos_servicio(mapas[(veterinario_id, fecha)], servicio)
+        t_optimizado = time_module.perf_counter() - t0
+
+        self._reportar(
+            'Disponibilidad', t_optimizado, t_oraculo,
+            f'({len(veterinario_ids)} veterinarios x {len(dias)} días, "{servicio.nombre}" '
+            f'{total} min, construcción en frío {t_frio * 1000:.1f} ms, '
+            f'{no_ofrecidas} horas no ofrecidas por redondeo a {GRANULO_MINUTOS} min) '
+        )
+
+    # ========================================
+    # PROTOCOLOS DE VACUNACIÓN COMPILADOS
+    # ========================================
+
+    def _protocolo_iterativo(self, vacuna, fecha_aplicacion, dosis, es_cachorro, historial_count):
+        """Oráculo: precedencia y cálculo recalculados desde los campos de la vacuna en cada aplicación"""
+        from datetime import timedelta
+        from dateutil.relativedelta import relativedelta
+
+        base = vacuna.intervalo_dosis_semanas
+        if vacuna.protocolo_dosis and len(vacuna.protocolo_dosis) > 0:
+            tipo, dosis_total, intervalos = 'PROTOCOLO_COMPLEJO', len(vacuna.protocolo_dosis), []
+            for dosis_info in vacuna.protocolo_dosis:
+                if isinstance(dosis_info, dict) and 'semanas_siguiente' in dosis_info:
+                    semanas = dosis_info.get('semanas_siguiente', base)
+                    intervalos.append(semanas if semanas > 0 else base)
+                else:
+                    intervalos.append(base)
+        elif (vacuna.protocolo_cachorro and isinstance(vacuna.protocolo_cachorro, dict)
+              and es_cachorro and historial_count == 0):
+            tipo, dosis_total, intervalos = 'PROTOCOLO_CACHORRO', vacuna.dosis_total, []
+            dosis_cachorro = vacuna.protocolo_cachorro.get('dosis_total', vacuna.dosis_total)
+            if dosis_cachorro > 0:
+                dosis_total = dosis_cachorro
+            lista = vacuna.protocolo_cachorro.get('intervalos', [])
+            if lista and isinstance(lista, list):
+                intervalos = [i if i > 0 else base for i in lista]
+            else:
+                intervalos = [base] * (dosis_cachorro - 1)
+        else:
+            tipo, dosis_total, intervalos = 'PROTOCOLO_ESTANDAR', vacuna.dosis_total, [base] * (vacuna.dosis_total - 1)
+
+        max_atraso = vacuna.max_dias_atraso
+        if historial_count > 0 and intervalos and historial_count <= len(intervalos):
+            max_atraso = intervalos[historial_count - 1] * 7 + 21
+
+        try:
+            if dosis == 1 and dosis_total == 1:
+                proxima, final, usado = fecha_aplicacion + relativedelta(months=vacuna.frecuencia_meses), True, f"{vacuna.frecuencia_meses} meses"
+            elif dosis < dosis_total:
+                semanas = intervalos[dosis - 1] if intervalos and dosis - 1 < len(intervalos) else base
+                if semanas <= 0:
+                    semanas = base
+                proxima, final, usado = fecha_aplicacion + timedelta(weeks=semanas), False, f"{semanas} semanas"
+            else:
+                proxima, final, usado = fecha_aplicacion + relativedelta(months=vacuna.frecuencia_meses), True, f"{vacuna.frecuencia_meses} meses"
+            if proxima <= fecha_aplicacion:
+                raise ValueError(proxima)
+        except ValueError:
+            proxima, final, usado = fecha_aplicacion + relativedelta(months=vacuna.frecuencia_meses), True, f"{vacuna.frecuencia_meses} meses (fallback)"
+        return tipo, dosis_total, max_atraso, proxima, final, usado
+
+    def _caso_protocolos(self, rng, options):
+        from datetime import date, timedelta
+        from django.utils import timezone
+        from api.models import Vacuna
+        from api.protocolos import invalidar_protocolo, obtener_protocolo
+
+        # Vacunas en memoria con todas las combinaciones de protocolo
+        vacunas = []
+        for n in range(30):
+            dosis_total = rng.randint(1, 4)
+            vacuna = Vacuna(
+                nombre=f'Benchmark {n}', frecuencia_meses=rng.choice([6, 12, 36]),
+                dosis_total=dosis_total, intervalo_dosis_semanas=rng.randint(2, 4),
+                max_dias_atraso=rng.choice([7, 14, 30]), actualizado=timezone.now()
+            )
+            variante = n % 3
+            if variante == 1:
+                vacuna.protocolo_dosis = [
+                    {'dosis': d + 1, 'semanas_siguiente': rng.choice([0, 2, 3, 4])} if rng.random() < 0.8 else {'dosis': d + 1}
+                    for d in range(rng.randint(1, 5))
+                ]
+            elif variante == 2:
+                dosis_cachorro = rng.randint(1, 5)
+                vacuna.protocolo_cachorro = {'dosis_total': dosis_cachorro}
+                if rng.random() < 0.6:
+                    vacuna.protocolo_cachorro['intervalos'] = [rng.choice([0, 3, 4]) for _ in range(dosis_cachorro - 1)]
+            vacunas.append(vacuna)
+
+        hoy = date.today()
+        aplicaciones = [
+            (rng.choice(vacunas), hoy - timedelta(days=rng.randint(0, 400)),
+             rng.randint(1, 5), rng.random() < 0.5, rng.randint(0, 4))
+            for _ in range(options['iteraciones'])
+        ]
+
+        t0 = time_module.perf_counter()
+        oraculo = [self._protocolo_iterativo(*aplicacion) for aplicacion in aplicaciones]
+        t_oraculo = time_module.perf_counter() - t0
+
+        for vacuna in vacunas:
+            invalidar_protocolo(vacuna.id)
+        t0 = time_module.perf_counter()
+        optimizado = []
+        for vacuna, fecha, dosis, es_cachorro, historial_count in aplicaciones:
+            protocolo = obtener_protocolo(vacuna)
+            variante = protocolo.variante(es_cachorro, historial_count)
+            optimizado.append((variante.tipo, variante.dosis_total, protocolo.max_atraso(historial_count, variante))
+                              + protocolo.proxima_fecha(fecha, dosis, variante))
+        t_optimizado = time_module.perf_counter() - t0
+
+        for vacuna in vacunas:
+            invalidar_protocolo(vacuna.id)
+        for i, aplicacion in enumerate(aplicaciones):
+            if optimizado[i] != oraculo[i]:
+                raise CommandError(
+                    f'protocolos: resultado distinto para dosis {aplicacion[2]} de {aplicacion[0].nombre}: '
+                    f'{optimizado[i]} != {oraculo[i]}'
+                )
+
+        total = len(aplicaciones)
+        self._reportar(
+            'Protocolos compilados', t_optimizado, t_oraculo,
+            f'({len(vacunas)} vacunas, {total} aplicaciones: '
+            f'{total / t_optimizado:.0f} vs {total / t_oraculo:.0f} aplicaciones/seg) '
+        )
+
+    # ========================================
+    # CONTEXTO DEL USUARIO (CONSULTAS POR REQUEST)
+    # ========================================
+
+    def _caso_contexto(self, rng, options):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+        from api.contexto import JWTAuthenticationContexto
+        veterinario = self._veterinario_con_usuario()
+        if not veterinario:
+            self.stdout.write(self.style.WARNING('  Contexto: SKIP (se requiere un veterinario con usuario activo)'))
+            return
+
+        cabecera = self._cabecera_jwt(veterinario.trabajador.usuario)
+        fabrica = APIRequestFactory()
+        iteraciones = max(1, min(options['iteraciones'], 500))
+
+        def autenticar(autenticacion, recorrer):
+            request = Request(fabrica.get('/api/auth/me/', HTTP_AUTHORIZATION=cabecera))
+            usuario, _ = autenticacion.authenticate(request)
+            if recorrer:
+                # Recorrido anterior de las vistas: una consulta por salto
+                usuario.trabajador.veterinario.especialidad
+            return usuario
+
+        # 1. Autenticación: simplejwt + recorrido de relaciones vs una sola consulta
+        with CaptureQueriesContext(connection) as consultas:
+            autenticar(JWTAuthentication(), True)
+        consultas_oraculo = len(consultas)
+        with CaptureQueriesContext(connection) as consultas:
+            autenticar(JWTAuthenticationContexto(), False)
+        consultas_optimizado = len(consultas)
+
+        t0 = time_module.perf_counter()
+        for _ in range(iteraciones):
+            autenticar(JWTAuthentication(), True)
+        t_oraculo = time_module.perf_counter() - t0
+
+        t0 = time_module.perf_counter()
+        for _ in range(iteraciones):
+            autenticar(JWTAuthenticationContexto(), False)
+        t_optimizado = time_module.perf_counter() - t0
+
+        self._reportar(
+            'Contexto del usuario', t_optimizado, t_oraculo,
+            f'(autenticación {consultas_optimizado} vs {consultas_oraculo} consultas, {iteraciones} requests) '
+        )
+
+    # ========================================
+    # LECTURAS RÁPIDAS (PROYECCIONES VALUES)
+    # ========================================
+
+    def _citas_objetos(self, citas):
+        """Recorrido anterior de los calendarios: modelos completos y relaciones"""
+        datos = []
+        for cita in citas:
+            responsable = cita.mascota.responsable
+            datos.append({
+                'id': str(cita.id),
+                'hora': str(cita.hora),
+                'estado': cita.estado,
+                'mascota': {
+                    'id': str(cita.mascota.id),
+                    'nombre': cita.mascota.nombreMascota,
+                    'especie': cita.mascota.especie,
+                    'raza': cita.mascota.raza
+                },
+                'responsable': {
+                    'id': str(responsable.id),
+                    'nombre': f"{responsable.nombres} {responsable.apellidos}",
+                    'telefono': responsable.telefono
+                },
+                'servicio': {
+                    'id': str(cita.servicio.id),
+                    'nombre': cita.servicio.nombre,
+                    'categoria': cita.servicio.categoria,
+                    'duracion_minutos': cita.servicio.duracion_total_minutos(),
+                    'precio': str(cita.servicio.precio)
+                },
+                'notas': cita.notas or ''
+            })
+        return datos
+
+    def _agenda_objetos(self, citas):
+        agenda = {}
+        for cita in citas:
+            vet_key = str(cita.veterinario.id)
+            if vet_key not in agenda:
+                agenda[vet_key] = {'veterinario': cita.veterinario.__str__(), 'citas': []}
+            agenda[vet_key]['citas'].append({
+                'id': str(cita.id),
+                'fecha': cita.fecha.isoformat(),
+                'hora': cita.hora.isoformat(),
+                'mascota': str(cita.mascota_id),
+                'mascota_nombre': cita.mascota.nombreMascota,
+                'veterinario': str(cita.veterinario_id),
+                'veterinario_nombre': str(cita.veterinario),
+                'servicio': str(cita.servicio_id),
+                'servicio_nombre': cita.servicio.nombre,
+                'estado': cita.estado,
+                'estado_display': cita.get_estado_display(),
+                'notas': cita.notas
+            })
+        return agenda
+
+    def _alertas_objetos(self, hoy):
+        from api.models import EstadoVacunaMascota
+
+        alertas = []
+        for item in EstadoVacunaMascota.objects.filter(estado__in=['vencida', 'proxima']).select_related(
+            'mascota', 'vacuna', 'mascota__responsable', 'historial__veterinario__trabajador'
+        ).order_by('proxima_fecha'):
+            dias_restantes = (item.proxima_fecha - hoy).days
+            vencida = dias_restantes < 0
+            veterinario = item.historial.veterinario if item.historial else None
+            alertas.append({
+                'id': str(item.historial_id),
+                'mascota_id': str(item.mascota.id),
+                'mascota_nombre': item.mascota.nombreMascota,
+                'mascota_especie': item.mascota.especie,
+                'vacuna_id': str(item.vacuna.id),
+                'vacuna_nombre': item.vacuna.nombre,
+                'es_obligatoria': item.es_obligatoria,
+                'fecha_aplicacion': item.fecha_aplicacion,
+                'proxima_fecha': item.proxima_fecha,
+                'dias_restantes': dias_restantes,
+                'estado': 'vencida' if vencida else 'proxima',
+                'prioridad': 'alta' if vencida else 'media',
+                'dosis_numero': item.dosis_numero,
+                'responsable_nombre': f"{item.mascota.responsable.nombres} {item.mascota.responsable.apellidos}",
+                'responsable_telefono': item.mascota.responsable.telefono,
+                'veterinario_nombre': f"{veterinario.trabajador.nombres} {veterinario.trabajador.apellidos}" if veterinario else None,
+                'color': 'red' if vencida else 'yellow'
+            })
+        return alertas
+
+    def _caso_lecturas(self, rng, options):
+        from datetime import date, time
+        from django.db import transaction
+        from api import lecturas
+        from api.models import Cita, Mascota, Servicio, Veterinario
+
+        veterinario_ids = list(Veterinario.objects.values_list('id', flat=True)[:10])
+        mascota_ids = list(Mascota.objects.values_list('id', flat=True)[:200])
+        servicio_ids = list(Servicio.objects.values_list('id', flat=True)[:10])
+        if not veterinario_ids or not mascota_ids or not servicio_ids:
+            self.stdout.write(self.style.WARNING(
+                '  Lecturas rápidas: SKIP (se requieren veterinarios, mascotas y servicios)'
+            ))
+            return
+
+        # Un día sin uso real con hasta 288 citas (cada 5 min) por veterinario
+        fecha = date(2099, 1, 2)
+        por_veterinario = max(1, min(options['iteraciones'] // (10 * len(veterinario_ids)), 288))
+        repeticiones = 5
+
+        def medir(funcion):
+            t0 = time_module.perf_counter()
+            for _ in range(repeticiones):
+                resultado = funcion()
+            return resultado, (time_module.perf_counter() - t0) / repeticiones
+
+        def por_fila(segundos, filas):
+            return f'{segundos / max(filas, 1) * 1e6:.1f}'
+
+        resumen = []
+        with transaction.atomic():
+            Cita.objects.bulk_create([
+                Cita(
+                    fecha=fecha, hora=time(n // 12, (n % 12) * 5), veterinario_id=veterinario_id,
+                    mascota_id=rng.choice(mascota_ids), servicio_id=rng.choice(servicio_ids),
+                    estado=rng.choice(['pendiente', 'confirmada', 'completada', 'cancelada']),
+                    notas=rng.choice([None, '', 'Control'])
+                )
+                for veterinario_id in veterinario_ids for n in range(por_veterinario)
+            ])
+            citas_dia = Cita.objects.filter(fecha=fecha).exclude(estado='cancelada')
+            filas = citas_dia.count()
+
+            # mi-calendario
+            veterinario_id = veterinario_ids[0]
+            oraculo, t_oraculo = medir(lambda: self._citas_objetos(
+                citas_dia.filter(veterinario_id=veterinario_id).select_related(
+                    'mascota__responsable', 'servicio').order_by('hora')
+            ))
+            optimizado, t_optimizado = medir(lambda: lecturas.calendario_veterinario(veterinario_id, fecha))
+            if optimizado != oraculo:
+                raise CommandError('lecturas: mi-calendario devuelve datos distintos')
+            resumen.append(f'mi-calendario {por_fila(t_oraculo, len(oraculo))} -> '
+                           f'{por_fila(t_optimizado, len(oraculo))} µs/fila')
+            t_total_opt, t_total_ora = t_optimizado, t_oraculo
+
+            # calendario-recepcion (mismas filas, agrupadas por veterinario)
+            oraculo, t_oraculo = medir(lambda: self._citas_objetos(
+                citas_dia.select_related('mascota__responsable', 'servicio').order_by('veterinario', 'hora')
+            ))
+            optimizado, t_optimizado = medir(lambda: lecturas.calendario_recepcion(fecha))
+            if [c for grupo in optimizado for c in grupo['citas']] != oraculo:
+                raise CommandError('lecturas: calendario-recepcion devuelve datos distintos')
+            resumen.append(f'recepción {por_fila(t_oraculo, filas)} -> {por_fila(t_optimizado, filas)} µs/fila')
+            t_total_opt += t_optimizado
+            t_total_ora += t_oraculo
+
+            # agenda_dia (antes: un serializer por cita)
+            todas = Cita.objects.filter(fecha=fecha)
+            oraculo, t_oraculo = medir(lambda: self._agenda_objetos(
+                todas.select_related('mascota', 'veterinario__trabajador', 'veterinario__especialidad', 'servicio')
+                .order_by('veterinario', 'hora')
+            ))
+            (optimizado, total), t_optimizado = medir(lambda: lecturas.agenda_dia(fecha))
+            if optimizado != oraculo or total != todas.count():
+                raise CommandError('lecturas: agenda_dia devuelve datos distintos')
+            resumen.append(f'agenda {por_fila(t_oraculo, total)} -> {por_fila(t_optimizado, total)} µs/fila')
+            t_total_opt += t_optimizado
+            t_total_ora += t_oraculo
+
+            # Nada de lo creado por el benchmark debe persistir
+            transaction.set_rollback(True)
+
+        # Alertas del dashboard: solo lectura sobre la proyección existente
+        hoy = date.today()
+        oraculo, t_oraculo = medir(lambda: self._alertas_objetos(hoy))
+        (optimizado, vencidas, proximas), t_optimizado = medir(lambda: lecturas.alertas_dashboard(hoy))
+        clave = lambda alerta: (alerta['proxima_fecha'], alerta['id'])
+        if sorted(optimizado, key=clave) != sorted(oraculo, key=clave) or vencidas + proximas != len(oraculo):
+            raise CommandError('lecturas: alertas del dashboard devuelven datos distintos')
+        if oraculo:
+            resumen.append(f'alertas {por_fila(t_oraculo, len(oraculo))} -> '
+                           f'{por_fila(t_optimizado, len(oraculo))} µs/fila')
+            t_total_opt += t_optimizado
+            t_total_ora += t_oraculo
+
+        self._reportar(
+            'Lecturas rápidas', t_total_opt, t_total_ora,
+            f'({filas} citas, {len(oraculo)} alertas: {"; ".join(resumen)}) '
+        )
+
+    # ========================================
+    # JSON RÁPIDO (RENDERER Y PARSER)
+    # ========================================
+
+    def _caso_json(self, rng, options):
+        import io
+        from django.test import override_settings
+        from rest_framework.parsers import JSONParser
+        from rest_framework.renderers import JSONRenderer
+        from rest_framework.test import APIClient
+        from api import json_rapido
+        from api.models import Usuario
+
+        if json_rapido.orjson is None:
+            self.stdout.write(self.style.WARNING('  JSON rápido: SKIP (orjson no está instalado; se usa la ruta de DRF)'))
+            return
+        usuario = Usuario.objects.filter(rol='administrador', is_active=True).first()
+        if not usuario:
+            self.stdout.write(self.style.WARNING('  JSON rápido: SKIP (se requiere un usuario administrador activo)'))
+            return
+
+        cliente = APIClient()
+        cliente.force_authenticate(usuario)
+        urls = (
+            '/api/productos/all/', '/api/mascotas/activas/', '/api/dashboard/alertas-vacunacion/',
+            '/api/historial-vacunacion/', '/api/citas/',
+        )
+        respuestas = []
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for url in urls:
+                respuesta = cliente.get(url)
+                if respuesta.status_code != 200:
+                    raise CommandError(f'json: {url} respondió {respuesta.status_code}')
+                respuestas.append((url, respuesta.data))
+
+        estandar, rapido = JSONRenderer(), json_rapido.JSONRendererRapido()
+        parser_estandar, parser_rapido = JSONParser(), json_rapido.JSONParserRapido()
+        repeticiones = max(1, min(options['iteraciones'], 1000))
+        t_optimizado = t_oraculo = 0
+        resumen = []
+        for url, datos in respuestas:
+            esperado = estandar.render(datos)
+            if rapido.render(datos) != esperado:
+                raise CommandError(f'json: {url} se renderiza distinto')
+            if parser_rapido.parse(io.BytesIO(esperado)) != parser_estandar.parse(io.BytesIO(esperado)):
+                raise CommandError(f'json: {url} se lee distinto')
+
+            t0 = time_module.perf_counter()
+            for _ in range(repeticiones):
+                parser_estandar.parse(io.BytesIO(estandar.render(datos)))
+            t_url_oraculo = time_module.perf_counter() - t0
+
+            t0 = time_module.perf_counter()
+            for _ in range(repeticiones):
+                parser_rapido.parse(io.BytesIO(rapido.render(datos)))
+            t_url_optimizado = time_module.perf_counter() - t0
+
+            t_oraculo += t_url_oraculo
+            t_optimizado += t_url_optimizado
+            resumen.append(f'{url} {len(esperado) / 1024:.0f} KB '
+                           f'x{t_url_oraculo / t_url_optimizado if t_url_optimizado else float("inf"):.1f}')
+
+        self._reportar(
+            'JSON rápido', t_optimizado, t_oraculo,
+            f'({repeticiones} render + parse por endpoint: {"; ".join(resumen)}) '
+        )
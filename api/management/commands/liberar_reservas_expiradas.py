@@ -0,0 +1,55 @@
+"""
+Barrido de reservas temporales de slots vencidas.
+
+Uso:
+    python manage.py liberar_reservas_expiradas
+    python manage.py liberar_reservas_expiradas --cada 60
+
+Sin --cada ejecuta un único barrido (para cron). Con --cada SEGUNDOS queda
+corriendo y repite el barrido en ese intervalo hasta recibir Ctrl+C.
+Cada barrido es un solo UPDATE sobre SlotTiempo.reservado_hasta.
+"""
+
+import time as time_module
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Libera las reservas temporales de slots que ya expiraron'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cada',
+            type=int,
+            default=0,
+            help='Repetir el barrido cada N segundos (default: una sola vez)',
+        )
+
+    def handle(self, *args, **options):
+        intervalo = options['cada']
+        if intervalo < 0:
+            raise CommandError('--cada debe ser un número positivo de segundos')
+
+        if not intervalo:
+            self._barrer()
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\n=== Barrido de reservas expiradas cada {intervalo}s (Ctrl+C para detener) ==='
+        ))
+        try:
+            while True:
+                self._barrer()
+                time_module.sleep(intervalo)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('\nBarrido detenido.'))
+
+    def _barrer(self):
+        from django.utils import timezone
+        from api.slots import liberar_reservas_expiradas
+
+        liberados = liberar_reservas_expiradas()
+        self.stdout.write(self.style.SUCCESS(
+            f'  {timezone.localtime():%Y-%m-%d %H:%M:%S} reservas expiradas liberadas: {liberados}'
+        ))
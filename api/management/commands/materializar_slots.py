@@ -0,0 +1,153 @@
+"""
+Materializa los SlotTiempo de todos los veterinarios activos.
+
+Uso:
+    python manage.py materializar_slots
+    python manage.py materializar_slots --desde 2025-01-01 --hasta 2025-03-31
+    python manage.py materializar_slots --workers 4 --duracion 30
+
+Sin --desde/--hasta mantiene un horizonte móvil de 90 días a partir de hoy
+(pensado para el job nocturno). Cada veterinario activo con HorarioTrabajo se
+procesa en un pool de procesos; cada worker abre su propia conexión a la BD.
+Se respetan fecha_inicio_vigencia/fecha_fin_vigencia de cada horario.
+"""
+
+import time as time_module
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+HORIZONTE_DIAS = 90
+
+
+def _inicializar_worker():
+    """Cada proceso del pool configura Django y descarta conexiones heredadas"""
+    import django
+    django.setup()
+    from django.db import connections
+    connections.close_all()
+
+
+def _materializar_veterinario(veterinario_id, desde, hasta, duracion):
+    """Genera los slots de un veterinario. Se ejecuta dentro de un worker."""
+    from api.models import Veterinario
+    from api.slots import generar_slots_veterinario
+
+    veterinario = Veterinario.objects.select_related('trabajador').get(id=veterinario_id)
+    resultado = generar_slots_veterinario(
+        veterinario, desde, hasta, duracion, respetar_vigencia=True
+    )
+    resultado['veterinario'] = f"{veterinario.trabajador.nombres} {veterinario.trabajador.apellidos}"
+    return resultado
+
+
+def _parse_fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor} (formato esperado YYYY-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Genera los slots de tiempo de todos los veterinarios activos en un rango de fechas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde',
+            help='Fecha inicial YYYY-MM-DD (default: hoy)',
+        )
+        parser.add_argument(
+            '--hasta',
+            help=f'Fecha final YYYY-MM-DD (default: desde + {HORIZONTE_DIAS} días)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Número de procesos en paralelo (default: 1, sin pool)',
+        )
+        parser.add_argument(
+            '--duracion',
+            type=int,
+            default=30,
+            help='Duración de cada slot en minutos (default: 30)',
+        )
+
+    def handle(self, *args, **options):
+        desde = _parse_fecha(options['desde']) if options['desde'] else date.today()
+        hasta = _parse_fecha(options['hasta']) if options['hasta'] else desde + timedelta(days=HORIZONTE_DIAS)
+        workers = options['workers']
+        duracion = options['duracion']
+
+        if hasta < desde:
+            raise CommandError('--hasta debe ser posterior o igual a --desde')
+        if workers < 1:
+            raise CommandError('--workers debe ser al menos 1')
+        if duracion < 5:
+            raise CommandError('--duracion debe ser de al menos 5 minutos')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\n=== Materializar slots {desde} → {hasta} ({workers} worker(s)) ==='
+        ))
+
+        veterinario_ids = self._veterinarios_activos()
+        if not veterinario_ids:
+            self.stdout.write(self.style.WARNING('  No hay veterinarios activos con horarios de trabajo'))
+            return
+
+        t_inicio = time_module.perf_counter()
+        resultados = []
+
+        if workers == 1:
+            for veterinario_id in veterinario_ids:
+                resultados.append(self._reportar(
+                    _materializar_veterinario(veterinario_id, desde, hasta, duracion)
+                ))
+        else:
+            # Las conexiones abiertas no deben compartirse con los procesos hijos
+            from django.db import connections
+            connections.close_all()
+
+            with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker) as pool:
+                futuros = {
+                    pool.submit(_materializar_veterinario, veterinario_id, desde, hasta, duracion): veterinario_id
+                    for veterinario_id in veterinario_ids
+                }
+                for futuro in as_completed(futuros):
+                    try:
+                        resultados.append(self._reportar(futuro.result()))
+                    except Exception as e:
+                        self.stdout.write(self.style.ERROR(f'  Veterinario {futuros[futuro]}: ERROR ({e})'))
+
+        segundos = time_module.perf_counter() - t_inicio
+        creados = sum(r['slots_creados'] for r in resultados)
+        omitidos = sum(r['slots_omitidos'] for r in resultados)
+        throughput = creados / segundos if segundos > 0 else 0
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n{len(resultados)}/{len(veterinario_ids)} veterinarios procesados: '
+            f'{creados} slots creados, {omitidos} ya existían '
+            f'en {segundos:.2f}s ({throughput:.0f} slots/seg)\n'
+        ))
+
+    def _veterinarios_activos(self):
+        from api.choices import Estado
+        from api.models import Veterinario
+        return list(
+            Veterinario.objects.filter(
+                trabajador__estado=Estado.ACTIVO,
+                horarios_trabajo__activo=True
+            ).distinct().values_list('id', flat=True)
+        )
+
+    def _reportar(self, resultado):
+        self.stdout.write(
+            f"  {resultado['veterinario']}... "
+            + self.style.SUCCESS(
+                f"OK ({resultado['slots_creados']} nuevos, {resultado['slots_omitidos']} ya existían, "
+                f"{resultado['tiempos_ms']['total']} ms)"
+            )
+        )
+        return resultado
@@ -0,0 +1,49 @@
+"""
+Recalcula Producto.stock a partir del libro de movimientos (MovimientoStock).
+
+Uso:
+    python manage.py recalcular_stock
+    python manage.py recalcular_stock --dry-run
+
+Suma los movimientos de todos los productos con una sola consulta agregada y
+corrige los que no cuadran, dentro de una transacción. Útil para reparar el
+stock si se modificó la tabla de productos sin pasar por el ORM.
+"""
+
+import time as time_module
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el stock de los productos desde el libro de movimientos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Muestra los productos descuadrados sin modificarlos',
+        )
+
+    def handle(self, *args, **options):
+        from django.db import transaction
+        from api.inventario import recalcular_stock
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            '\n=== Recálculo de stock desde movimientos ==='
+        ))
+
+        t_inicio = time_module.perf_counter()
+        with transaction.atomic():
+            corregidos = recalcular_stock()
+            if options['dry_run']:
+                transaction.set_rollback(True)
+        segundos = time_module.perf_counter() - t_inicio
+
+        for producto, anterior, total in corregidos:
+            self.stdout.write(f'  {producto.nombre}: {anterior} -> {self.style.WARNING(str(total))}')
+
+        accion = 'descuadrados (sin cambios, --dry-run)' if options['dry_run'] else 'corregidos'
+        self.stdout.write(self.style.SUCCESS(
+            f'\n{len(corregidos)} productos {accion} en {segundos:.2f}s\n'
+        ))
@@ -0,0 +1,56 @@
+"""
+Reconstruye la proyección EstadoVacunaMascota desde el historial de vacunación.
+
+Uso:
+    python manage.py reconstruir_estados_vacunas
+    python manage.py reconstruir_estados_vacunas --fecha 2025-06-01
+
+Borra y vuelve a generar una fila por (mascota, vacuna) dentro de una sola
+transacción. Necesario una vez al desplegar la proyección (backfill) y útil
+para reparar la tabla si se modificó el historial sin pasar por el ORM.
+"""
+
+import time as time_module
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la proyección de estados de vacunación por mascota'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fecha',
+            help='Fecha de referencia YYYY-MM-DD para calcular los estados (default: hoy)',
+        )
+
+    def handle(self, *args, **options):
+        from django.db import transaction
+        from api.models import EstadoVacunaMascota
+        from api.proyeccion_vacunas import reconstruir
+
+        fecha = None
+        if options['fecha']:
+            try:
+                fecha = datetime.strptime(options['fecha'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f"Fecha inválida: {options['fecha']} (formato esperado YYYY-MM-DD)")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            '\n=== Reconstrucción de estados de vacunación ==='
+        ))
+
+        t_inicio = time_module.perf_counter()
+        with transaction.atomic():
+            pares = reconstruir(fecha)
+        segundos = time_module.perf_counter() - t_inicio
+
+        for estado, etiqueta in EstadoVacunaMascota.ESTADO_CHOICES:
+            cantidad = EstadoVacunaMascota.objects.filter(estado=estado).count()
+            if cantidad:
+                self.stdout.write(f'  {etiqueta}... {self.style.SUCCESS(str(cantidad))}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n{pares} pares mascota/vacuna reconstruidos en {segundos:.2f}s\n'
+        ))
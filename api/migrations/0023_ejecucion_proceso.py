@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:45
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_add_edad_maxima_semanas_to_vacuna'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EjecucionProceso',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nombre', models.CharField(help_text='Identificador del proceso (ej. actualizar_estados_vacunacion)', max_length=100, unique=True)),
+                ('ultima_ejecucion', models.DateTimeField(blank=True, help_text='Momento en que inició la última ejecución exitosa', null=True)),
+                ('fecha_referencia', models.DateField(blank=True, help_text="Fecha 'hoy' usada por la última ejecución exitosa", null=True)),
+                ('resultado', models.JSONField(blank=True, default=dict, help_text='Resumen de la última ejecución')),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Ejecución de Proceso',
+                'verbose_name_plural': 'Ejecuciones de Procesos',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:50
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_ejecucion_proceso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoVacunaMascota',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('dosis_numero', models.IntegerField(default=1)),
+                ('fecha_aplicacion', models.DateField(blank=True, help_text='Fecha de la última dosis aplicada', null=True)),
+                ('proxima_fecha', models.DateField(blank=True, help_text='Fecha esperada de la siguiente dosis', null=True)),
+                ('estado', models.CharField(choices=[('vigente', 'Vigente'), ('proxima', 'Próxima'), ('vencida', 'Vencida'), ('vencida_reinicio', 'Vencida - Protocolo Reiniciado'), ('completado', 'Completado'), ('aplicada', 'Aplicada')], default='vigente', max_length=20)),
+                ('es_obligatoria', models.BooleanField(default=False)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('historial', models.OneToOneField(blank=True, help_text='Registro del historial que define el estado actual', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='estado_proyectado', to='api.historialvacunacion')),
+                ('mascota', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estados_vacunas', to='api.mascota')),
+                ('vacuna', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estados_mascotas', to='api.vacuna')),
+            ],
+            options={
+                'verbose_name': 'Estado de Vacuna por Mascota',
+                'verbose_name_plural': 'Estados de Vacunas por Mascota',
+                'indexes': [models.Index(fields=['estado', 'proxima_fecha'], name='api_estadov_estado_16408f_idx'), models.Index(fields=['proxima_fecha'], name='api_estadov_proxima_370c6c_idx')],
+                'unique_together': {('mascota', 'vacuna')},
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:59
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+def registrar_stock_inicial(apps, schema_editor):
+    """El libro arranca con el stock actual de cada producto como movimiento inicial"""
+    Producto = apps.get_model('api', 'Producto')
+    MovimientoStock = apps.get_model('api', 'MovimientoStock')
+    MovimientoStock.objects.bulk_create([
+        MovimientoStock(id=uuid.uuid4(), producto_id=producto_id, tipo='inicial', cantidad=stock)
+        for producto_id, stock in Producto.objects.values_list('id', 'stock')
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_estado_vacuna_mascota'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('inicial', 'Stock inicial'), ('ajuste', 'Ajuste manual'), ('vacunacion', 'Aplicación de vacuna'), ('venta', 'Venta en cita'), ('devolucion', 'Devolución')], max_length=20)),
+                ('cantidad', models.IntegerField(help_text='Unidades: positivas para entradas, negativas para salidas')),
+                ('motivo', models.CharField(blank=True, max_length=255)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('historial_vacunacion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to='api.historialvacunacion')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='api.producto')),
+                ('servicio_adicional', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to='api.servicioadicional')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Stock',
+                'verbose_name_plural': 'Movimientos de Stock',
+                'ordering': ['-creado'],
+                'indexes': [models.Index(fields=['producto', 'creado'], name='api_movimie_product_8a5cfa_idx')],
+            },
+        ),
+        migrations.RunPython(registrar_stock_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-17 21:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_movimiento_stock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historialvacunacion',
+            index=models.Index(fields=['proxima_fecha', 'estado'], include=('id',), name='historial_alertas_idx'),
+        ),
+    ]
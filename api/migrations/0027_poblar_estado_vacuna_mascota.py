@@ -0,0 +1,87 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:10
+
+import uuid
+from datetime import date
+
+from django.db import migrations
+from django.utils import timezone
+
+TAMANO_LOTE = 500
+
+# Umbrales vigentes al crear la migración (api/estados_vacunacion.py). Se copian
+# aquí para que la migración no dependa del código actual de la app.
+DIAS_REINICIO = 180
+DIAS_PROXIMA = 30
+
+
+def calcular_estado(proxima_fecha, estado_registro, hoy):
+    """Misma regla que proyeccion_vacunas.calcular_estado al crear la migración"""
+    if estado_registro == 'completado':
+        return 'completado'
+    if not proxima_fecha:
+        return estado_registro or 'aplicada'
+
+    dias = (proxima_fecha - hoy).days
+    if dias < -DIAS_REINICIO:
+        return 'vencida_reinicio'
+    if dias < 0:
+        return 'vencida'
+    if dias <= DIAS_PROXIMA:
+        return 'proxima'
+    return 'vigente'
+
+
+def poblar_estados(apps, schema_editor):
+    """
+    Carga inicial de la proyección desde el historial (misma regla que
+    proyeccion_vacunas.reconstruir, con los modelos históricos): sin ella las
+    alertas leen una tabla vacía hasta correr reconstruir_estados_vacunas.
+    """
+    HistorialVacunacion = apps.get_model('api', 'HistorialVacunacion')
+    EstadoVacunaMascota = apps.get_model('api', 'EstadoVacunaMascota')
+
+    vigentes = {}
+    ultima_aplicacion = {}
+    registros = HistorialVacunacion.objects.order_by().values(
+        'id', 'mascota_id', 'vacuna_id', 'dosis_numero', 'fecha_aplicacion',
+        'proxima_fecha', 'estado', 'creado', 'vacuna__es_obligatoria'
+    )
+    for registro in registros.iterator(chunk_size=2000):
+        par = (registro['mascota_id'], registro['vacuna_id'])
+        clave = (registro['proxima_fecha'] or date.min, registro['dosis_numero'], registro['creado'])
+        actual = vigentes.get(par)
+        if actual is None or clave > actual[0]:
+            vigentes[par] = (clave, registro)
+        fecha = registro['fecha_aplicacion']
+        if fecha and (par not in ultima_aplicacion or fecha > ultima_aplicacion[par]):
+            ultima_aplicacion[par] = fecha
+
+    hoy = date.today()
+    ahora = timezone.now()
+    EstadoVacunaMascota.objects.all().delete()
+    EstadoVacunaMascota.objects.bulk_create([
+        EstadoVacunaMascota(
+            id=uuid.uuid4(),
+            mascota_id=par[0],
+            vacuna_id=par[1],
+            historial_id=registro['id'],
+            dosis_numero=registro['dosis_numero'],
+            fecha_aplicacion=ultima_aplicacion.get(par),
+            proxima_fecha=registro['proxima_fecha'],
+            estado=calcular_estado(registro['proxima_fecha'], registro['estado'], hoy),
+            es_obligatoria=registro['vacuna__es_obligatoria'],
+            actualizado=ahora,
+        )
+        for par, (_, registro) in vigentes.items()
+    ], batch_size=TAMANO_LOTE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_historial_alertas_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(poblar_estados, migrations.RunPython.noop),
+    ]
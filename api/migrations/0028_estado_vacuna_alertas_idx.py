@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_poblar_estado_vacuna_mascota'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='historialvacunacion',
+            name='historial_alertas_idx',
+        ),
+        migrations.AddIndex(
+            model_name='estadovacunamascota',
+            index=models.Index(condition=models.Q(('estado__in', ['vencida', 'vencida_reinicio', 'proxima'])), fields=['proxima_fecha', 'historial'], include=('estado',), name='estado_vacuna_alertas_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:30
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_estado_vacuna_alertas_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCache',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('clave', models.CharField(help_text='Identificador de la caché (ej. permisos, disponibilidad:<veterinario_id>)', max_length=100, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Versión de Caché',
+                'verbose_name_plural': 'Versiones de Caché',
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-17 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_version_cache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['fecha', 'hora', 'id'], name='cita_orden_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialmedico',
+            index=models.Index(fields=['mascota', '-fecha', 'id'], name='historial_med_mascota_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialmedico',
+            index=models.Index(fields=['tipo', '-fecha', 'id'], name='historial_med_tipo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialvacunacion',
+            index=models.Index(fields=['-fecha_aplicacion', 'id'], name='historial_vac_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialvacunacion',
+            index=models.Index(fields=['mascota', '-fecha_aplicacion', 'id'], name='historial_vac_mascota_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialvacunacion',
+            index=models.Index(fields=['proxima_fecha', 'id'], name='historial_vac_proxima_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(fields=['nombreMascota', 'id'], name='mascota_orden_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='responsable',
+            index=models.Index(fields=['nombres', 'id'], name='responsable_orden_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='slottiempo',
+            index=models.Index(fields=['fecha', 'hora_inicio', 'id'], name='slot_orden_idx'),
+        ),
+    ]
@@ -231,6 +231,9 @@ class Responsable(models.Model):
 
     class Meta:
         ordering = ['nombres']
+        indexes = [
+            models.Index(fields=['nombres', 'id'], name='responsable_orden_idx'),
+        ]
         constraints = [
             # Documento único por tipo de documento
             models.UniqueConstraint(
@@ -358,6 +361,9 @@ class Mascota(models.Model):
     class Meta:
         ordering = ['nombreMascota']
         unique_together = ('nombreMascota', 'responsable')
+        indexes = [
+            models.Index(fields=['nombreMascota', 'id'], name='mascota_orden_idx'),
+        ]
 
     def clean(self):
         super().clean()
@@ -483,6 +489,64 @@ class Producto(models.Model):
     def __str__(self):
         return self.nombre
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Stock leído de la BD: los ajustes manuales se registran contra este valor
+        instancia._stock_cargado = instancia.__dict__.get('stock')
+        return instancia
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using, fields, **kwargs)
+        if fields is None or 'stock' in fields:
+            self._stock_cargado = self.stock
+
+
+class MovimientoStock(models.Model):
+    """
+    Libro de movimientos de inventario: Producto.stock es la suma de `cantidad`
+    de sus movimientos (entradas positivas, salidas negativas)
+    """
+    TIPO_CHOICES = [
+        ('inicial', 'Stock inicial'),
+        ('ajuste', 'Ajuste manual'),
+        ('vacunacion', 'Aplicación de vacuna'),
+        ('venta', 'Venta en cita'),
+        ('devolucion', 'Devolución'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='movimientos')
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    cantidad = models.IntegerField(help_text="Unidades: positivas para entradas, negativas para salidas")
+    historial_vacunacion = models.ForeignKey(
+        'HistorialVacunacion',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='movimientos_stock'
+    )
+    servicio_adicional = models.ForeignKey(
+        'ServicioAdicional',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='movimientos_stock'
+    )
+    motivo = models.CharField(max_length=255, blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-creado']
+        verbose_name = 'Movimiento de Stock'
+        verbose_name_plural = 'Movimientos de Stock'
+        indexes = [
+            models.Index(fields=['producto', 'creado']),
+        ]
+
+    def __str__(self):
+        return f"{self.producto.nombre} {self.cantidad:+d} ({self.tipo})"
+
 # Crear el modelo de Servicio
 class Servicio(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -566,6 +630,20 @@ class Servicio(models.Model):
     def __str__(self):
         return f"{self.nombre} (${self.precio} - {self.duracion_minutos}min)"
 
+    # Campos que determinan el bloque que ocupa una cita en los mapas de disponibilidad
+    CAMPOS_AGENDA = ('duracion_minutos', 'tiempo_preparacion', 'tiempo_limpieza', 'permite_overlap')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._agenda_cargada = instancia.valores_agenda()
+        return instancia
+
+    def valores_agenda(self):
+        """Valores actuales de CAMPOS_AGENDA (None si alguno no está cargado)"""
+        valores = tuple(self.__dict__.get(campo, None) for campo in self.CAMPOS_AGENDA)
+        return None if None in valores else valores
+
     def duracion_total_minutos(self):
         """Duración total incluyendo preparación y limpieza"""
         return self.duracion_minutos + self.tiempo_preparacion + self.tiempo_limpieza
@@ -640,6 +718,10 @@ class Cita(models.Model):
 
     class Meta:
         ordering = ['fecha', 'hora']
+        indexes = [
+            # Orden de los listados paginados por cursor (clave completada con id)
+            models.Index(fields=['fecha', 'hora', 'id'], name='cita_orden_idx'),
+        ]
         # Constraint único: Un veterinario no puede tener 2 citas a la misma hora
         constraints = [
             models.UniqueConstraint(
@@ -652,6 +734,13 @@ class Cita(models.Model):
     def __str__(self):
         return f"{self.fecha} {self.hora} — {self.mascota} ({self.get_estado_display()})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Veterinario leído de la BD: si la cita se reasigna, sus mapas también cambian
+        instancia._veterinario_cargado = instancia.__dict__.get('veterinario_id')
+        return instancia
+
     def validar_horario_trabajo(self):
         """
         Valida que la cita esté dentro del horario de trabajo del veterinario.
@@ -879,6 +968,12 @@ class HorarioTrabajo(models.Model):
     def __str__(self):
         return f"{self.veterinario} - {self.get_dia_semana_display()}: {self.hora_inicio}-{self.hora_fin}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._veterinario_cargado = instancia.__dict__.get('veterinario_id')
+        return instancia
+
 
 class SlotTiempo(models.Model):
     """
@@ -959,6 +1054,8 @@ class SlotTiempo(models.Model):
         indexes = [
             models.Index(fields=['fecha', 'disponible']),
             models.Index(fields=['veterinario', 'fecha']),
+            # Orden de los listados paginados por cursor (clave completada con id)
+            models.Index(fields=['fecha', 'hora_inicio', 'id'], name='slot_orden_idx'),
         ]
 
     def __str__(self):
@@ -1135,6 +1232,12 @@ class HistorialVacunacion(models.Model):
         ordering = ['-fecha_aplicacion']
         verbose_name = 'Historial de Vacunación'
         verbose_name_plural = 'Historiales de Vacunación'
+        indexes = [
+            # Orden de los listados paginados por cursor (clave completada con id)
+            models.Index(fields=['-fecha_aplicacion', 'id'], name='historial_vac_fecha_idx'),
+            models.Index(fields=['mascota', '-fecha_aplicacion', 'id'], name='historial_vac_mascota_idx'),
+            models.Index(fields=['proxima_fecha', 'id'], name='historial_vac_proxima_idx'),
+        ]
 
     def __str__(self):
         return f"{self.mascota} - {self.vacuna} ({self.fecha_aplicacion})"
@@ -1156,6 +1259,77 @@ class HistorialVacunacion(models.Model):
         return None
 
 
+class EstadoVacunaMascota(models.Model):
+    """
+    Proyección del estado de vacunación: una fila por (mascota, vacuna).
+    Se mantiene desde api/proyeccion_vacunas.py al registrar o modificar dosis;
+    las alertas y listados leen de aquí en vez de recalcular sobre el historial.
+    """
+    ESTADO_CHOICES = [
+        ('vigente', 'Vigente'),
+        ('proxima', 'Próxima'),
+        ('vencida', 'Vencida'),
+        ('vencida_reinicio', 'Vencida - Protocolo Reiniciado'),
+        ('completado', 'Completado'),
+        ('aplicada', 'Aplicada'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    mascota = models.ForeignKey(
+        'Mascota',
+        on_delete=models.CASCADE,
+        related_name='estados_vacunas'
+    )
+    vacuna = models.ForeignKey(
+        'Vacuna',
+        on_delete=models.CASCADE,
+        related_name='estados_mascotas'
+    )
+    historial = models.OneToOneField(
+        'HistorialVacunacion',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='estado_proyectado',
+        help_text="Registro del historial que define el estado actual"
+    )
+    dosis_numero = models.IntegerField(default=1)
+    fecha_aplicacion = models.DateField(
+        null=True, blank=True,
+        help_text="Fecha de la última dosis aplicada"
+    )
+    proxima_fecha = models.DateField(
+        null=True, blank=True,
+        help_text="Fecha esperada de la siguiente dosis"
+    )
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADO_CHOICES,
+        default='vigente'
+    )
+    es_obligatoria = models.BooleanField(default=False)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['mascota', 'vacuna']
+        indexes = [
+            models.Index(fields=['estado', 'proxima_fecha']),
+            models.Index(fields=['proxima_fecha']),
+            # Alertas paginadas: solo filas en alerta, en el orden del keyset (proxima_fecha, historial_id)
+            models.Index(
+                fields=['proxima_fecha', 'historial'],
+                include=['estado'],
+                condition=models.Q(estado__in=['vencida', 'vencida_reinicio', 'proxima']),
+                name='estado_vacuna_alertas_idx'
+            ),
+        ]
+        verbose_name = 'Estado de Vacuna por Mascota'
+        verbose_name_plural = 'Estados de Vacunas por Mascota'
+
+    def __str__(self):
+        return f"{self.mascota} - {self.vacuna}: {self.estado}"
+
+
 class HistorialMedico(models.Model):
     """
     Historial médico completo por mascota (consultas, tratamientos, etc.)
@@ -1243,6 +1417,11 @@ class HistorialMedico(models.Model):
         ordering = ['-fecha']
         verbose_name = 'Historial Médico'
         verbose_name_plural = 'Historiales Médicos'
+        indexes = [
+            # Orden de los listados paginados por cursor (clave completada con id)
+            models.Index(fields=['mascota', '-fecha', 'id'], name='historial_med_mascota_idx'),
+            models.Index(fields=['tipo', '-fecha', 'id'], name='historial_med_tipo_idx'),
+        ]
 
     def __str__(self):
         return f"{self.mascota} - {self.get_tipo_display()} ({self.fecha.strftime('%d/%m/%Y')})"
@@ -1301,3 +1480,62 @@ class PermisoRol(models.Model):
         return f"{self.rol} - {self.modulo}"
 
 
+
+
+class EjecucionProceso(models.Model):
+    """
+    Marca de agua de los procesos batch (management commands).
+    Guarda cuándo corrió cada proceso por última vez para que la siguiente
+    ejecución procese solo lo que cambió desde entonces.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    nombre = models.CharField(
+        max_length=100,
+        unique=True,
+        help_text="Identificador del proceso (ej. actualizar_estados_vacunacion)"
+    )
+    ultima_ejecucion = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Momento en que inició la última ejecución exitosa"
+    )
+    fecha_referencia = models.DateField(
+        null=True, blank=True,
+        help_text="Fecha 'hoy' usada por la última ejecución exitosa"
+    )
+    resultado = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Resumen de la última ejecución"
+    )
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Ejecución de Proceso'
+        verbose_name_plural = 'Ejecuciones de Procesos'
+
+    def __str__(self):
+        return f"{self.nombre} ({self.ultima_ejecucion})"
+
+
+class VersionCache(models.Model):
+    """
+    Contador de versión de una caché derivada (matriz de permisos, mapas de
+    disponibilidad). Vive en la BD para que todos los procesos vean la misma
+    versión: cada proceso guarda su copia en memoria y la descarta cuando el
+    contador cambia. Ver api/versiones.py.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    clave = models.CharField(
+        max_length=100,
+        unique=True,
+        help_text="Identificador de la caché (ej. permisos, disponibilidad:<veterinario_id>)"
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Versión de Caché'
+        verbose_name_plural = 'Versiones de Caché'
+
+    def __str__(self):
+        return f"{self.clave} v{self.version}"
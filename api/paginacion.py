@@ -0,0 +1,222 @@
+"""
+Paginación por cursor opcional.
+
+Los listados siguen devolviendo la tabla completa salvo que el cliente lo pida
+con la cabecera `X-Paginacion: cursor` o el parámetro `?paginar=cursor` (el
+parámetro `cursor` de los enlaces next/previous también la activa). En ese
+modo la respuesta es {next, previous, results} y el tamaño de página se elige
+con `?page_size=` hasta PAGINACION_TAMANO_MAXIMO.
+
+Se respeta el orden del queryset (su order_by o el `ordering` del modelo) y se
+completa con la clave primaria para que la clave sea única: por ejemplo
+(proxima_fecha, id) en las vacunas vencidas o (fecha, hora_inicio, id) en los
+slots disponibles. El cursor guarda la clave completa de la última fila y la
+página siguiente se filtra con "clave > cursor", sin OFFSET, sobre los índices
+que siguen ese mismo orden. Los NULL se ordenan como el mayor valor (como hace
+PostgreSQL por defecto), de forma explícita para que el orden y el filtro del
+cursor coincidan en cualquier motor. Si el orden no se puede expresar como
+clave (campos de relaciones, expresiones) se devuelve la lista completa.
+"""
+
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.response import Response
+
+from .campos_dinamicos import optimizar_queryset
+
+CABECERA = 'X-Paginacion'
+PARAMETRO = 'paginar'
+MODO_CURSOR = 'cursor'
+TAMANO_MAXIMO_DEFECTO = 200
+
+
+def paginacion_solicitada(request):
+    modo = request.headers.get(CABECERA) or request.query_params.get(PARAMETRO)
+    return (modo or '').lower() == MODO_CURSOR or 'cursor' in request.query_params
+
+
+def orden_queryset(queryset):
+    """Orden efectivo del queryset: su order_by o, si no tiene, el del modelo"""
+    if queryset.query.order_by:
+        return tuple(queryset.query.order_by)
+    if queryset.query.default_ordering:
+        return tuple(queryset.model._meta.ordering)
+    return ()
+
+
+def clave_orden(queryset):
+    """
+    [(campo, descendente)] del orden del queryset completado con la clave
+    primaria, o None si algún término no es un campo propio del modelo.
+    """
+    meta = queryset.model._meta
+    clave = []
+    for termino in orden_queryset(queryset):
+        if not isinstance(termino, str) or '__' in termino or termino == '?':
+            return None
+        nombre = termino.lstrip('-')
+        try:
+            campo = meta.pk if nombre == 'pk' else meta.get_field(nombre)
+        except FieldDoesNotExist:
+            return None
+        if not campo.concrete or campo.many_to_many:
+            return None
+        clave.append((campo, termino.startswith('-')))
+        if campo.primary_key:
+            return clave
+    clave.append((meta.pk, False))
+    return clave
+
+
+def _orden_sql(campo, descendente):
+    if not campo.null:
+        return F(campo.attname).desc() if descendente else F(campo.attname).asc()
+    # NULL como el mayor valor: al final en ascendente, al principio en descendente
+    if descendente:
+        return F(campo.attname).desc(nulls_first=True)
+    return F(campo.attname).asc(nulls_last=True)
+
+
+def _despues_de(campo, descendente, valor):
+    """Condición 'posterior a valor' en un campo, o None si ninguna fila lo es"""
+    nombre = campo.attname
+    if valor is None:
+        return Q(**{f'{nombre}__isnull': False}) if descendente else None
+    if descendente:
+        return Q(**{f'{nombre}__lt': valor})
+    posterior = Q(**{f'{nombre}__gt': valor})
+    return posterior | Q(**{f'{nombre}__isnull': True}) if campo.null else posterior
+
+
+def _igual_a(campo, valor):
+    if valor is None:
+        return Q(**{f'{campo.attname}__isnull': True})
+    return Q(**{campo.attname: valor})
+
+
+def filtro_posteriores(clave, posicion):
+    """Filas con clave lexicográficamente posterior a la posición"""
+    (campo, descendente), resto = clave[0], clave[1:]
+    condicion = _despues_de(campo, descendente, posicion[0])
+    if resto:
+        empate = _igual_a(campo, posicion[0]) & filtro_posteriores(resto, posicion[1:])
+        condicion = empate if condicion is None else condicion | empate
+    return condicion if condicion is not None else Q(pk__in=[])
+
+
+class PaginacionCursorOpcional(CursorPagination):
+    """
+    CursorPagination que solo pagina cuando el cliente lo solicita y usa como
+    cursor la clave completa del orden del queryset
+    """
+    ordering = 'pk'
+    page_size_query_param = 'page_size'
+
+    @property
+    def max_page_size(self):
+        return getattr(settings, 'PAGINACION_TAMANO_MAXIMO', TAMANO_MAXIMO_DEFECTO)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not paginacion_solicitada(request):
+            return None
+        clave = clave_orden(queryset)
+        if clave is None:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.clave = clave
+        self.ordering = tuple(('-' if descendente else '') + campo.attname for campo, descendente in clave)
+        self.cursor = self.decode_cursor(request)
+        posicion = self._decodificar_posicion(self.cursor.position) if self.cursor else None
+        reverso = bool(self.cursor and self.cursor.reverse)
+
+        # La página anterior se lee en el orden inverso desde el cursor
+        recorrido = [(campo, descendente != reverso) for campo, descendente in clave]
+        queryset = queryset.order_by(*[_orden_sql(campo, descendente) for campo, descendente in recorrido])
+        if posicion is not None:
+            queryset = queryset.filter(filtro_posteriores(recorrido, posicion))
+
+        filas = list(queryset[:self.page_size + 1])
+        hay_mas = len(filas) > self.page_size
+        self.page = filas[:self.page_size]
+        if reverso:
+            self.page.reverse()
+            self.has_previous, self.has_next = hay_mas, posicion is not None
+        else:
+            self.has_previous, self.has_next = posicion is not None, hay_mas
+
+        # Página vacía junto a un extremo: los enlaces van al principio o al final de la lista
+        self.previous_position = self._posicion(self.page[0]) if self.page else None
+        self.next_position = self._posicion(self.page[-1]) if self.page else None
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _posicion(self, fila):
+        valores = []
+        for campo, _ in self.clave:
+            valor = fila[campo.attname] if isinstance(fila, dict) else getattr(fila, campo.attname)
+            valores.append(None if valor is None else str(valor))
+        return json.dumps(valores)
+
+    def _decodificar_posicion(self, posicion):
+        try:
+            valores = json.loads(posicion)
+            if not isinstance(valores, list) or len(valores) != len(self.clave):
+                raise ValueError
+            return [
+                None if valor is None else campo.to_python(valor)
+                for (campo, _), valor in zip(self.clave, valores)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.previous_position))
+
+
+def paginar(vista, queryset, serializer_class=None):
+    """
+    Para acciones que envuelven la lista en su propio formato ({'data': ...}):
+    devuelve (filas, paginacion), con paginacion = {next, previous} si se
+    solicitó el modo cursor o None (y todas las filas) en caso contrario.
+    """
+    queryset = optimizar_queryset(queryset, vista.request, serializer_class or vista.get_serializer_class())
+    pagina = vista.paginate_queryset(queryset)
+    if pagina is None:
+        return queryset, None
+    return pagina, {
+        'next': vista.paginator.get_next_link(),
+        'previous': vista.paginator.get_previous_link(),
+    }
+
+
+def responder_lista(vista, queryset, serializer_class=None):
+    """
+    Respuesta de una acción de listado de un ViewSet: paginada por cursor si
+    se solicitó, la lista completa (como hasta ahora) en caso contrario.
+    """
+    queryset = optimizar_queryset(queryset, vista.request, serializer_class or vista.get_serializer_class())
+    pagina = vista.paginate_queryset(queryset)
+    datos = pagina if pagina is not None else queryset
+    if serializer_class is not None:
+        serializer = serializer_class(datos, many=True, context=vista.get_serializer_context())
+    else:
+        serializer = vista.get_serializer(datos, many=True)
+    if pagina is not None:
+        return vista.get_paginated_response(serializer.data)
+    return Response(serializer.data)
@@ -4,10 +4,160 @@ Sistema de permisos por rol para Veterinaria Huellitas
 Define qué puede ver y hacer cada rol en el sistema.
 """
 
-from rest_framework import permissions
+from threading import Lock
+
+from django.conf import settings
+from rest_framework import exceptions, permissions
 from .choices import Rol
 
 
+# 🔐 MATRIZ DE PERMISOS EN MEMORIA
+# Todas las filas de PermisoRol se cargan una vez por proceso en un dict
+# {(rol, modulo): permisos}. La versión es un contador en la BD (VersionCache,
+# ver api/versiones.py): los signals de PermisoRol y las acciones masivas lo
+# incrementan y cada proceso recarga la matriz cuando lee una versión distinta
+# a la suya. Para no consultar la BD en cada request, cada proceso relee el
+# contador como mucho cada PERMISOS_SEGUNDOS_VERIFICACION segundos: una
+# revocación rige en el proceso que la hizo de inmediato y en los demás
+# workers dentro de ese plazo.
+CLAVE_VERSION_PERMISOS = 'permisos'
+
+_matriz = {'version': None, 'permisos': {}}
+_matriz_lock = Lock()
+
+
+def version_permisos(minima=None):
+    """Versión vigente de los permisos (releída de la BD como mucho cada N segundos)"""
+    from .versiones import version_reciente
+    return version_reciente(
+        CLAVE_VERSION_PERMISOS, getattr(settings, 'PERMISOS_SEGUNDOS_VERIFICACION', 5), minima=minima
+    )
+
+
+def invalidar_permisos():
+    """Fuerza la recarga de la matriz en todos los procesos"""
+    from .versiones import incrementar
+    incrementar(CLAVE_VERSION_PERMISOS)
+
+
+def _cargar_matriz():
+    from .models import PermisoRol as PermisoRolModel
+    return {
+        (rol.lower(), modulo): permisos_modulo
+        for rol, modulo, permisos_modulo in PermisoRolModel.objects.order_by().values_list('rol', 'modulo', 'permisos')
+    }
+
+
+def matriz_permisos(version=None):
+    """
+    Matriz {(rol en minúsculas, modulo): permisos} vigente. `version` evita
+    volver a leer el contador si quien llama ya lo tiene.
+    """
+    if version is None:
+        version = version_permisos()
+    if _matriz['version'] != version:
+        permisos = _cargar_matriz()
+        with _matriz_lock:
+            _matriz['permisos'] = permisos
+            _matriz['version'] = version
+    return _matriz['permisos']
+
+
+def permisos_modulo_db(rol, modulo, matriz=None):
+    """Permisos configurados en BD para (rol, modulo), o None si no hay fila"""
+    if matriz is None:
+        matriz = matriz_permisos()
+    return matriz.get(((rol or '').lower(), modulo))
+
+
+# 🎫 PERMISOS EMBEBIDOS EN EL TOKEN JWT
+# Cada (modulo, accion) ocupa un bit fijo; el access token lleva el mapa de bits
+# en hexadecimal ('perm') junto con la versión de permisos con la que se emitió
+# ('perm_v'). Agregar acciones solo al final para no mover los bits existentes.
+MODULOS_ACCIONES = {
+    'dashboard':         ['ver'],
+    'mascotas':          ['ver', 'crear', 'editar', 'eliminar'],
+    'historial_clinico': ['ver', 'crear', 'editar'],
+    'citas':             ['ver', 'crear', 'editar', 'eliminar', 'calendario_general', 'mi_calendario'],
+    'vacunas':           ['ver', 'crear', 'editar', 'eliminar', 'aplicar', 'historial'],
+    'trabajadores':      ['ver', 'crear', 'editar', 'eliminar'],
+    'productos':         ['ver', 'crear', 'editar', 'eliminar'],
+    'servicios':         ['ver', 'crear', 'editar', 'eliminar'],
+    'configuracion':     ['ver', 'editar'],
+}
+BITS_PERMISOS = {
+    (modulo, accion): bit
+    for bit, (modulo, accion) in enumerate(
+        (modulo, accion) for modulo, acciones in MODULOS_ACCIONES.items() for accion in acciones
+    )
+}
+
+
+def permisos_en_token():
+    return getattr(settings, 'PERMISOS_EN_TOKEN', False)
+
+
+class PermisosDesactualizados(exceptions.AuthenticationFailed):
+    """El token se emitió con otra versión de permisos o con otro rol: hay que refrescarlo"""
+    default_detail = 'Los permisos cambiaron. Refresca el token de acceso.'
+    default_code = 'permisos_desactualizados'
+
+
+def bitmap_permisos(rol, version=None):
+    """Mapa de bits de todas las acciones permitidas para el rol"""
+    rol_normalizado = (rol or '').lower()
+    matriz = matriz_permisos(version)
+    bitmap = 0
+    for (modulo, accion), bit in BITS_PERMISOS.items():
+        if rol_normalizado == Rol.ADMINISTRADOR or PermisosPorRol.puede(rol_normalizado, modulo, accion, matriz=matriz):
+            bitmap |= 1 << bit
+    return bitmap
+
+
+def claims_permisos(usuario):
+    """
+    Claims que se agregan al token: mapa de permisos, versión y los ids de
+    trabajador/veterinario (una sola consulta)
+    """
+    from .models import Trabajador
+
+    ids = Trabajador.objects.filter(usuario=usuario).values_list('id', 'veterinario__id').first()
+    trabajador_id, veterinario_id = ids if ids else (None, None)
+    # La versión se lee antes que la matriz: si cambia en medio, el token
+    # queda con la versión anterior y se rechaza (nunca al revés)
+    version = version_permisos()
+    return {
+        'rol': usuario.rol,
+        'perm': format(bitmap_permisos(usuario.rol, version), 'x'),
+        'perm_v': version,
+        'trabajador_id': str(trabajador_id) if trabajador_id else None,
+        'veterinario_id': str(veterinario_id) if veterinario_id else None,
+    }
+
+
+def permiso_desde_token(request, modulo, accion):
+    """
+    Autoriza con los claims del access token sin cargar la matriz ni consultar
+    la BD: la versión del token se compara con la versión reciente del proceso.
+    Devuelve None (se resuelve con la matriz) si el token no trae permisos o la
+    acción no tiene bit asignado.
+    """
+    token = getattr(request, 'auth', None)
+    if not permisos_en_token() or token is None or 'perm' not in token:
+        return None
+    bit = BITS_PERMISOS.get((modulo, accion))
+    if bit is None:
+        return None
+    version_token = token.get('perm_v')
+    if not isinstance(version_token, int) or token.get('rol') != request.user.rol:
+        raise PermisosDesactualizados()
+    # Un token más nuevo que la versión guardada lo emitió otro proceso tras
+    # una invalidación: se relee la versión en lugar de rechazarlo
+    if version_token != version_permisos(minima=version_token):
+        raise PermisosDesactualizados()
+    return bool(int(token['perm'], 16) >> bit & 1)
+
+
 class PermisosPorRol:
     """
     Definición de permisos por rol para el frontend
@@ -79,16 +229,15 @@ class PermisosPorRol:
         Obtiene los permisos de un rol específico.
         PRIORIDAD: Base de datos > Diccionario hardcodeado
         """
-        # Primero intentar obtener de la base de datos
+        # Primero intentar obtener de la base de datos (matriz cacheada)
         try:
-            from .models import PermisoRol as PermisoRolModel
-            permisos_db = PermisoRolModel.objects.filter(rol=rol)
-
-            if permisos_db.exists():
-                # Convertir QuerySet a diccionario
-                permisos_dict = {}
-                for permiso in permisos_db:
-                    permisos_dict[permiso.modulo] = permiso.permisos
+            rol_normalizado = (rol or '').lower()
+            permisos_dict = {
+                modulo: permisos
+                for (rol_db, modulo), permisos in matriz_permisos().items()
+                if rol_db == rol_normalizado
+            }
+            if permisos_dict:
                 return permisos_dict
         except Exception as e:
             # Si falla (ej: tabla no existe), usar diccionario hardcodeado
@@ -98,7 +247,7 @@ class PermisosPorRol:
         return cls.PERMISOS.get(rol, {})
 
     @classmethod
-    def puede(cls, rol, modulo, accion='ver'):
+    def puede(cls, rol, modulo, accion='ver', matriz=None):
         """
         Verifica si un rol puede realizar una acción en un módulo.
         PRIORIDAD: Base de datos > Diccionario hardcodeado
@@ -107,17 +256,16 @@ class PermisosPorRol:
             rol: El rol del usuario (admin, veterinario, recepcionista)
             modulo: El módulo a verificar (citas, mascotas, etc.)
             accion: La acción a verificar (ver, crear, editar, eliminar)
+            matriz: Matriz de permisos ya cargada (para consultar muchas acciones)
 
         Returns:
             bool: True si tiene permiso, False si no
         """
-        # Primero intentar obtener de la base de datos
+        # Primero intentar obtener de la base de datos (matriz cacheada)
         try:
-            from .models import PermisoRol as PermisoRolModel
-            permiso_db = PermisoRolModel.objects.filter(rol=rol, modulo=modulo).first()
+            permisos_modulo = permisos_modulo_db(rol, modulo, matriz)
 
-            if permiso_db:
-                permisos_modulo = permiso_db.permisos
+            if permisos_modulo is not None:
                 if isinstance(permisos_modulo, dict):
                     return permisos_modulo.get(accion, False)
         except Exception as e:
@@ -237,16 +385,17 @@ def make_permiso_api(modulo_nombre):
 
             accion = ACCION_MAP.get(request.method, 'ver')
 
-            # Consultar PermisoRol en BD (case-insensitive, prioridad sobre dict)
+            # Mapa de permisos del token (sin BD); si no aplica, se resuelve con la matriz
+            permitido = permiso_desde_token(request, self.modulo, accion)
+            if permitido is not None:
+                return permitido
+
+            # PermisoRol desde la matriz en memoria (case-insensitive, prioridad sobre dict)
             try:
-                from .models import PermisoRol as PermisoRolModel
-                permiso = PermisoRolModel.objects.filter(
-                    rol__iexact=request.user.rol,
-                    modulo=self.modulo
-                ).first()
-
-                if permiso:
-                    return permiso.permisos.get(accion, False)
+                permisos_modulo = permisos_modulo_db(request.user.rol, self.modulo)
+
+                if permisos_modulo is not None:
+                    return permisos_modulo.get(accion, False)
             except Exception:
                 pass
 
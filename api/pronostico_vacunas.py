@@ -0,0 +1,156 @@
+"""
+Pronóstico semanal de demanda de vacunas para planificar el inventario.
+
+La demanda sale de tres fuentes, todas agregadas en SQL (sin recorrer mascotas
+en Python):
+  1. Próximas dosis pendientes: proyección EstadoVacunaMascota agrupada por
+     (vacuna, semana de proxima_fecha, dosis).
+  2. Dosis restantes del protocolo: cada grupo anterior se expande con los
+     intervalos del protocolo compilado (una iteración por grupo, no por mascota).
+  3. Cachorros que alcanzan edad_minima_semanas dentro del horizonte: mascotas
+     agrupadas por (especie, semana de nacimiento).
+El resultado se compara con Producto.stock vía Vacuna.producto_inventario.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db.models import BooleanField, Count, ExpressionWrapper, Q
+from django.db.models.functions import TruncWeek
+
+from .models import EstadoVacunaMascota, Mascota, Vacuna
+from .protocolos import obtener_protocolo
+
+SEMANAS_DEFECTO = 12
+SEMANAS_MAXIMO = 52
+
+
+def _lunes(fecha):
+    return fecha - timedelta(days=fecha.weekday())
+
+
+def _como_fecha(valor):
+    # TruncWeek devuelve datetime en algunos backends
+    return valor.date() if hasattr(valor, 'date') and callable(valor.date) else valor
+
+
+def _expandir(demanda, protocolo, variante, semana, dosis, cantidad, fin):
+    """
+    Suma `cantidad` dosis en `semana` y en las semanas de las dosis siguientes
+    del protocolo (y refuerzos) que caen antes de `fin`.
+    """
+    fecha = semana
+    while fecha < fin:
+        demanda[_lunes(fecha)] += cantidad
+        siguiente, es_final, _ = protocolo.proxima_fecha(fecha, dosis, variante)
+        if siguiente <= fecha:
+            break
+        fecha = siguiente
+        if not es_final:
+            dosis += 1
+
+
+def pronosticar(semanas=SEMANAS_DEFECTO, hoy=None):
+    """
+    Demanda semanal de dosis por vacuna activa en las próximas `semanas`.
+
+    Returns:
+        (inicio, fin, lista de dicts por vacuna con semanas, totales y comparación con stock)
+    """
+    hoy = hoy or date.today()
+    inicio = _lunes(hoy)
+    fin = inicio + timedelta(weeks=semanas)
+
+    vacunas = {
+        v.id: v for v in Vacuna.objects.filter(estado__iexact='activo').select_related('producto_inventario')
+    }
+    protocolos = {vacuna_id: obtener_protocolo(v) for vacuna_id, v in vacunas.items()}
+    demanda = {vacuna_id: defaultdict(int) for vacuna_id in vacunas}
+    atrasadas = defaultdict(int)
+
+    # 1 y 2. Dosis pendientes (incluye vencidas recientes) agrupadas por semana y dosis
+    pendientes = EstadoVacunaMascota.objects.filter(
+        vacuna_id__in=vacunas.keys(),
+        mascota__estado='Activo',
+        estado__in=['vencida', 'proxima', 'vigente', 'aplicada'],
+        proxima_fecha__lt=fin
+    ).annotate(
+        semana=TruncWeek('proxima_fecha'),
+        pendiente=ExpressionWrapper(Q(historial__fecha_aplicacion__isnull=True), output_field=BooleanField())
+    ).values(
+        'vacuna_id', 'semana', 'dosis_numero', 'pendiente'
+    ).annotate(cantidad=Count('id')).order_by()
+
+    for grupo in pendientes:
+        vacuna_id = grupo['vacuna_id']
+        protocolo = protocolos[vacuna_id]
+        semana = _como_fecha(grupo['semana'])
+        cantidad = grupo['cantidad']
+        # Registro aplicado: proxima_fecha es de la dosis siguiente; pendiente: de la misma dosis
+        dosis = grupo['dosis_numero']
+        if not grupo['pendiente']:
+            dosis = min(dosis + 1, protocolo.adulto.dosis_total)
+        if semana < inicio:
+            # Vencidas sin aplicar: se cuentan como demanda inmediata
+            atrasadas[vacuna_id] += cantidad
+            semana = inicio
+        _expandir(demanda[vacuna_id], protocolo, protocolo.adulto, semana, dosis, cantidad, fin)
+
+    # 3. Cachorros que alcanzan la edad mínima dentro del horizonte
+    edades = {vacuna_id: timedelta(weeks=v.edad_minima_semanas or 0) for vacuna_id, v in vacunas.items()}
+    if edades:
+        nacimientos = Mascota.objects.filter(
+            estado='Activo',
+            fechaNacimiento__gt=inicio - max(edades.values()) - timedelta(weeks=1),
+            fechaNacimiento__lt=fin - min(edades.values())
+        ).annotate(
+            semana=TruncWeek('fechaNacimiento')
+        ).values('especie', 'semana').annotate(cantidad=Count('id')).order_by()
+
+        for grupo in nacimientos:
+            semana_nacimiento = _como_fecha(grupo['semana'])
+            for vacuna_id, vacuna in vacunas.items():
+                if vacuna.especies and grupo['especie'] not in vacuna.especies:
+                    continue
+                semana = semana_nacimiento + edades[vacuna_id]
+                # Solo los que cumplen la edad mínima a partir de esta semana
+                if semana < inicio or semana >= fin:
+                    continue
+                protocolo = protocolos[vacuna_id]
+                _expandir(
+                    demanda[vacuna_id], protocolo, protocolo.variante(es_cachorro=True),
+                    _lunes(semana), 1, grupo['cantidad'], fin
+                )
+
+    semanas_horizonte = [inicio + timedelta(weeks=i) for i in range(semanas)]
+    resultado = []
+    for vacuna_id, vacuna in sorted(vacunas.items(), key=lambda item: item[1].nombre):
+        producto = vacuna.producto_inventario
+        stock = producto.stock if producto else 0
+        acumulado = 0
+        detalle = []
+        semana_agotamiento = None
+        for semana in semanas_horizonte:
+            dosis = demanda[vacuna_id].get(semana, 0)
+            acumulado += dosis
+            if semana_agotamiento is None and acumulado > stock:
+                semana_agotamiento = semana
+            detalle.append({'semana': semana, 'dosis': dosis, 'acumulado': acumulado})
+
+        resultado.append({
+            'vacuna_id': str(vacuna_id),
+            'vacuna_nombre': vacuna.nombre,
+            'es_obligatoria': vacuna.es_obligatoria,
+            'producto': {
+                'id': str(producto.id),
+                'nombre': producto.nombre,
+                'stock': producto.stock
+            } if producto else None,
+            'total_dosis': acumulado,
+            'atrasadas': atrasadas[vacuna_id],
+            'stock_suficiente': acumulado <= stock,
+            'deficit': max(acumulado - stock, 0),
+            'semana_agotamiento': semana_agotamiento,
+            'semanas': detalle
+        })
+    return inicio, fin, resultado
@@ -0,0 +1,168 @@
+"""
+Protocolos de vacunación compilados.
+
+Cada Vacuna define su esquema con varios campos (protocolo_dosis,
+protocolo_cachorro, dosis_total, intervalo_dosis_semanas, frecuencia_meses,
+max_dias_atraso) y un orden de precedencia entre ellos. `obtener_protocolo`
+convierte la vacuna en un ProtocoloVacuna inmutable con los intervalos ya
+resueltos para las variantes adulto y cachorro, y lo guarda en una caché del
+proceso con clave (Vacuna.id, actualizado): cualquier edición de la vacuna
+cambia `actualizado` y provoca una recompilación.
+"""
+
+from dataclasses import dataclass
+from datetime import timedelta
+from threading import Lock
+
+from dateutil.relativedelta import relativedelta
+
+PROTOCOLO_COMPLEJO = 'PROTOCOLO_COMPLEJO'
+PROTOCOLO_CACHORRO = 'PROTOCOLO_CACHORRO'
+PROTOCOLO_ESTANDAR = 'PROTOCOLO_ESTANDAR'
+
+# Tolerancia sobre el intervalo esperado antes de reiniciar el protocolo
+TOLERANCIA_ATRASO_DIAS = 21
+
+
+def _semanas_validas(valor, defecto):
+    """Intervalo en semanas; valores no positivos o inválidos usan el intervalo base"""
+    try:
+        return valor if valor > 0 else defecto
+    except TypeError:
+        return defecto
+
+
+@dataclass(frozen=True)
+class Variante:
+    """Esquema efectivo de dosis: tipo, total de dosis e intervalos entre ellas"""
+    tipo: str
+    dosis_total: int
+    intervalos: tuple
+
+
+@dataclass(frozen=True)
+class ProtocoloVacuna:
+    """Esquema de vacunación compilado (inmutable) de una Vacuna"""
+    vacuna_id: object
+    actualizado: object
+    dosis_total: int
+    intervalo_base: int
+    frecuencia_meses: int
+    max_dias_atraso: int
+    adulto: Variante
+    cachorro: Variante = None
+    delta_refuerzo: relativedelta = None
+
+    def variante(self, es_cachorro=False, historial_count=0):
+        """
+        Orden de precedencia:
+          1. protocolo_dosis (complejo) si está definido
+          2. protocolo_cachorro para cachorros sin dosis previas
+          3. protocolo estándar (dosis_total + intervalo_dosis_semanas)
+        """
+        if self.cachorro is not None and es_cachorro and historial_count == 0:
+            return self.cachorro
+        return self.adulto
+
+    def refuerzo(self, fecha_aplicacion):
+        """Fecha del refuerzo periódico tras completar el protocolo"""
+        return fecha_aplicacion + self.delta_refuerzo
+
+    def proxima_fecha(self, fecha_aplicacion, dosis_numero, variante=None):
+        """
+        Próxima fecha tras aplicar `dosis_numero`.
+        Devuelve (proxima_fecha, es_dosis_final, intervalo_usado).
+        """
+        variante = variante or self.adulto
+        if dosis_numero < variante.dosis_total:
+            indice = dosis_numero - 1
+            if 0 <= indice < len(variante.intervalos):
+                semanas = variante.intervalos[indice]
+            else:
+                semanas = self.intervalo_base
+            proxima = fecha_aplicacion + timedelta(weeks=semanas)
+            if proxima > fecha_aplicacion:
+                return proxima, False, f"{semanas} semanas"
+        else:
+            proxima = self.refuerzo(fecha_aplicacion)
+            if proxima > fecha_aplicacion:
+                return proxima, True, f"{self.frecuencia_meses} meses"
+
+        # Configuración inválida (intervalo o frecuencia no positivos): respaldo con el refuerzo
+        return self.refuerzo(fecha_aplicacion), True, f"{self.frecuencia_meses} meses (fallback)"
+
+    def max_atraso(self, dosis_previa, variante=None):
+        """Días de atraso tolerados después de la dosis `dosis_previa` antes de reiniciar"""
+        variante = variante or self.adulto
+        if variante.intervalos and 0 < dosis_previa <= len(variante.intervalos):
+            return variante.intervalos[dosis_previa - 1] * 7 + TOLERANCIA_ATRASO_DIAS
+        return self.max_dias_atraso
+
+
+def compilar_protocolo(vacuna):
+    """Resuelve la precedencia de campos de la vacuna en un ProtocoloVacuna"""
+    base = vacuna.intervalo_dosis_semanas
+
+    if vacuna.protocolo_dosis and len(vacuna.protocolo_dosis) > 0:
+        adulto = Variante(
+            PROTOCOLO_COMPLEJO,
+            len(vacuna.protocolo_dosis),
+            tuple(
+                _semanas_validas(dosis.get('semanas_siguiente', base), base)
+                if isinstance(dosis, dict) and 'semanas_siguiente' in dosis else base
+                for dosis in vacuna.protocolo_dosis
+            )
+        )
+        # El protocolo complejo tiene precedencia también para cachorros
+        cachorro = None
+    else:
+        adulto = Variante(PROTOCOLO_ESTANDAR, vacuna.dosis_total, (base,) * (vacuna.dosis_total - 1))
+        cachorro = None
+        p_cachorro = vacuna.protocolo_cachorro
+        if p_cachorro and isinstance(p_cachorro, dict):
+            dosis_cachorro = p_cachorro.get('dosis_total', vacuna.dosis_total)
+            intervalos = p_cachorro.get('intervalos', [])
+            if intervalos and isinstance(intervalos, list):
+                intervalos = tuple(_semanas_validas(i, base) for i in intervalos)
+            else:
+                intervalos = (base,) * (dosis_cachorro - 1)
+            cachorro = Variante(
+                PROTOCOLO_CACHORRO,
+                dosis_cachorro if dosis_cachorro > 0 else vacuna.dosis_total,
+                intervalos
+            )
+
+    return ProtocoloVacuna(
+        vacuna_id=vacuna.id,
+        actualizado=vacuna.actualizado,
+        dosis_total=vacuna.dosis_total,
+        intervalo_base=base,
+        frecuencia_meses=vacuna.frecuencia_meses,
+        max_dias_atraso=vacuna.max_dias_atraso,
+        adulto=adulto,
+        cachorro=cachorro,
+        delta_refuerzo=relativedelta(months=vacuna.frecuencia_meses),
+    )
+
+
+_cache = {}
+_cache_lock = Lock()
+
+
+def obtener_protocolo(vacuna):
+    """Protocolo compilado de la vacuna, desde la caché del proceso si está al día"""
+    protocolo = _cache.get(vacuna.id)
+    if protocolo is None or protocolo.actualizado != vacuna.actualizado:
+        protocolo = compilar_protocolo(vacuna)
+        with _cache_lock:
+            _cache[vacuna.id] = protocolo
+    return protocolo
+
+
+def invalidar_protocolo(vacuna_id=None):
+    """Descarta el protocolo compilado de una vacuna (o todos)"""
+    with _cache_lock:
+        if vacuna_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(vacuna_id, None)
@@ -0,0 +1,176 @@
+"""
+Proyección del estado de vacunación por (mascota, vacuna).
+
+EstadoVacunaMascota guarda, para cada vacuna de cada mascota, el registro
+vigente del historial, la fecha de la última dosis aplicada, la próxima fecha
+esperada y el estado calculado. Se actualiza dentro de la misma transacción
+que modifica el historial (signals + llamadas explícitas en las escrituras en
+bloque) y el proceso diario `actualizar_estados_vacunacion` recalcula los
+estados que dependen de la fecha de hoy.
+
+Reconstrucción completa: `python manage.py reconstruir_estados_vacunas`.
+"""
+
+import uuid
+from datetime import date, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .estados_vacunacion import DIAS_PROXIMA, DIAS_REINICIO
+from .models import EstadoVacunaMascota, HistorialVacunacion
+
+TAMANO_LOTE = 500
+
+
+def calcular_estado(proxima_fecha, estado_registro=None, hoy=None):
+    """
+    Estado de una vacuna según su próxima fecha (umbrales únicos para todo el sistema):
+      - vencida_reinicio: vencida hace más de DIAS_REINICIO días
+      - vencida: la próxima fecha ya pasó
+      - proxima: vence en los próximos DIAS_PROXIMA días
+      - vigente: vence más adelante
+    Un registro marcado como completado (reemplazado o descartado) se mantiene así.
+    """
+    if estado_registro == 'completado':
+        return 'completado'
+    if not proxima_fecha:
+        return estado_registro or 'aplicada'
+
+    dias = (proxima_fecha - (hoy or date.today())).days
+    if dias < -DIAS_REINICIO:
+        return 'vencida_reinicio'
+    if dias < 0:
+        return 'vencida'
+    if dias <= DIAS_PROXIMA:
+        return 'proxima'
+    return 'vigente'
+
+
+def _uuid(valor):
+    return valor if isinstance(valor, uuid.UUID) else uuid.UUID(str(valor))
+
+
+def _clave_vigente(registro):
+    """
+    El registro que define el estado es el de próxima fecha más lejana: una dosis
+    nueva, un refuerzo o la dosis pendiente creada por la progresión siempre
+    vencen después que las anteriores.
+    """
+    return (registro['proxima_fecha'] or date.min, registro['dosis_numero'], registro['creado'])
+
+
+def recalcular(pares, hoy=None):
+    """
+    Recalcula la proyección de los pares (mascota_id, vacuna_id) indicados a
+    partir del historial. Crea, actualiza o elimina las filas necesarias.
+    Debe llamarse dentro de la transacción que modificó el historial.
+    """
+    # Los ids pueden llegar como texto (ej. mascota_id=data['mascota_id'] en las vistas)
+    pares = {(_uuid(mascota_id), _uuid(vacuna_id)) for mascota_id, vacuna_id in pares}
+    if not pares:
+        return 0
+
+    hoy = hoy or date.today()
+    registros = HistorialVacunacion.objects.filter(
+        mascota_id__in={m for m, _ in pares},
+        vacuna_id__in={v for _, v in pares}
+    ).order_by().values(
+        'id', 'mascota_id', 'vacuna_id', 'dosis_numero', 'fecha_aplicacion',
+        'proxima_fecha', 'estado', 'creado', 'vacuna__es_obligatoria'
+    )
+
+    vigentes = {}
+    ultima_aplicacion = {}
+    for registro in registros:
+        par = (registro['mascota_id'], registro['vacuna_id'])
+        if par not in pares:
+            continue
+        actual = vigentes.get(par)
+        if actual is None or _clave_vigente(registro) > _clave_vigente(actual):
+            vigentes[par] = registro
+        fecha = registro['fecha_aplicacion']
+        if fecha and (par not in ultima_aplicacion or fecha > ultima_aplicacion[par]):
+            ultima_aplicacion[par] = fecha
+
+    existentes = {
+        (fila.mascota_id, fila.vacuna_id): fila
+        for fila in EstadoVacunaMascota.objects.filter(
+            mascota_id__in={m for m, _ in pares},
+            vacuna_id__in={v for _, v in pares}
+        )
+        if (fila.mascota_id, fila.vacuna_id) in pares
+    }
+
+    ahora = timezone.now()
+    campos = ['historial_id', 'dosis_numero', 'fecha_aplicacion', 'proxima_fecha', 'estado', 'es_obligatoria']
+    nuevas, modificadas = [], []
+    for par, registro in vigentes.items():
+        valores = {
+            'historial_id': registro['id'],
+            'dosis_numero': registro['dosis_numero'],
+            'fecha_aplicacion': ultima_aplicacion.get(par),
+            'proxima_fecha': registro['proxima_fecha'],
+            'estado': calcular_estado(registro['proxima_fecha'], registro['estado'], hoy),
+            'es_obligatoria': registro['vacuna__es_obligatoria'],
+        }
+        fila = existentes.get(par)
+        if fila is None:
+            nuevas.append(EstadoVacunaMascota(mascota_id=par[0], vacuna_id=par[1], **valores))
+        elif any(getattr(fila, campo) != valor for campo, valor in valores.items()):
+            for campo, valor in valores.items():
+                setattr(fila, campo, valor)
+            fila.actualizado = ahora
+            modificadas.append(fila)
+
+    # Pares sin historial (registros eliminados): la proyección desaparece
+    sin_historial = [fila.id for par, fila in existentes.items() if par not in vigentes]
+    if sin_historial:
+        EstadoVacunaMascota.objects.filter(id__in=sin_historial).delete()
+
+    if modificadas:
+        EstadoVacunaMascota.objects.bulk_update(modificadas, campos + ['actualizado'], batch_size=TAMANO_LOTE)
+    if nuevas:
+        EstadoVacunaMascota.objects.bulk_create(nuevas, batch_size=TAMANO_LOTE)
+
+    return len(nuevas) + len(modificadas) + len(sin_historial)
+
+
+def refrescar_estados(hoy=None):
+    """
+    Recalcula en bloque los estados que cambian con el paso de los días
+    (una sentencia UPDATE por estado, solo sobre las filas que cambian).
+    """
+    hoy = hoy or date.today()
+    fecha_reinicio = hoy - timedelta(days=DIAS_REINICIO)
+    fecha_proxima = hoy + timedelta(days=DIAS_PROXIMA)
+    ahora = timezone.now()
+
+    rangos = {
+        'vencida_reinicio': Q(proxima_fecha__lt=fecha_reinicio),
+        'vencida': Q(proxima_fecha__gte=fecha_reinicio, proxima_fecha__lt=hoy),
+        'proxima': Q(proxima_fecha__gte=hoy, proxima_fecha__lte=fecha_proxima),
+        'vigente': Q(proxima_fecha__gt=fecha_proxima),
+    }
+    actualizadas = 0
+    for estado, rango in rangos.items():
+        actualizadas += EstadoVacunaMascota.objects.filter(rango).exclude(
+            estado__in=[estado, 'completado']
+        ).update(estado=estado, actualizado=ahora)
+    return actualizadas
+
+
+def reconstruir(hoy=None):
+    """
+    Reconstruye la proyección completa desde el historial (backfill o reparación).
+    Debe ejecutarse dentro de una transacción.
+    """
+    pares = sorted(
+        HistorialVacunacion.objects.order_by().values_list('mascota_id', 'vacuna_id').distinct(),
+        key=lambda par: (str(par[0]), str(par[1]))
+    )
+    EstadoVacunaMascota.objects.all().delete()
+
+    for inicio in range(0, len(pares), TAMANO_LOTE):
+        recalcular(pares[inicio:inicio + TAMANO_LOTE], hoy)
+    return len(pares)
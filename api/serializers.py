@@ -2,7 +2,10 @@
 from rest_framework import serializers
 from .models import *
 from .choices import *
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .permissions import claims_permisos, permisos_en_token
+from .campos_dinamicos import CamposDinamicosMixin
 
 class CapitalizedChoiceField(serializers.ChoiceField):
     def to_internal_value(self, data):
@@ -216,12 +219,19 @@ class HistorialClinicoSerializer(serializers.ModelSerializer):
         fields = ['id', 'numero_historia', 'creado', 'mascota', 'mascota_nombre', 'vacunas', 'atenciones']
 
 
-class MascotaSerializer(serializers.ModelSerializer):
+class MascotaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     responsable = serializers.PrimaryKeyRelatedField(queryset=Responsable.objects.all())
     nombrecompletoResponsable = serializers.SerializerMethodField()
     responsable_email = serializers.SerializerMethodField()
     historial_clinico = serializers.SerializerMethodField(read_only=True)
 
+    # Columnas que leen los campos calculados (?fields= / ?omit=)
+    CAMPOS_CONSULTA = {
+        'nombrecompletoResponsable': ('responsable__nombres', 'responsable__apellidos'),
+        'responsable_email': ('responsable__email',),
+        'historial_clinico': None,  # serializer anidado con vacunas y atenciones
+    }
+
     class Meta:
         model = Mascota
         fields = [
@@ -370,7 +380,7 @@ class DiaTrabajoSerializer(serializers.ModelSerializer):
         model = DiaTrabajo
         fields = ['dia']
 
-class VeterinarioSerializer(serializers.ModelSerializer):
+class VeterinarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     trabajador = serializers.PrimaryKeyRelatedField(queryset=Trabajador.objects.all())
     especialidad = serializers.PrimaryKeyRelatedField(queryset=Especialidad.objects.all())
     dias_trabajo = serializers.SerializerMethodField(read_only=True)  # Generado dinámicamente desde horarios_trabajo
@@ -379,6 +389,17 @@ class VeterinarioSerializer(serializers.ModelSerializer):
     trabajador_detalle = serializers.SerializerMethodField(read_only=True)
     especialidad_detalle = serializers.SerializerMethodField(read_only=True)
 
+    # Columnas que leen los campos calculados (?fields= / ?omit=); los horarios se consultan aparte
+    CAMPOS_CONSULTA = {
+        'dias_trabajo': (),
+        'horarios_trabajo': (),
+        'trabajador_detalle': (
+            'trabajador__nombres', 'trabajador__apellidos', 'trabajador__telefono',
+            'trabajador__documento', 'trabajador__estado', 'trabajador__usuario__email',
+        ),
+        'especialidad_detalle': ('especialidad__nombre', 'especialidad__estado'),
+    }
+
     class Meta:
         model = Veterinario
         fields = ['id', 'trabajador', 'trabajador_detalle', 'especialidad', 'especialidad_detalle',
@@ -498,11 +519,23 @@ class ProductoSerializer(serializers.ModelSerializer):
         return data
 
 
-class CitaSerializer(serializers.ModelSerializer):
+class CitaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     """
     Serializador para el modelo Cita.
     Relaciona veterinario y servicio mediante su ID (PK).
+
+    Los campos de nombres solo leen relaciones ya cargadas: los querysets que
+    se serialicen deben incluir select_related(*CitaSerializer.RELACIONES).
     """
+    RELACIONES = ('mascota__responsable', 'veterinario__trabajador', 'veterinario__especialidad', 'servicio')
+    # Columnas que leen los campos calculados (?fields= / ?omit=)
+    CAMPOS_CONSULTA = {
+        'nombreVeterinario': (
+            'veterinario__trabajador__nombres', 'veterinario__trabajador__apellidos', 'veterinario__especialidad__nombre',
+        ),
+        'nombrePropietario': ('mascota__responsable__nombres', 'mascota__responsable__apellidos'),
+    }
+
     veterinario = serializers.PrimaryKeyRelatedField(queryset=Veterinario.objects.all())
     servicio = serializers.PrimaryKeyRelatedField(queryset=Servicio.objects.all())
     mascota = serializers.PrimaryKeyRelatedField(queryset=Mascota.objects.all())
@@ -539,12 +572,11 @@ class CitaSerializer(serializers.ModelSerializer):
         especialidad = getattr(obj.veterinario, 'especialidad', 'Sin especialidad')
         return f"{nombres} {apellidos} (Especialidad: {especialidad})"
     def get_nombrePropietario(self, obj):
-        # Obtener el nombre completo del propietario de la mascota
-        try:
-            mascota = Mascota.objects.get(id=obj.mascota.id)
-            return f"{mascota.responsable.nombres} {mascota.responsable.apellidos}"
-        except Mascota.DoesNotExist:
+        # Obtener el nombre completo del propietario de la mascota (ya cargado con select_related)
+        responsable = obj.mascota.responsable if obj.mascota_id else None
+        if responsable is None:
             return "Propietario no encontrado"
+        return f"{responsable.nombres} {responsable.apellidos}"
 
     def validate(self, attrs):
         """
@@ -588,6 +620,9 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token = super().get_token(user)
         token['email'] = user.email
         token['rol'] = user.rol
+        if permisos_en_token():
+            for clave, valor in claims_permisos(user).items():
+                token[clave] = valor
         return token
 
     def validate(self, attrs):
@@ -604,6 +639,21 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Al refrescar, el access token recibe los permisos vigentes (no los del login)"""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        if permisos_en_token():
+            refresh = self.token_class(attrs['refresh'])
+            usuario = Usuario.objects.get(id=refresh[jwt_settings.USER_ID_CLAIM])
+            access = refresh.access_token
+            for clave, valor in claims_permisos(usuario).items():
+                access[clave] = valor
+            data['access'] = str(access)
+        return data
+
+
 # 🐾 SERIALIZERS SISTEMA DE VACUNACIÓN
 
 ESPECIES_VALIDAS = ['Perro', 'Gato', 'Ave', 'Conejo', 'Hamster', 'Reptil', 'Otro']
@@ -754,33 +804,10 @@ class HistorialVacunacionSerializer(serializers.ModelSerializer):
     def get_estado(self, obj):
         """
         🧠 CALCULAR ESTADO DINÁMICAMENTE según fechas actuales
-        Garantiza que el estado siempre sea coherente con las fechas
+        Usa los mismos umbrales que la proyección EstadoVacunaMascota
         """
-        from datetime import date
-
-        # Si no hay próxima fecha, usar estado almacenado
-        if not obj.proxima_fecha:
-            return obj.estado
-
-        today = date.today()
-        dias_diferencia = (obj.proxima_fecha - today).days
-
-        # 🔍 LÓGICA DE ESTADOS DINÁMICOS:
-
-        # 1. VENCIDA: Próxima fecha ya pasó
-        if dias_diferencia < 0:
-            # Si está muy vencida (>60 días), podría necesitar reinicio
-            if abs(dias_diferencia) > 60 and obj.vacuna.dosis_total > 1:
-                return 'vencida_reinicio'
-            return 'vencida'
-
-        # 2. PRÓXIMA: Vence en los próximos 30 días
-        elif 0 <= dias_diferencia <= 30:
-            return 'proxima'
-
-        # 3. VIGENTE: Vence en más de 30 días
-        else:
-            return 'vigente'
+        from .proyeccion_vacunas import calcular_estado
+        return calcular_estado(obj.proxima_fecha, obj.estado)
 
 
 class HistorialMedicoSerializer(serializers.ModelSerializer):
@@ -906,7 +933,7 @@ class SlotTiempoSerializer(serializers.ModelSerializer):
         model = SlotTiempo
         fields = [
             'id', 'veterinario', 'veterinario_nombre', 'fecha', 'hora_inicio', 'hora_fin',
-            'disponible', 'cita_info', 'bloqueado', 'razon_bloqueo'
+            'disponible', 'cita_info', 'motivo_no_disponible', 'reservado_hasta'
         ]
         read_only_fields = ['id']
 
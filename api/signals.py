@@ -0,0 +1,152 @@
+"""
+Signals del módulo api.
+
+Mantienen coherentes las cachés derivadas cuando cambian los modelos de origen.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .disponibilidad import invalidar_veterinario
+from . import estadisticas
+from .inventario import descontar_stock, devolver_stock, sincronizar_servicio_adicional
+from .models import (
+    Cita, HorarioTrabajo, HistorialVacunacion, Vacuna, EstadoVacunaMascota,
+    MovimientoStock, Producto, Servicio, ServicioAdicional,
+    Especialidad, Trabajador, Usuario, Mascota, PermisoRol
+)
+from .permissions import invalidar_permisos
+from .protocolos import invalidar_protocolo
+from .proyeccion_vacunas import recalcular
+
+
+# 🗓️ Mapas de disponibilidad: cualquier cambio en citas u horarios del veterinario.
+# La versión se publica al confirmar: antes, un lector concurrente podría
+# reconstruir el mapa con datos previos al commit y guardarlo bajo la versión nueva.
+# Al reasignar una cita u horario se invalidan el veterinario anterior y el nuevo.
+def _invalidar_al_confirmar(veterinarios):
+    for veterinario_id in veterinarios:
+        transaction.on_commit(lambda veterinario_id=veterinario_id: invalidar_veterinario(veterinario_id))
+
+
+@receiver([post_save, post_delete], sender=Cita)
+@receiver([post_save, post_delete], sender=HorarioTrabajo)
+def invalidar_disponibilidad(sender, instance, **kwargs):
+    veterinarios = {instance.veterinario_id, getattr(instance, '_veterinario_cargado', None)}
+    veterinarios.discard(None)
+    _invalidar_al_confirmar(veterinarios)
+    instance._veterinario_cargado = instance.veterinario_id
+
+
+# La duración (con preparación y limpieza) y el solapamiento del servicio
+# definen el bloque que ocupa cada cita en los mapas
+@receiver(post_save, sender=Servicio)
+def invalidar_disponibilidad_servicio(sender, instance, created, **kwargs):
+    agenda = instance.valores_agenda()
+    if created or (agenda is not None and agenda == getattr(instance, '_agenda_cargada', None)):
+        return
+    _invalidar_al_confirmar(
+        Cita.objects.filter(servicio=instance).order_by().values_list('veterinario_id', flat=True).distinct()
+    )
+    instance._agenda_cargada = agenda
+
+
+# 💉 Proyección de estados de vacunación: se recalcula en la misma transacción
+@receiver([post_save, post_delete], sender=HistorialVacunacion)
+def actualizar_proyeccion_vacunas(sender, instance, **kwargs):
+    recalcular({(instance.mascota_id, instance.vacuna_id)})
+
+
+@receiver(post_save, sender=Vacuna)
+def actualizar_obligatoriedad_proyeccion(sender, instance, created, **kwargs):
+    if not created:
+        EstadoVacunaMascota.objects.filter(vacuna=instance).exclude(
+            es_obligatoria=instance.es_obligatoria
+        ).update(es_obligatoria=instance.es_obligatoria)
+
+
+# 💉 Protocolos compilados: las ediciones cambian `actualizado`; las bajas se descartan aquí
+@receiver(post_delete, sender=Vacuna)
+def descartar_protocolo(sender, instance, **kwargs):
+    invalidar_protocolo(instance.id)
+
+
+# 📦 Inventario: cada salida de stock se descuenta de forma atómica y queda en el libro
+@receiver(post_save, sender=HistorialVacunacion)
+def descontar_stock_vacunacion(sender, instance, created, **kwargs):
+    # Solo dosis aplicadas (las pendientes de la progresión no tienen fecha de aplicación)
+    if not created or not instance.fecha_aplicacion:
+        return
+    producto = instance.vacuna.producto_inventario
+    if producto is not None:
+        descontar_stock(
+            producto, 1, 'vacunacion',
+            motivo=f'{instance.vacuna.nombre} - dosis #{instance.dosis_numero}',
+            historial_vacunacion=instance
+        )
+
+
+@receiver(post_save, sender=ServicioAdicional)
+def descontar_stock_servicio_adicional(sender, instance, **kwargs):
+    sincronizar_servicio_adicional(instance)
+
+
+@receiver(pre_delete, sender=ServicioAdicional)
+def devolver_stock_servicio_adicional(sender, instance, **kwargs):
+    if instance.producto_id and instance.cantidad > 0:
+        devolver_stock(
+            instance.producto, instance.cantidad,
+            motivo=f'Anulación en cita {instance.cita_id}',
+            servicio_adicional=instance
+        )
+
+
+@receiver(post_save, sender=Producto)
+def registrar_ajuste_stock(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Altas y ediciones manuales del stock (formulario de inventario, admin).
+    La diferencia se toma contra el stock con el que se cargó la instancia
+    (Producto.from_db), sin volver a leer la fila.
+    """
+    if update_fields is not None and 'stock' not in update_fields:
+        return
+    anterior = 0 if created else getattr(instance, '_stock_cargado', None)
+    instance._stock_cargado = instance.stock
+    if anterior is None or instance.stock == anterior:
+        return
+    MovimientoStock.objects.create(
+        producto=instance,
+        tipo='inicial' if created else 'ajuste',
+        cantidad=instance.stock - anterior
+    )
+
+
+# 📊 Contadores cacheados del dashboard
+GRUPOS_ESTADISTICAS = {
+    Especialidad: estadisticas.ESPECIALIDADES,
+    Trabajador: estadisticas.TRABAJADORES,
+    Usuario: estadisticas.TRABAJADORES,  # el rol define quién es veterinario
+    Producto: estadisticas.PRODUCTOS,
+    Mascota: estadisticas.MASCOTAS,
+    Vacuna: estadisticas.VACUNAS,
+    HistorialVacunacion: estadisticas.VACUNACION,
+}
+
+
+def invalidar_estadisticas(sender, update_fields=None, **kwargs):
+    # El login solo actualiza last_login: no cambia ningún contador
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    estadisticas.invalidar(GRUPOS_ESTADISTICAS[sender])
+
+
+for modelo in GRUPOS_ESTADISTICAS:
+    post_save.connect(invalidar_estadisticas, sender=modelo, dispatch_uid=f'estadisticas_save_{modelo.__name__}')
+    post_delete.connect(invalidar_estadisticas, sender=modelo, dispatch_uid=f'estadisticas_delete_{modelo.__name__}')
+
+
+# 🔐 Matriz de permisos: la nueva versión se publica al confirmar la transacción
+@receiver([post_save, post_delete], sender=PermisoRol)
+def invalidar_matriz_permisos(sender, **kwargs):
+    transaction.on_commit(invalidar_permisos)
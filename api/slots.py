@@ -0,0 +1,202 @@
+"""
+Generación y reserva de slots de tiempo para la agenda de veterinarios.
+
+En lugar de consultar e insertar slot por slot, se calculan en memoria todos
+los candidatos (fecha, hora_inicio) del rango, se cargan las claves existentes
+en una sola consulta y se insertan únicamente los faltantes con bulk_create.
+
+Las reservas (temporales o definitivas) se hacen con un UPDATE condicional
+(`disponible AND reserva nula o vencida`): si dos usuarios compiten por el
+mismo slot, la BD garantiza que solo uno actualiza la fila.
+"""
+
+import time as time_module
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import HorarioTrabajo, SlotTiempo
+
+# Tamaño de lote para bulk_create (evita sentencias INSERT gigantes)
+TAMANO_LOTE_SLOTS = 500
+
+
+def calcular_slots_dia(fecha, horario, duracion_slot):
+    """
+    Devuelve la lista de tuplas (hora_inicio, hora_fin) de un día según su
+    HorarioTrabajo, omitiendo los slots que comienzan dentro del descanso.
+    """
+    slots = []
+    hora_actual = datetime.combine(fecha, horario.hora_inicio)
+    hora_fin_dia = datetime.combine(fecha, horario.hora_fin)
+
+    while hora_actual < hora_fin_dia:
+        hora_fin_slot = hora_actual + timedelta(minutes=duracion_slot)
+
+        # No generar slots que pasen del horario de fin
+        if hora_fin_slot.time() > horario.hora_fin:
+            break
+
+        # Verificar que no coincida con horario de descanso
+        en_descanso = False
+        if horario.tiene_descanso and horario.hora_inicio_descanso and horario.hora_fin_descanso:
+            if horario.hora_inicio_descanso <= hora_actual.time() < horario.hora_fin_descanso:
+                en_descanso = True
+
+        if not en_descanso:
+            slots.append((hora_actual.time(), hora_fin_slot.time()))
+
+        hora_actual = hora_fin_slot
+
+    return slots
+
+
+def horario_vigente(horario, fecha):
+    """Indica si el horario aplica en la fecha según fecha_inicio/fin_vigencia"""
+    if horario.fecha_inicio_vigencia and fecha < horario.fecha_inicio_vigencia:
+        return False
+    if horario.fecha_fin_vigencia and fecha > horario.fecha_fin_vigencia:
+        return False
+    return True
+
+
+def generar_slots_veterinario(veterinario, fecha_inicio, fecha_fin, duracion_slot=30,
+                              respetar_vigencia=False):
+    """
+    Genera los slots de un veterinario entre fecha_inicio y fecha_fin (inclusive).
+
+    Si respetar_vigencia es True, se omiten los días fuera del rango
+    fecha_inicio_vigencia/fecha_fin_vigencia de cada HorarioTrabajo.
+
+    Returns:
+        dict: {'slots_creados', 'slots_omitidos', 'tiempos_ms': {...}}
+    """
+    t_inicio = time_module.perf_counter()
+
+    # 1. Horarios activos del veterinario indexados por día de la semana
+    horarios = {}
+    for horario in HorarioTrabajo.objects.filter(veterinario=veterinario, activo=True):
+        horarios.setdefault(horario.dia_semana, horario)
+
+    # 2. Calcular todos los candidatos en memoria
+    candidatos = []
+    fecha_actual = fecha_inicio
+    while fecha_actual <= fecha_fin:
+        horario = horarios.get(fecha_actual.weekday())
+        if horario and respetar_vigencia and not horario_vigente(horario, fecha_actual):
+            horario = None
+        if horario:
+            for hora_inicio, hora_fin in calcular_slots_dia(fecha_actual, horario, duracion_slot):
+                candidatos.append((fecha_actual, hora_inicio, hora_fin))
+        fecha_actual += timedelta(days=1)
+    t_calculo = time_module.perf_counter()
+
+    # 3. Claves existentes del rango en una sola consulta
+    existentes = set(
+        SlotTiempo.objects.filter(
+            veterinario=veterinario,
+            fecha__gte=fecha_inicio,
+            fecha__lte=fecha_fin
+        ).values_list('fecha', 'hora_inicio')
+    )
+    t_consulta = time_module.perf_counter()
+
+    # 4. Insertar solo la diferencia, por lotes
+    nuevos = [
+        SlotTiempo(
+            veterinario=veterinario,
+            fecha=fecha,
+            hora_inicio=hora_inicio,
+            hora_fin=hora_fin,
+            duracion_minutos=duracion_slot,
+            disponible=True,
+            generado_automaticamente=True
+        )
+        for fecha, hora_inicio, hora_fin in candidatos
+        if (fecha, hora_inicio) not in existentes
+    ]
+    SlotTiempo.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE_SLOTS, ignore_conflicts=True)
+    t_insercion = time_module.perf_counter()
+
+    return {
+        'slots_creados': len(nuevos),
+        'slots_omitidos': len(candidatos) - len(nuevos),
+        'tiempos_ms': {
+            'calculo': round((t_calculo - t_inicio) * 1000, 2),
+            'consulta_existentes': round((t_consulta - t_calculo) * 1000, 2),
+            'insercion': round((t_insercion - t_consulta) * 1000, 2),
+            'total': round((t_insercion - t_inicio) * 1000, 2),
+        }
+    }
+
+
+def liberar_reservas_expiradas(ahora=None):
+    """
+    Limpia todas las reservas temporales vencidas con un único UPDATE.
+    Devuelve la cantidad de slots liberados.
+    """
+    ahora = ahora or timezone.now()
+    return SlotTiempo.objects.filter(reservado_hasta__lte=ahora).update(
+        reservado_hasta=None, actualizado=timezone.now()
+    )
+
+
+def slot_libre_q(ahora=None):
+    """Condición de slot libre: disponible y sin reserva temporal vigente"""
+    ahora = ahora or timezone.now()
+    return Q(disponible=True) & (Q(reservado_hasta__isnull=True) | Q(reservado_hasta__lte=ahora))
+
+
+def reservar_slot_temporal(slot_id, minutos):
+    """
+    Reserva temporalmente el slot si está libre.
+    Devuelve la fecha de expiración de la reserva, o None si no se pudo.
+    """
+    ahora = timezone.now()
+    reservado_hasta = ahora + timedelta(minutes=minutos)
+    with transaction.atomic():
+        actualizados = SlotTiempo.objects.filter(slot_libre_q(ahora), pk=slot_id).update(
+            reservado_hasta=reservado_hasta, actualizado=ahora
+        )
+    return reservado_hasta if actualizados else None
+
+
+def ocupar_slot(slot_id):
+    """
+    Marca el slot como ocupado si está libre. Devuelve True si esta llamada lo
+    ocupó. Debe ejecutarse dentro de la misma transacción que crea la cita.
+    """
+    ahora = timezone.now()
+    return SlotTiempo.objects.filter(slot_libre_q(ahora), pk=slot_id).update(
+        disponible=False, motivo_no_disponible='ocupado', reservado_hasta=None, actualizado=ahora
+    ) == 1
+
+
+def liberar_slot(veterinario, fecha, hora_inicio):
+    """Libera el slot ocupado por una cita. Devuelve el id del slot o None."""
+    slot_id = SlotTiempo.objects.filter(
+        veterinario=veterinario, fecha=fecha, hora_inicio=hora_inicio
+    ).values_list('id', flat=True).first()
+    if slot_id:
+        SlotTiempo.objects.filter(pk=slot_id).update(
+            disponible=True, motivo_no_disponible='', actualizado=timezone.now()
+        )
+    return slot_id
+
+
+def respuesta_slot_no_disponible(slot_id):
+    """Cuerpo de error (HTTP 409) cuando el UPDATE condicional no tomó el slot"""
+    slot = SlotTiempo.objects.filter(pk=slot_id).first()
+    if slot and slot.disponible and slot.esta_reservado_temporalmente():
+        return {
+            'error': 'El slot está reservado temporalmente por otro usuario',
+            'error_code': 'SLOT_RESERVED',
+            'reservado_hasta': slot.reservado_hasta
+        }
+    return {
+        'error': 'El slot seleccionado no está disponible',
+        'error_code': 'SLOT_NOT_AVAILABLE',
+        'motivo': slot.motivo_no_disponible if slot else None
+    }
@@ -0,0 +1,561 @@
+import random
+import threading
+from collections import Counter
+from datetime import date, time, timedelta
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .contexto import JWTAuthenticationContexto
+from . import json_rapido, versiones
+from .disponibilidad import construir_mapas, obtener_mapas
+from .estados_vacunacion import _progresar_multidosis
+from .models import (
+    Cita, Especialidad, HistorialVacunacion, HorarioTrabajo, Mascota, MovimientoStock, Producto, Responsable,
+    Servicio, SlotTiempo, TipoDocumento, Trabajador, Usuario, Vacuna, VersionCache, Veterinario
+)
+from .permissions import CLAVE_VERSION_PERMISOS, PermisosDesactualizados, matriz_permisos, permiso_desde_token
+from .serializers import CitaSerializer, CustomTokenObtainPairSerializer
+from .slots import generar_slots_veterinario
+
+
+def crear_clinica(veterinarios=2):
+    """Datos mínimos: veterinarios con jornada de 9 a 17 (descanso de 13 a 14), una mascota y un servicio"""
+    tipo_documento = TipoDocumento.objects.create(nombre='DNI')
+    especialidad = Especialidad.objects.create(nombre='General')
+    administrador = Usuario.objects.create(email='admin@huellitas.com', rol='administrador')
+    lista = []
+    for i in range(veterinarios):
+        usuario = Usuario.objects.create(email=f'vet{i}@huellitas.com', rol='veterinario')
+        trabajador = Trabajador.objects.create(
+            nombres=f'Veterinario{i}', apellidos='Prueba', telefono='999888777',
+            tipodocumento=tipo_documento, documento=f'4000000{i}', usuario=usuario
+        )
+        veterinario = Veterinario.objects.create(trabajador=trabajador, especialidad=especialidad)
+        for dia in range(7):
+            HorarioTrabajo.objects.create(
+                veterinario=veterinario, dia_semana=dia, hora_inicio=time(9), hora_fin=time(17),
+                tiene_descanso=True, hora_inicio_descanso=time(13), hora_fin_descanso=time(14)
+            )
+        lista.append(veterinario)
+    responsable = Responsable.objects.create(
+        nombres='Ana', apellidos='Torres', email='ana@correo.com', telefono='987654321',
+        direccion='Av. Siempre Viva 123', ciudad='Lima', documento='87654321', tipodocumento=tipo_documento
+    )
+    mascota = Mascota.objects.create(
+        nombreMascota='Firulais', especie='Perro', raza='Mestizo', fechaNacimiento=date(2022, 1, 1),
+        genero='Macho', peso=10, color='Negro', responsable=responsable
+    )
+    servicio = Servicio.objects.create(
+        nombre='Consulta', precio=50, duracion_minutos=30, tiempo_preparacion=5, tiempo_limpieza=10
+    )
+    return {
+        'administrador': administrador, 'veterinarios': lista, 'responsable': responsable,
+        'mascota': mascota, 'servicio': servicio, 'tipo_documento': tipo_documento,
+    }
+
+
+class InvalidacionDisponibilidadTests(TestCase):
+    """Los mapas cacheados deben coincidir con los reconstruidos tras cada edición"""
+
+    def setUp(self):
+        cache.clear()
+        self.datos = crear_clinica()
+        self.veterinarios = [v.id for v in self.datos['veterinarios']]
+        self.fecha = date.today() + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cita = Cita.objects.create(
+                fecha=self.fecha, hora=time(10), mascota=self.datos['mascota'],
+                veterinario=self.datos['veterinarios'][0], servicio=self.datos['servicio']
+            )
+
+    def assertMapasVigentes(self):
+        self.assertEqual(
+            obtener_mapas(self.veterinarios, self.fecha, self.fecha),
+            construir_mapas(self.veterinarios, self.fecha, self.fecha)
+        )
+
+    def test_reasignar_cita_invalida_ambos_veterinarios(self):
+        obtener_mapas(self.veterinarios, self.fecha, self.fecha)
+        cita = Cita.objects.get(id=self.cita.id)
+        cita.veterinario = self.datos['veterinarios'][1]
+        with self.captureOnCommitCallbacks(execute=True):
+            cita.save()
+        self.assertMapasVigentes()
+
+    def test_cambio_de_duracion_del_servicio_invalida_sus_citas(self):
+        obtener_mapas(self.veterinarios, self.fecha, self.fecha)
+        servicio = Servicio.objects.get(id=self.datos['servicio'].id)
+        servicio.duracion_minutos = 90
+        with self.captureOnCommitCallbacks(execute=True):
+            servicio.save()
+        self.assertMapasVigentes()
+
+
+def cliente(usuario):
+    client = APIClient()
+    client.force_authenticate(usuario)
+    return client
+
+
+def cabecera_jwt(usuario):
+    """Cabecera Authorization con un access token real (mismos claims que el login)"""
+    return f'Bearer {CustomTokenObtainPairSerializer.get_token(usuario).access_token}'
+
+
+class ReservasConcurrentesTests(TransactionTestCase):
+    """
+    Reserva de slots por los endpoints reales: crear cita, reprogramar y
+    reserva temporal. Los casos con hilos necesitan SELECT ... FOR UPDATE
+    (PostgreSQL); en SQLite solo corren los secuenciales.
+    """
+    HILOS = 8
+
+    def setUp(self):
+        self.datos = crear_clinica(veterinarios=1)
+        self.veterinario = self.datos['veterinarios'][0]
+        self.fecha = date.today() + timedelta(days=1)
+        generar_slots_veterinario(self.veterinario, self.fecha, self.fecha, duracion_slot=30)
+        self.client = cliente(self.datos['administrador'])
+
+    def slot(self, hora):
+        return SlotTiempo.objects.get(veterinario=self.veterinario, fecha=self.fecha, hora_inicio=hora)
+
+    def datos_cita(self, hora):
+        return {
+            'fecha': self.fecha.isoformat(), 'hora': hora.strftime('%H:%M:%S'),
+            'mascota': str(self.datos['mascota'].id), 'veterinario': str(self.veterinario.id),
+            'servicio': str(self.datos['servicio'].id),
+        }
+
+    def crear_cita(self, hora):
+        respuesta = self.client.post('/api/citas/', self.datos_cita(hora), format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.data)
+        return respuesta.data['cita']['id']
+
+    def en_paralelo(self, peticion, argumentos):
+        """Ejecuta `peticion(client, argumento)` en un hilo por argumento, todos a la vez"""
+        barrera = threading.Barrier(len(argumentos))
+        codigos = [None] * len(argumentos)
+
+        def ejecutar(indice, argumento):
+            try:
+                client = cliente(self.datos['administrador'])
+                barrera.wait()
+                codigos[indice] = peticion(client, argumento).status_code
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=ejecutar, args=item) for item in enumerate(argumentos)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return codigos
+
+    def test_slot_ocupado_rechaza_otra_cita(self):
+        self.crear_cita(time(10))
+        respuesta = self.client.post('/api/citas/', self.datos_cita(time(10)), format='json')
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(Cita.objects.count(), 1)
+        self.assertFalse(self.slot(time(10)).disponible)
+
+    def test_reserva_temporal_bloquea_el_slot(self):
+        slot = self.slot(time(11))
+        url = f'/api/slots-tiempo/{slot.id}/reservar-temporal/'
+        self.assertEqual(self.client.post(url, {'minutos': 5}, format='json').status_code, 200)
+        self.assertEqual(self.client.post(url, {'minutos': 5}, format='json').status_code, 409)
+
+        respuesta = self.client.post('/api/citas/', self.datos_cita(time(11)), format='json')
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.data['error_code'], 'SLOT_RESERVED')
+        self.assertFalse(Cita.objects.exists())
+
+    def test_reprogramar_mueve_la_ocupacion(self):
+        cita_id = self.crear_cita(time(10))
+        otra_id = self.crear_cita(time(15))
+        url = f'/api/citas/{cita_id}/reprogramar/'
+        ocupado = {'fecha': self.fecha.isoformat(), 'hora': '15:00:00'}
+        self.assertEqual(self.client.patch(url, ocupado, format='json').status_code, 409)
+
+        libre = {'fecha': self.fecha.isoformat(), 'hora': '11:00:00'}
+        self.assertEqual(self.client.patch(url, libre, format='json').status_code, 200)
+        self.assertTrue(self.slot(time(10)).disponible)
+        self.assertFalse(self.slot(time(11)).disponible)
+        self.assertEqual(Cita.objects.get(id=otra_id).hora, time(15))
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_creacion_concurrente_un_solo_ganador(self):
+        codigos = self.en_paralelo(
+            lambda client, hora: client.post('/api/citas/', self.datos_cita(hora), format='json'),
+            [time(10)] * self.HILOS
+        )
+        self.assertEqual(sorted(codigos), [201] + [409] * (self.HILOS - 1))
+        self.assertEqual(Cita.objects.count(), 1)
+        self.assertFalse(self.slot(time(10)).disponible)
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_reserva_temporal_concurrente_un_solo_ganador(self):
+        url = f'/api/slots-tiempo/{self.slot(time(11)).id}/reservar-temporal/'
+        codigos = self.en_paralelo(
+            lambda client, minutos: client.post(url, {'minutos': minutos}, format='json'),
+            [5] * self.HILOS
+        )
+        self.assertEqual(sorted(codigos), [200] + [409] * (self.HILOS - 1))
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_reprogramacion_concurrente_al_mismo_horario(self):
+        horas = [time(9), time(10), time(11), time(12)]
+        citas = [self.crear_cita(hora) for hora in horas]
+        destino = {'fecha': self.fecha.isoformat(), 'hora': '15:00:00'}
+        codigos = self.en_paralelo(
+            lambda client, cita_id: client.patch(f'/api/citas/{cita_id}/reprogramar/', destino, format='json'),
+            citas
+        )
+        self.assertEqual(sorted(codigos), [200] + [409] * (len(citas) - 1))
+        self.assertEqual(Cita.objects.filter(hora=time(15)).count(), 1)
+        libres = SlotTiempo.objects.filter(
+            veterinario=self.veterinario, fecha=self.fecha, hora_inicio__in=horas, disponible=True
+        ).count()
+        self.assertEqual(libres, 1)
+
+
+def progresion_iterativa(candidatas, fecha_hoy):
+    """Oráculo: recorrido fila por fila (una consulta + INSERT + UPDATE por registro)"""
+    creadas = 0
+    for registro_vencido in candidatas.select_related('vacuna', 'mascota', 'veterinario'):
+        if not HistorialVacunacion.objects.filter(
+            mascota=registro_vencido.mascota,
+            vacuna=registro_vencido.vacuna,
+            dosis_numero=registro_vencido.dosis_numero + 1
+        ).exists():
+            HistorialVacunacion.objects.create(
+                mascota=registro_vencido.mascota,
+                vacuna=registro_vencido.vacuna,
+                fecha_aplicacion=None,
+                proxima_fecha=fecha_hoy + timedelta(weeks=registro_vencido.vacuna.intervalo_dosis_semanas),
+                veterinario=registro_vencido.veterinario,
+                dosis_numero=registro_vencido.dosis_numero + 1,
+                estado='proxima',
+                observaciones=f'Dosis {registro_vencido.dosis_numero + 1} creada automáticamente tras vencimiento de dosis {registro_vencido.dosis_numero}'
+            )
+            registro_vencido.estado = 'completado'
+            registro_vencido.save()
+            creadas += 1
+    return creadas
+
+
+class ProgresionMultidosisTests(TestCase):
+    """La progresión en bloque deja el mismo historial que el recorrido fila por fila"""
+    REGISTROS = 300
+
+    @classmethod
+    def setUpTestData(cls):
+        datos = crear_clinica()
+        cls.veterinarios = [v.id for v in datos['veterinarios']]
+        cls.mascotas = [datos['mascota'].id] + [
+            Mascota.objects.create(
+                nombreMascota=f'Mascota{i}', especie='Gato', raza='Mestizo', fechaNacimiento=date(2021, 5, 1),
+                genero='Hembra', peso=4, color='Gris', responsable=datos['responsable']
+            ).id
+            for i in range(19)
+        ]
+        cls.vacuna = Vacuna.objects.create(
+            nombre='Triple felina', especies=['Perro', 'Gato'], frecuencia_meses=12,
+            enfermedad_previene='-', dosis_total=4, intervalo_dosis_semanas=3
+        )
+
+        # Dosis vencidas; algunas duplicadas y otras con la siguiente dosis ya registrada
+        rng = random.Random(42)
+        hoy = date.today()
+        registros = []
+        for _ in range(cls.REGISTROS):
+            mascota_id = rng.choice(cls.mascotas)
+            dosis = rng.randint(1, 3)
+            vencida = hoy - timedelta(days=rng.randint(1, 120))
+            datos_registro = dict(
+                mascota_id=mascota_id, vacuna=cls.vacuna, veterinario_id=rng.choice(cls.veterinarios),
+                fecha_aplicacion=vencida - timedelta(weeks=3), proxima_fecha=vencida,
+                dosis_numero=dosis, estado='vencida'
+            )
+            registros.append(HistorialVacunacion(**datos_registro))
+            azar = rng.random()
+            if azar < 0.1:
+                registros.append(HistorialVacunacion(**datos_registro))
+            elif azar < 0.3:
+                registros.append(HistorialVacunacion(
+                    mascota_id=mascota_id, vacuna=cls.vacuna, veterinario_id=datos_registro['veterinario_id'],
+                    fecha_aplicacion=None, proxima_fecha=vencida + timedelta(weeks=3),
+                    dosis_numero=dosis + 1, estado='proxima'
+                ))
+        HistorialVacunacion.objects.bulk_create(registros)
+
+    def estado_final(self):
+        return Counter(HistorialVacunacion.objects.filter(vacuna=self.vacuna).values_list(
+            'mascota_id', 'dosis_numero', 'estado', 'proxima_fecha',
+            'veterinario_id', 'fecha_aplicacion', 'observaciones'
+        ))
+
+    def test_progresion_en_bloque_equivale_al_recorrido_iterativo(self):
+        hoy = date.today()
+        candidatas = HistorialVacunacion.objects.filter(
+            vacuna=self.vacuna, proxima_fecha__lt=hoy, estado='vencida',
+            dosis_numero__lt=F('vacuna__dosis_total')
+        )
+
+        punto = transaction.savepoint()
+        creadas_oraculo = progresion_iterativa(candidatas, hoy)
+        oraculo = self.estado_final()
+        transaction.savepoint_rollback(punto)
+
+        creadas = _progresar_multidosis(candidatas, hoy)
+        self.assertGreater(creadas, 0)
+        self.assertEqual(creadas, creadas_oraculo)
+        self.assertEqual(self.estado_final(), oraculo)
+
+
+class ContextoUsuarioTests(TestCase):
+    """Consultas por request de los endpoints que usan `request.contexto` (token JWT real)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        datos = crear_clinica(veterinarios=1)
+        cls.usuario = datos['veterinarios'][0].trabajador.usuario
+
+    def setUp(self):
+        # La primera request del proceso leería la versión y la matriz de permisos
+        matriz_permisos()
+        self.cabecera = cabecera_jwt(self.usuario)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.cabecera)
+
+    def test_autenticacion_en_una_consulta(self):
+        request = Request(APIRequestFactory().get('/api/auth/me/', HTTP_AUTHORIZATION=self.cabecera))
+        with self.assertNumQueries(1):
+            usuario, _ = JWTAuthenticationContexto().authenticate(request)
+            self.assertEqual(usuario.trabajador.veterinario.especialidad.nombre, 'General')
+
+    def test_consultas_por_endpoint(self):
+        for url, consultas in (('/api/citas/', 2), ('/api/citas/mi-calendario/', 2), ('/api/auth/me/', 1)):
+            with self.subTest(url=url), self.assertNumQueries(consultas):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class ListadoCitasTests(TestCase):
+    """El listado de citas cuesta las mismas consultas con 10 o con 500 filas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        datos = crear_clinica(veterinarios=1)
+        cls.veterinario = datos['veterinarios'][0]
+        cls.mascotas = [datos['mascota']] + [
+            Mascota.objects.create(
+                nombreMascota=f'Mascota{i}', especie='Perro', raza='Mestizo', fechaNacimiento=date(2020, 3, 1),
+                genero='Macho', peso=12, color='Marrón', responsable=datos['responsable']
+            )
+            for i in range(4)
+        ]
+        cls.servicios = [datos['servicio'], Servicio.objects.create(nombre='Baño', precio=30, categoria='BAÑADO')]
+
+    def setUp(self):
+        matriz_permisos()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=cabecera_jwt(self.veterinario.trabajador.usuario))
+        self.urls = ('/api/citas/', f'/api/citas/por-veterinario/{self.veterinario.id}/')
+
+    def crear_citas(self, desde, hasta):
+        # Una cita cada 5 minutos a partir de mañana
+        inicio = date.today() + timedelta(days=1)
+        Cita.objects.bulk_create([
+            Cita(
+                fecha=inicio + timedelta(days=n // 288), hora=time((n % 288) // 12, (n % 12) * 5),
+                mascota=self.mascotas[n % len(self.mascotas)], veterinario=self.veterinario,
+                servicio=self.servicios[n % len(self.servicios)], estado='pendiente'
+            )
+            for n in range(desde, hasta)
+        ])
+
+    def assertConsultasPorUrl(self, filas):
+        for url in self.urls:
+            with self.subTest(url=url, filas=filas), self.assertNumQueries(2):
+                respuesta = self.client.get(url)
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertEqual(len(respuesta.data), filas)
+
+    def test_consultas_independientes_del_tamano(self):
+        self.crear_citas(0, 10)
+        self.assertConsultasPorUrl(10)
+        self.crear_citas(10, 500)
+        self.assertConsultasPorUrl(500)
+
+    def test_select_related_del_serializer(self):
+        self.crear_citas(0, 50)
+        citas = Cita.objects.filter(veterinario=self.veterinario)
+        esperado = CitaSerializer(citas, many=True).data
+        with self.assertNumQueries(1):
+            self.assertEqual(CitaSerializer(citas.select_related(*CitaSerializer.RELACIONES), many=True).data, esperado)
+
+
+class RespuestaProtocoloTests(TestCase):
+    """Las respuestas de aplicación informan el total de dosis del esquema efectivo, no Vacuna.dosis_total"""
+
+    @classmethod
+    def setUpTestData(cls):
+        datos = crear_clinica(veterinarios=1)
+        cls.administrador = datos['administrador']
+        cls.veterinario = datos['veterinarios'][0]
+        cls.cachorro = Mascota.objects.create(
+            nombreMascota='Bobby', especie='Perro', raza='Mestizo', fechaNacimiento=date.today() - timedelta(days=90),
+            genero='Macho', peso=3, color='Blanco', responsable=datos['responsable']
+        )
+        cls.producto = Producto.objects.create(
+            nombre='Quíntuple canina', proveedor='Lab', tipo='vacuna', stock=10, precio_venta=40
+        )
+
+    def setUp(self):
+        self.client = cliente(self.administrador)
+
+    def test_protocolo_completo_de_cachorro(self):
+        vacuna = Vacuna.objects.create(
+            nombre='Quíntuple', especies=['Perro'], frecuencia_meses=12, enfermedad_previene='-',
+            edad_minima_semanas=6, dosis_total=2, protocolo_cachorro={'dosis_total': 3}
+        )
+        respuesta = self.client.post(f'/api/vacunas/{vacuna.id}/aplicar-protocolo-completo/', {
+            'mascota_id': str(self.cachorro.id), 'veterinario_id': str(self.veterinario.id),
+            'fecha_aplicacion': date.today().isoformat(),
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.data)
+        protocolo_info = respuesta.data['data']['protocolo_info']
+        self.assertEqual(protocolo_info['dosis_total'], 3)
+        self.assertEqual(protocolo_info['dosis_aplicadas'], 3)
+
+    def test_aplicar_vacuna_con_protocolo_complejo(self):
+        vacuna = Vacuna.objects.create(
+            nombre='Triple', especies=['Perro'], frecuencia_meses=12, enfermedad_previene='-',
+            edad_minima_semanas=6, dosis_total=1, producto_inventario=self.producto,
+            protocolo_dosis=[{'dosis': 1, 'semanas_siguiente': 3}, {'dosis': 2, 'semanas_siguiente': 3}, {'dosis': 3}]
+        )
+        respuesta = self.client.post('/api/historial-vacunacion/aplicar-vacuna/', {
+            'mascota_id': str(self.cachorro.id), 'vacuna_id': str(vacuna.id),
+            'veterinario_id': str(self.veterinario.id), 'fecha_aplicacion': date.today().isoformat(),
+            'dosis_numero': 2,
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.data)
+        self.assertEqual(respuesta.data['data']['protocolo_info']['dosis_total'], 3)
+        self.assertFalse(respuesta.data['data']['protocolo_info']['es_dosis_final'])
+
+    def test_lote_valida_contra_el_esquema_de_la_mascota(self):
+        vacuna = Vacuna.objects.create(
+            nombre='Parvovirus', especies=['Perro'], frecuencia_meses=12, enfermedad_previene='-',
+            edad_minima_semanas=6, dosis_total=1, producto_inventario=self.producto,
+            protocolo_cachorro={'dosis_total': 3, 'intervalos': [3, 3]}
+        )
+        respuesta = self.client.post(f'/api/vacunas/{vacuna.id}/aplicar-lote/', {
+            'veterinario_id': str(self.veterinario.id),
+            'aplicaciones': [{'mascota_id': str(self.cachorro.id), 'fecha': date.today().isoformat(), 'dosis_numero': 2}],
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.data)
+        self.assertEqual(respuesta.data['data']['aplicadas'], 1)
+
+
+class AjusteStockTests(TestCase):
+    """Las ediciones manuales del stock quedan en el libro sin releer el producto"""
+
+    def setUp(self):
+        self.producto = Producto.objects.create(
+            nombre='Shampoo', proveedor='Lab', tipo='higiene', stock=10, precio_venta=25
+        )
+
+    def movimientos(self):
+        return sorted(MovimientoStock.objects.filter(producto=self.producto).values_list('tipo', 'cantidad'))
+
+    def test_alta_y_ajuste(self):
+        producto = Producto.objects.get(id=self.producto.id)
+        producto.stock = 7
+        with self.assertNumQueries(2):  # UPDATE del producto + INSERT del movimiento
+            producto.save()
+        producto.stock = 12
+        producto.save()
+        self.assertEqual(self.movimientos(), [('ajuste', -3), ('ajuste', 5), ('inicial', 10)])
+
+    def test_sin_cambio_de_stock_no_registra_ni_consulta(self):
+        producto = Producto.objects.get(id=self.producto.id)
+        producto.precio_venta = 30
+        with self.assertNumQueries(1):
+            producto.save()
+        producto.stock = 4
+        producto.save(update_fields=['precio_venta'])
+        self.assertEqual(self.movimientos(), [('inicial', 10)])
+
+    def test_stock_diferido(self):
+        producto = Producto.objects.only('id', 'nombre').get(id=self.producto.id)
+        producto.stock += 1
+        producto.save()
+        self.assertEqual(self.movimientos(), [('ajuste', 1), ('inicial', 10)])
+
+
+class VersionRecienteTests(TestCase):
+    """La versión se relee de la BD solo al vencer la lectura o tras invalidar en el mismo proceso"""
+
+    def test_relee_al_vencer_o_al_invalidar(self):
+        clave = 'pruebas:version'
+        self.assertEqual(versiones.version_reciente(clave, 60), 0)
+        # Invalidación hecha por otro proceso
+        VersionCache.objects.create(clave=clave, version=7)
+        with self.assertNumQueries(0):
+            self.assertEqual(versiones.version_reciente(clave, 60), 0)
+        self.assertEqual(versiones.version_reciente(clave, 0), 7)
+
+        versiones.incrementar(clave)
+        self.assertEqual(versiones.version_reciente(clave, 60), 8)
+
+
+@override_settings(PERMISOS_EN_TOKEN=True, PERMISOS_SEGUNDOS_VERIFICACION=60)
+class PermisosEnTokenTests(TestCase):
+    """Los claims del token se validan sin consultar la BD en cada request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = crear_clinica(veterinarios=1)['veterinarios'][0].trabajador.usuario
+
+    def setUp(self):
+        versiones._recientes.clear()
+        self.token = CustomTokenObtainPairSerializer.get_token(self.usuario).access_token
+
+    def autorizar(self, token):
+        request = Request(APIRequestFactory().get('/api/citas/'))
+        request.user, request.auth = self.usuario, token
+        return permiso_desde_token(request, 'citas', 'ver')
+
+    def test_sin_consultas(self):
+        with self.assertNumQueries(0):
+            self.assertTrue(self.autorizar(self.token))
+
+    def test_token_de_otro_proceso_tras_invalidar(self):
+        # Otro worker invalida y emite un token con la versión nueva
+        VersionCache.objects.create(clave=CLAVE_VERSION_PERMISOS, version=self.token['perm_v'] + 1)
+        nuevo = CustomTokenObtainPairSerializer.get_token(self.usuario).access_token
+        nuevo['perm_v'] = self.token['perm_v'] + 1
+
+        with self.assertNumQueries(1):
+            self.assertTrue(self.autorizar(nuevo))
+        with self.assertNumQueries(0), self.assertRaises(PermisosDesactualizados):
+            self.autorizar(self.token)
+
+
+class JSONRapidoTests(SimpleTestCase):
+    """El renderer con orjson escribe los mismos bytes que el de DRF"""
+
+    def test_misma_salida_que_drf(self):
+        estandar, rapido = JSONRenderer(), json_rapido.JSONRendererRapido()
+        for datos in (
+            {'a': 1e-05, 'b': [1e16, -1.5e-7, 1e22]}, {1: 'uno', None: 'nulo'}, [0.0001, 9990000000000000.0, -0.0],
+            {'id': '3e4f0e12-0000-4000-8000-000000000000', 'hora': '10:30e'},
+        ):
+            with self.subTest(datos=datos):
+                self.assertEqual(rapido.render(datos), estandar.render(datos))
@@ -2,8 +2,6 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import *
 
-from rest_framework_simplejwt.views import TokenRefreshView
-
 router = DefaultRouter()
 router.register(r'especialidades', EspecialidadViewSet)
 router.register(r'productos', ProductoViewSet) 
@@ -32,16 +30,20 @@ router.register(r'permisos-rol', PermisoRolViewSet)
 urlpatterns = router.urls + [
     # Autenticación
     path('login/', LoginView.as_view(), name='token_obtain_pair'),
-    path('refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('refresh/', RefreshView.as_view(), name='token_refresh'),
     path('trabajadores/registro/', RegistrarTrabajadorView.as_view(), name='registro_trabajador'),
 
     # Permisos y usuario autenticado
     path('auth/permisos/', obtener_permisos_usuario, name='obtener_permisos'),
     path('auth/me/', obtener_info_usuario, name='info_usuario'),
 
+    # Disponibilidad en memoria (mapas de bits)
+    path('disponibilidad/', disponibilidad, name='disponibilidad'),
+
     # Endpoints de alertas y dashboard
     path('alertas/', alertas_dashboard, name='alertas'),
     path('dashboard/alertas-vacunacion/', alertas_dashboard, name='alertas_dashboard'),
+    path('dashboard/contadores/', contadores_dashboard, name='contadores_dashboard'),
 
     # Endpoint para obtener veterinario externo
     path('veterinario-externo/', get_veterinario_externo, name='veterinario-externo'),
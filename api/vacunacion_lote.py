@@ -0,0 +1,268 @@
+"""
+Aplicación de vacunas en lote (jornadas de vacunación).
+
+Aplica una misma vacuna a muchas mascotas con un número fijo de consultas:
+mascotas, veterinarios e historial previo se cargan en bloque, las
+validaciones (especie, edad, duplicados, intervalos) se hacen en memoria y
+los registros se insertan con bulk_create. Cada elemento del lote devuelve su
+propio resultado; los elementos inválidos no impiden aplicar los demás.
+"""
+
+import uuid
+from datetime import date, timedelta
+
+from django.utils import timezone
+
+from .estadisticas import VACUNACION, invalidar
+from .inventario import descontar_vacunaciones
+from .models import HistorialVacunacion, Mascota, Producto, Veterinario
+from .protocolos import obtener_protocolo
+from .proyeccion_vacunas import recalcular
+
+MAX_LOTE = 1000
+ESTADOS_APLICADOS = ('aplicada', 'vigente', 'completado')
+ESTADOS_EXISTENTES = ('aplicada', 'vigente', 'proxima', 'completado')
+
+
+def _uuid(valor):
+    try:
+        return uuid.UUID(str(valor))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+def _error(indice, mascota_id, error_code, message):
+    return {
+        'indice': indice,
+        'mascota_id': str(mascota_id) if mascota_id else None,
+        'success': False,
+        'error_code': error_code,
+        'message': message,
+    }
+
+
+def aplicar_lote(vacuna, items, defaults=None):
+    """
+    Aplica `vacuna` a cada elemento de `items`
+    ({mascota_id, fecha_aplicacion|fecha, lote, veterinario_id, dosis_numero?, observaciones?}).
+    `defaults` completa los campos ausentes (ej. lote y veterinario comunes a la jornada).
+    Debe ejecutarse dentro de una transacción.
+
+    Returns:
+        (resultados, aplicadas): lista de resultados por elemento y número de registros creados
+    """
+    defaults = defaults or {}
+    hoy = date.today()
+    protocolo = obtener_protocolo(vacuna)
+
+    # 1. Normalizar entradas
+    entradas = []
+    for indice, item in enumerate(items):
+        if not isinstance(item, dict):
+            entradas.append((indice, None, 'INVALID_ITEM', 'Cada elemento debe ser un objeto'))
+            continue
+        datos = {**defaults, **{k: v for k, v in item.items() if v not in (None, '')}}
+        mascota_id = _uuid(datos.get('mascota_id'))
+        veterinario_id = _uuid(datos.get('veterinario_id'))
+        fecha_raw = datos.get('fecha_aplicacion') or datos.get('fecha')
+        if mascota_id is None or veterinario_id is None:
+            entradas.append((indice, datos.get('mascota_id'), 'INVALID_UUID_FORMAT',
+                             'mascota_id y veterinario_id deben ser UUIDs válidos'))
+            continue
+        try:
+            fecha_aplicacion = date.fromisoformat(str(fecha_raw))
+        except ValueError:
+            entradas.append((indice, mascota_id, 'INVALID_DATE_FORMAT',
+                             f'Formato de fecha inválido: "{fecha_raw}". Use formato YYYY-MM-DD.'))
+            continue
+        entradas.append((indice, mascota_id, veterinario_id, fecha_aplicacion, datos))
+
+    # 2. Carga en bloque de todo lo necesario para validar
+    mascota_ids = {e[1] for e in entradas if len(e) == 5}
+    veterinario_ids = {e[2] for e in entradas if len(e) == 5}
+    mascotas = Mascota.objects.in_bulk(mascota_ids)
+    veterinarios = Veterinario.objects.select_related('trabajador').in_bulk(veterinario_ids)
+
+    historial = {}
+    for registro in HistorialVacunacion.objects.filter(
+        mascota_id__in=mascota_ids, vacuna=vacuna
+    ).order_by('fecha_aplicacion', 'creado').only(
+        'id', 'mascota_id', 'fecha_aplicacion', 'proxima_fecha', 'dosis_numero', 'estado'
+    ):
+        historial.setdefault(registro.mascota_id, []).append(registro)
+
+    producto = None
+    disponibles = 0
+    if vacuna.producto_inventario_id:
+        producto = Producto.objects.select_for_update().filter(id=vacuna.producto_inventario_id).first()
+        disponibles = producto.stock if producto else 0
+
+    # 3. Validación en memoria y construcción de registros
+    resultados = []
+    nuevos = []
+    reinicios = set()
+    finales = set()
+    for entrada in entradas:
+        if len(entrada) == 4:
+            resultados.append(_error(*entrada))
+            continue
+        indice, mascota_id, veterinario_id, fecha_aplicacion, datos = entrada
+
+        if fecha_aplicacion > hoy:
+            resultados.append(_error(indice, mascota_id, 'FUTURE_APPLICATION_DATE',
+                                     f'Fecha de aplicación no puede ser futura: {fecha_aplicacion}'))
+            continue
+        if fecha_aplicacion < hoy - timedelta(days=3650):
+            resultados.append(_error(indice, mascota_id, 'DATE_TOO_OLD',
+                                     f'Fecha muy antigua: {fecha_aplicacion}. Máximo 10 años atrás.'))
+            continue
+
+        mascota = mascotas.get(mascota_id)
+        if mascota is None:
+            resultados.append(_error(indice, mascota_id, 'MASCOTA_NOT_FOUND', 'Mascota no encontrada'))
+            continue
+        if mascota.estado != 'Activo':
+            resultados.append(_error(indice, mascota_id, 'MASCOTA_INACTIVE',
+                                     f'La mascota "{mascota.nombreMascota}" está inactiva y no puede recibir vacunas.'))
+            continue
+        if vacuna.especies and mascota.especie not in vacuna.especies:
+            resultados.append(_error(indice, mascota_id, 'SPECIES_MISMATCH',
+                                     f'La vacuna {vacuna.nombre} no es aplicable a {mascota.especie}. '
+                                     f'Especies válidas: {", ".join(vacuna.especies)}'))
+            continue
+        if vacuna.edad_minima_semanas and mascota.fechaNacimiento:
+            edad_semanas = (fecha_aplicacion - mascota.fechaNacimiento).days / 7
+            if edad_semanas < vacuna.edad_minima_semanas:
+                resultados.append(_error(indice, mascota_id, 'MASCOTA_TOO_YOUNG',
+                                         f'La mascota tiene {edad_semanas:.1f} semanas y la vacuna {vacuna.nombre} '
+                                         f'requiere mínimo {vacuna.edad_minima_semanas} semanas de edad.'))
+                continue
+
+        veterinario = veterinarios.get(veterinario_id)
+        if veterinario is None:
+            resultados.append(_error(indice, mascota_id, 'VETERINARIAN_NOT_FOUND',
+                                     f'Veterinario no encontrado: {veterinario_id}'))
+            continue
+        if veterinario.trabajador.estado != 'Activo':
+            resultados.append(_error(indice, mascota_id, 'VETERINARIAN_INACTIVE',
+                                     'El veterinario está inactivo y no puede aplicar vacunas.'))
+            continue
+
+        previos = historial.get(mascota_id, [])
+        aplicados = [r for r in previos if r.estado in ESTADOS_APLICADOS]
+
+        # Protocolo efectivo de la mascota: variante cachorro/adulto o esquema complejo
+        es_cachorro = (hoy - mascota.fechaNacimiento).days <= 365 if mascota.fechaNacimiento else False
+        variante = protocolo.variante(es_cachorro, len(aplicados))
+        dosis_total = variante.dosis_total
+
+        # Sin dosis explícita: siguiente del protocolo, o refuerzo (última dosis) si ya se completó
+        dosis_raw = datos.get('dosis_numero')
+        try:
+            dosis_numero = int(dosis_raw) if dosis_raw is not None else min(len(aplicados) + 1, dosis_total)
+        except (TypeError, ValueError):
+            resultados.append(_error(indice, mascota_id, 'INVALID_DOSE_FORMAT',
+                                     f'Número de dosis inválido: "{dosis_raw}". Debe ser un número entero.'))
+            continue
+        if dosis_numero <= 0 or dosis_numero > dosis_total:
+            resultados.append(_error(indice, mascota_id, 'PROTOCOL_DOSE_EXCEEDED',
+                                     f'Dosis {dosis_numero} fuera del protocolo de {vacuna.nombre} '
+                                     f'({dosis_total} dosis).'))
+            continue
+
+        if any(r.fecha_aplicacion == fecha_aplicacion and r.dosis_numero == dosis_numero for r in aplicados):
+            resultados.append(_error(indice, mascota_id, 'DUPLICATE_EXACT_DOSE',
+                                     f'Ya se aplicó dosis {dosis_numero} de {vacuna.nombre} a esta mascota '
+                                     f'el {fecha_aplicacion}.'))
+            continue
+
+        # Intervalo mínimo desde la última aplicación (mismas reglas que /aplicar/)
+        existentes = [r for r in previos if r.estado in ESTADOS_EXISTENTES and r.fecha_aplicacion]
+        ultima = max(existentes, key=lambda r: r.fecha_aplicacion) if existentes else None
+        if ultima:
+            dias_desde_ultima = (fecha_aplicacion - ultima.fecha_aplicacion).days
+            if dosis_total > 1 and len(existentes) < dosis_total:
+                dias_minimo = int(vacuna.intervalo_dosis_semanas * 7 * 0.8)
+            else:
+                dias_minimo = 30
+            if dias_desde_ultima < dias_minimo:
+                resultados.append(_error(indice, mascota_id, 'RECENTLY_APPLIED',
+                                         f'{vacuna.nombre} fue aplicada recientemente el {ultima.fecha_aplicacion} '
+                                         f'(hace {dias_desde_ultima} días). Espere al menos {dias_minimo} días para reaplicar.'))
+                continue
+            if dosis_total == 1 and ultima.estado == 'vigente' and dias_desde_ultima < 300:
+                resultados.append(_error(indice, mascota_id, 'VACCINE_STILL_VALID',
+                                         f'{vacuna.nombre} aún está vigente (aplicada el {ultima.fecha_aplicacion}).'))
+                continue
+
+        if disponibles <= 0:
+            resultados.append(_error(
+                indice, mascota_id, 'NO_PRODUCTO_VINCULADO' if producto is None else 'SIN_STOCK',
+                f'La vacuna "{vacuna.nombre}" no tiene un producto de inventario asociado.' if producto is None
+                else f'Sin stock disponible para "{vacuna.nombre}".'
+            ))
+            continue
+
+        # Reinicio del protocolo por atraso
+        ultima_aplicada = aplicados[-1] if aplicados else None
+        if ultima_aplicada and ultima_aplicada.proxima_fecha:
+            atraso = (fecha_aplicacion - ultima_aplicada.proxima_fecha).days
+            if atraso > protocolo.max_atraso(len(aplicados), variante):
+                reinicios.add(mascota_id)
+                dosis_numero = 1
+
+        proxima_fecha, es_dosis_final, intervalo_usado = protocolo.proxima_fecha(
+            fecha_aplicacion, dosis_numero, variante
+        )
+        registro = HistorialVacunacion(
+            mascota_id=mascota_id,
+            vacuna=vacuna,
+            fecha_aplicacion=fecha_aplicacion,
+            proxima_fecha=proxima_fecha,
+            veterinario_id=veterinario_id,
+            dosis_numero=dosis_numero,
+            lote=datos.get('lote', ''),
+            laboratorio=datos.get('laboratorio', ''),
+            observaciones=datos.get('observaciones', ''),
+            estado='aplicada'
+        )
+        nuevos.append(registro)
+        if es_dosis_final or dosis_numero >= dosis_total:
+            finales.add(mascota_id)
+        # Los siguientes elementos del lote para la misma mascota ven esta aplicación
+        historial.setdefault(mascota_id, []).append(registro)
+        disponibles -= 1
+
+        resultados.append({
+            'indice': indice,
+            'mascota_id': str(mascota_id),
+            'success': True,
+            'historial_id': str(registro.id),
+            'dosis_numero': dosis_numero,
+            'proxima_fecha': proxima_fecha.isoformat(),
+            'intervalo_usado': intervalo_usado,
+            'reinicio_por_atraso': mascota_id in reinicios,
+        })
+
+    if not nuevos:
+        return resultados, 0
+
+    # 4. Escritura en bloque
+    ahora = timezone.now()
+    if reinicios:
+        HistorialVacunacion.objects.filter(
+            mascota_id__in=reinicios, vacuna=vacuna,
+            estado__in=['aplicada', 'vigente', 'vencida']
+        ).update(estado='vencida_reinicio', actualizado=ahora)
+    HistorialVacunacion.objects.bulk_create(nuevos, batch_size=500)
+    if finales:
+        HistorialVacunacion.objects.filter(
+            mascota_id__in=finales, vacuna=vacuna,
+            estado__in=['aplicada', 'vigente', 'vencida', 'proxima', 'vencida_reinicio']
+        ).exclude(id__in=[r.id for r in nuevos]).update(estado='completado', actualizado=ahora)
+    # bulk_create no dispara signals: stock y proyección se actualizan explícitamente
+    descontar_vacunaciones(producto, nuevos)
+    recalcular({(mascota_id, vacuna.id) for mascota_id in {r.mascota_id for r in nuevos}})
+    invalidar(VACUNACION)
+
+    return resultados, len(nuevos)
@@ -0,0 +1,74 @@
+"""
+Versiones compartidas de las cachés derivadas.
+
+Cada caché en memoria (matriz de permisos, mapas de disponibilidad) se
+etiqueta con un contador de la tabla VersionCache. Leerlo es una consulta por
+clave única; invalidar es un UPDATE atómico de version + 1. Como el contador
+está en la BD, una invalidación hecha en cualquier proceso la ven todos los
+demás en su siguiente lectura, y no la pierde ningún reinicio ni desalojo de
+la caché. Una clave sin fila tiene versión 0.
+
+Para lecturas en cada request (permisos) `version_reciente` guarda la versión
+leída en el proceso y solo vuelve a consultar la BD cuando su lectura tiene
+más de `antiguedad_maxima` segundos: una invalidación tarda como mucho ese
+tiempo en llegar a los demás procesos.
+"""
+
+import time
+from threading import Lock
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import VersionCache
+
+# {clave: (versión, instante de la lectura en time.monotonic())} de este proceso
+_recientes = {}
+_recientes_lock = Lock()
+
+
+def version(clave):
+    """Versión actual de la clave (0 si nunca se invalidó)"""
+    return VersionCache.objects.filter(clave=clave).values_list('version', flat=True).first() or 0
+
+
+def version_reciente(clave, antiguedad_maxima, minima=None):
+    """
+    Versión de la clave leída en este proceso hace menos de `antiguedad_maxima`
+    segundos. Si se conoce una versión `minima` ya publicada (p. ej. la de un
+    token emitido por otro proceso) y la guardada es anterior, se relee.
+    """
+    ahora = time.monotonic()
+    leida = _recientes.get(clave)
+    if (leida is None or ahora - leida[1] >= antiguedad_maxima
+            or (minima is not None and leida[0] < minima)):
+        leida = (version(clave), ahora)
+        with _recientes_lock:
+            _recientes[clave] = leida
+    return leida[0]
+
+
+def versiones(claves):
+    """{clave: versión} de varias claves en una sola consulta"""
+    actuales = dict(VersionCache.objects.filter(clave__in=claves).values_list('clave', 'version'))
+    return {clave: actuales.get(clave, 0) for clave in claves}
+
+
+def incrementar(clave):
+    """Publica una versión nueva de la clave para todos los procesos"""
+    actualizados = VersionCache.objects.filter(clave=clave).update(
+        version=F('version') + 1, actualizado=timezone.now()
+    )
+    if not actualizados:
+        try:
+            with transaction.atomic():
+                VersionCache.objects.create(clave=clave, version=1)
+        except IntegrityError:
+            # Otro proceso creó la fila al mismo tiempo
+            VersionCache.objects.filter(clave=clave).update(
+                version=F('version') + 1, actualizado=timezone.now()
+            )
+    # Este proceso la vuelve a leer de inmediato; los demás al vencer su lectura
+    with _recientes_lock:
+        _recientes.pop(clave, None)
@@ -1,10 +1,19 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from .permissions import make_permiso_api, EsAdministrador
+from .permissions import make_permiso_api, EsAdministrador, invalidar_permisos
+from .slots import (
+    generar_slots_veterinario, liberar_reservas_expiradas, reservar_slot_temporal,
+    ocupar_slot, liberar_slot, respuesta_slot_no_disponible
+)
+from .conflictos import AgendaDia, respuesta_conflicto
+from .contexto import obtener_contexto
+from .paginacion import paginar, responder_lista
+from .inventario import StockInsuficiente
+from .protocolos import obtener_protocolo
 
 from django.shortcuts import get_object_or_404
 from django.db import transaction, IntegrityError
@@ -25,7 +34,7 @@ import traceback
 from .models import (
     Especialidad, Consultorio, TipoDocumento, Trabajador, Veterinario,
     Servicio, Producto, Mascota, Responsable, Cita, Usuario,
-    EstadoCita, Vacuna, HistorialVacunacion, HistorialMedico,
+    EstadoCita, Vacuna, HistorialVacunacion, HistorialMedico, EstadoVacunaMascota,
     # 🚀 Nuevos modelos profesionales
     HorarioTrabajo, SlotTiempo, PermisoRol
 )
@@ -38,6 +47,8 @@ from .serializers import (
     ProductoSerializer, MascotaSerializer, ResponsableSerializer,
     CitaSerializer, CustomTokenObtainPairSerializer, VacunaSerializer,
     HistorialVacunacionSerializer, HistorialMedicoSerializer, VacunasAlertaSerializer,
+    CustomTokenRefreshSerializer,
+    ServicioAdicionalSerializer,
     # 🚀 Nuevos serializers profesionales
     HorarioTrabajoSerializer, SlotTiempoSerializer, CitaProfesionalSerializer,
     # 🔐 Serializers de permisos
@@ -59,8 +70,7 @@ class EspecialidadViewSet(viewsets.ModelViewSet):
     def activos(self, request):
         # Devuelve solo los tipos de documento cuyo estado es 'ACTIVO'
         especialidad_activos = Especialidad.objects.filter(estado__iexact='activo')
-        serializer = self.get_serializer(especialidad_activos, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, especialidad_activos)
 
     @action(detail=True, methods=['patch'])
     def desactivar(self, request, pk=None):
@@ -82,15 +92,13 @@ class EspecialidadViewSet(viewsets.ModelViewSet):
     def all(self, request):
         # Devuelve todas las especialidades, independientemente de su estado
         especialidades = Especialidad.objects.all()
-        serializer = self.get_serializer(especialidades, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, especialidades)
     # Método para contar las especialidades
     @action(detail=False, methods=['get'], url_path='count')
     def count(self, request):
-        # Contamos el número total de especialidades
-        count = Especialidad.objects.count()
-        # Devolvemos la respuesta en formato JSON
-        return Response({'total': count})
+        # Contamos el número total de especialidades (agregado cacheado)
+        from .estadisticas import estadisticas_especialidades
+        return Response({'total': estadisticas_especialidades()['total']})
 
 # ViewSet for Consultorio
 class ConsultorioViewSet(viewsets.ModelViewSet):
@@ -105,8 +113,7 @@ class ConsultorioViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='all')
     def all(self, request):
         consultorios = Consultorio.objects.all()
-        serializer = self.get_serializer(consultorios, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, consultorios)
 
     @action(detail=True, methods=['patch'], url_path='cerrar')
     def cerrar(self, request, pk=None):
@@ -125,8 +132,7 @@ class ConsultorioViewSet(viewsets.ModelViewSet):
     def abiertos(self, request):
         # Devuelve solo los tipos de documento cuyo estado es 'ACTIVO'
         especialidad_activos = Especialidad.objects.filter(estado__iexact='abiertos')
-        serializer = self.get_serializer(especialidad_activos, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, especialidad_activos)
 
 
 # ViewSet for TipoDocumento
@@ -142,8 +148,7 @@ class TipoDocumentoViewSet(viewsets.ModelViewSet):
     def activos(self, request):
         # Devuelve solo los tipos de documento cuyo estado es 'ACTIVO'
         tipos_documento_activos = TipoDocumento.objects.filter(estado__iexact='activo')
-        serializer = self.get_serializer(tipos_documento_activos, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, tipos_documento_activos)
     
     @action(detail=True, methods=['patch'])
     def desactivar(self, request, pk=None):
@@ -163,8 +168,7 @@ class TipoDocumentoViewSet(viewsets.ModelViewSet):
     def all(self, request):
         # Devuelve todos los tipos de documento, independientemente de su estado
         tipos_documento = TipoDocumento.objects.all()
-        serializer = self.get_serializer(tipos_documento, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, tipos_documento)
 
 
 
@@ -230,8 +234,7 @@ class TrabajadorViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='activos')
     def activos(self, request):
         trabajadores_activos = Trabajador.objects.filter(estado__iexact='activo')
-        serializer = self.get_serializer(trabajadores_activos, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, trabajadores_activos)
 
     @action(detail=True, methods=['put'], url_path='reset-password')
     def reset_password(self, request, pk=None):
@@ -251,13 +254,12 @@ class TrabajadorViewSet(viewsets.ModelViewSet):
     def veterinarios(self, request):
         # Solo veterinarios activos (ahora usa 'veterinario' en minúscula)
         veterinarios = Trabajador.objects.filter(usuario__rol='veterinario', estado__iexact='activo')
-        serializer = self.get_serializer(veterinarios, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, veterinarios)
 
     @action(detail=False, methods=['get'], url_path='count')
     def count(self, request):
-        count = Trabajador.objects.count()
-        return Response({'total': count})
+        from .estadisticas import estadisticas_trabajadores
+        return Response({'total': estadisticas_trabajadores()['total']})
 
 # ViewSet for Veterinario
 class VeterinarioViewSet(viewsets.ModelViewSet):
@@ -367,15 +369,13 @@ class ServicioViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='all')
     def all(self, request):
         servicios = Servicio.objects.all()
-        serializer = self.get_serializer(servicios, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, servicios)
 
     @action(detail=False, methods=['get'], url_path='activos')
     def activos(self, request):
         # Devuelve solo los servicios cuyo estado es 'ACTIVO'
         servicios_activos = Servicio.objects.filter(estado__iexact='activo')
-        serializer = self.get_serializer(servicios_activos, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, servicios_activos)
 
 class ProductoViewSet(viewsets.ModelViewSet):
     queryset = Producto.objects.all()
@@ -410,7 +410,7 @@ class ProductoViewSet(viewsets.ModelViewSet):
     def desactivar(self, request, pk=None):
         producto = self.get_object()
         producto.estado = 'Inactivo'
-        producto.save()
+        producto.save(update_fields=['estado'])
         return Response({'status': 'producto desactivado'})
 
     # Activa un producto (cambia su estado a ACTIVO)
@@ -418,29 +418,26 @@ class ProductoViewSet(viewsets.ModelViewSet):
     def activar(self, request, pk=None):
         producto = self.get_object()
         producto.estado = 'Activo'
-        producto.save()
+        producto.save(update_fields=['estado'])
         return Response({'status': 'producto activado'})
 
     @action(detail=False, methods=['get'], url_path='activos')
     def activos(self, request):
         # Devuelve solo los productos cuyo estado es 'ACTIVO'
         productos_activos = Producto.objects.filter(estado__iexact='activo')
-        serializer = self.get_serializer(productos_activos, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, productos_activos)
 
     # Devuelve todos los productos, sin importar su estado
     @action(detail=False, methods=['get'], url_path='all')
     def all(self, request):
         productos = Producto.objects.all()
-        serializer = self.get_serializer(productos, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, productos)
     # Método para contar los productos
     @action(detail=False, methods=['get'], url_path='count')
     def count(self, request):
-        # Contamos el número total de productos
-        count = Producto.objects.count()
-        # Devolvemos la respuesta en formato JSON
-        return Response({'total': count})
+        # Contamos el número total de productos (agregado cacheado)
+        from .estadisticas import estadisticas_productos
+        return Response({'total': estadisticas_productos()['total']})
     
     @action(detail=False, methods=['get'], url_path='vacunas')
     def vacunas_inventario(self, request):
@@ -467,8 +464,7 @@ class ProductoViewSet(viewsets.ModelViewSet):
         
         # Sin límite - mostrar todos los productos disponibles
         
-        serializer = self.get_serializer(productos_vacunas, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, productos_vacunas)
     
 class MascotaViewSet(viewsets.ModelViewSet):
     queryset = Mascota.objects.all()
@@ -521,8 +517,7 @@ class MascotaViewSet(viewsets.ModelViewSet):
     def activos(self, request):
         # Devuelve solo las mascotas cuyo estado es 'ACTIVO'
         mascotas_activos = Mascota.objects.filter(estado__iexact='activo')
-        serializer = self.get_serializer(mascotas_activos, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, mascotas_activos)
     # Desactiva una mascota (cambia su estado a INACTIVO)
     @action(detail=True, methods=['patch'],url_path='desactivar')
     def desactivar(self, request, pk=None):
@@ -540,10 +535,9 @@ class MascotaViewSet(viewsets.ModelViewSet):
     # Método para contar las mascotas
     @action(detail=False, methods=['get'], url_path='count')
     def count(self, request):
-        # Contamos el número total de mascotas
-        count = Mascota.objects.count()
-        # Devolvemos la respuesta en formato JSON
-        return Response({'total': count})
+        # Contamos el número total de mascotas (agregado cacheado)
+        from .estadisticas import estadisticas_mascotas
+        return Response({'total': estadisticas_mascotas()['total']})
     
     @action(detail=True, methods=['get'], url_path='historial-vacunacion')
     def historial_vacunacion(self, request, pk=None):
@@ -565,15 +559,19 @@ class MascotaViewSet(viewsets.ModelViewSet):
         ).order_by('-fecha_aplicacion')
         
         # Usar el serializer que ya tiene los campos correctos
-        serializer = HistorialVacunacionSerializer(historial, many=True)
+        filas, paginacion = paginar(self, historial)
+        serializer = HistorialVacunacionSerializer(filas, many=True)
         
-        return Response({
+        respuesta = {
             'mascota_id': str(mascota.id),
             'mascota_nombre': mascota.nombreMascota,
             'total_vacunas': historial.count(),
             'historial': serializer.data,
             'status': 'success'
-        })
+        }
+        if paginacion:
+            respuesta['paginacion'] = paginacion
+        return Response(respuesta)
     
 class ResponsableViewSet(viewsets.ModelViewSet):
     queryset = Responsable.objects.all()
@@ -601,17 +599,17 @@ class CitaViewSet(viewsets.ModelViewSet):
         También soporta filtrado manual con query param 'veterinario_id'
         """
         user = self.request.user
-        queryset = Cita.objects.all()
+        # Relaciones que lee el serializer: número de consultas constante por página
+        queryset = Cita.objects.select_related(*CitaSerializer.RELACIONES)
 
         # Si es veterinario, solo mostrar SUS citas
         if user.rol == 'veterinario':
-            try:
-                # Obtener el veterinario asociado al usuario
-                veterinario = user.trabajador.veterinario
-                queryset = queryset.filter(veterinario=veterinario)
-            except Exception as e:
+            # Veterinario asociado al usuario (resuelto en la autenticación)
+            veterinario = obtener_contexto(self.request).veterinario
+            if veterinario is None:
                 # Si no tiene veterinario asociado, no mostrar nada
                 return Cita.objects.none()
+            queryset = queryset.filter(veterinario=veterinario)
 
         # Filtrado adicional por query param (para admin/recepcionista)
         vet_id = self.request.query_params.get('veterinario_id')
@@ -624,7 +622,7 @@ class CitaViewSet(viewsets.ModelViewSet):
         """
         Crear cita con validación de slots y prevención de conflictos
         """
-        from datetime import datetime, timedelta
+        from datetime import datetime
 
         data = request.data
         veterinario_id = data.get('veterinario')
@@ -650,76 +648,45 @@ class CitaViewSet(viewsets.ModelViewSet):
                 'error_code': 'INVALID_DATE_FORMAT'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Calcular duración total del servicio
-        duracion_total = servicio.duracion_total_minutos()
-
-        # Verificar conflictos con otras citas
-        hora_inicio_dt = datetime.combine(fecha_obj, hora_obj)
-        hora_fin_dt = hora_inicio_dt + timedelta(minutes=duracion_total)
-
-        citas_conflicto = Cita.objects.filter(
-            veterinario=veterinario,
-            fecha=fecha_obj,
-            estado__in=['pendiente', 'confirmada']  # Solo citas activas
-        ).exclude(
-            Q(hora__gte=hora_fin_dt.time()) | Q(hora__lt=hora_obj)
-        )
-
-        if citas_conflicto.exists():
-            cita_conflicto = citas_conflicto.first()
+        # Conflictos, ocupación del slot e inserción de la cita en una sola transacción
+        try:
+            with transaction.atomic():
+                # Bloquear al veterinario serializa las reservas concurrentes de su agenda
+                Veterinario.objects.select_for_update().filter(id=veterinario.id).exists()
+
+                # Verificar conflictos con otras citas (incluye preparación y limpieza)
+                conflictos = AgendaDia(veterinario, fecha_obj).conflictos(hora_obj, servicio)
+                if conflictos:
+                    return Response(respuesta_conflicto(conflictos[0]), status=status.HTTP_409_CONFLICT)
+
+                # Ocupar el slot correspondiente (si existe) con un UPDATE condicional
+                slot_id = SlotTiempo.objects.filter(
+                    veterinario=veterinario,
+                    fecha=fecha_obj,
+                    hora_inicio=hora_obj
+                ).values_list('id', flat=True).first()
+
+                if slot_id and not ocupar_slot(slot_id):
+                    return Response(respuesta_slot_no_disponible(slot_id), status=status.HTTP_409_CONFLICT)
+
+                # Crear la cita
+                serializer = self.get_serializer(data=data)
+                if not serializer.is_valid():
+                    transaction.set_rollback(True)
+                    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+                serializer.save()
+        except IntegrityError:
             return Response({
-                'error': f'El veterinario ya tiene una cita a las {cita_conflicto.hora}',
-                'error_code': 'TIME_CONFLICT',
-                'cita_existente': {
-                    'id': str(cita_conflicto.id),
-                    'hora': str(cita_conflicto.hora),
-                    'mascota': cita_conflicto.mascota.nombreMascota
-                }
+                'error': 'El veterinario ya tiene una cita registrada en ese horario',
+                'error_code': 'TIME_CONFLICT'
             }, status=status.HTTP_409_CONFLICT)
 
-        # Buscar slot correspondiente
-        slot = SlotTiempo.objects.filter(
-            veterinario=veterinario,
-            fecha=fecha_obj,
-            hora_inicio=hora_obj
-        ).first()
-
-        # Si existe slot, validar disponibilidad
-        if slot:
-            if not slot.disponible:
-                return Response({
-                    'error': 'El slot seleccionado no está disponible',
-                    'error_code': 'SLOT_NOT_AVAILABLE',
-                    'motivo': slot.motivo_no_disponible
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            if slot.esta_reservado_temporalmente():
-                return Response({
-                    'error': 'El slot está reservado temporalmente por otro usuario',
-                    'error_code': 'SLOT_RESERVED',
-                    'reservado_hasta': slot.reservado_hasta
-                }, status=status.HTTP_409_CONFLICT)
-
-        # Crear la cita
-        serializer = self.get_serializer(data=data)
-        if serializer.is_valid():
-            cita = serializer.save()
-
-            # Marcar slot como ocupado si existe
-            if slot:
-                slot.disponible = False
-                slot.motivo_no_disponible = 'ocupado'
-                slot.reservado_hasta = None  # Limpiar reserva temporal
-                slot.save()
-
-            return Response({
-                'mensaje': 'Cita creada exitosamente',
-                'cita': serializer.data,
-                'slot_ocupado': str(slot.id) if slot else None,
-                'status': 'success'
-            }, status=status.HTTP_201_CREATED)
-        else:
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'mensaje': 'Cita creada exitosamente',
+            'cita': serializer.data,
+            'slot_ocupado': str(slot_id) if slot_id else None,
+            'status': 'success'
+        }, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['patch'], url_path='cambiar-estado')
     def cambiar_estado(self, request, pk=None):
@@ -772,7 +739,7 @@ class CitaViewSet(viewsets.ModelViewSet):
         Cambia la fecha y hora y marca estado como "reprogramada".
         Libera el slot anterior y ocupa el nuevo slot.
         """
-        from datetime import datetime, timedelta
+        from datetime import datetime
 
         cita = self.get_object()
         nueva_fecha = request.data.get('fecha')
@@ -797,79 +764,52 @@ class CitaViewSet(viewsets.ModelViewSet):
         fecha_anterior = cita.fecha
         hora_anterior = cita.hora
 
-        # Calcular duración total del servicio
-        servicio = cita.servicio
-        duracion_total = servicio.duracion_total_minutos()
+        mismo_horario = (fecha_anterior, hora_anterior) == (nueva_fecha_obj, nueva_hora_obj)
 
-        # Verificar conflictos con otras citas en el nuevo horario
-        hora_inicio_dt = datetime.combine(nueva_fecha_obj, nueva_hora_obj)
-        hora_fin_dt = hora_inicio_dt + timedelta(minutes=duracion_total)
-
-        citas_conflicto = Cita.objects.filter(
-            veterinario=cita.veterinario,
-            fecha=nueva_fecha_obj,
-            estado__in=['pendiente', 'confirmada', 'reprogramada']
-        ).exclude(
-            Q(hora__gte=hora_fin_dt.time()) | Q(hora__lt=nueva_hora_obj)
-        ).exclude(id=cita.id)  # Excluir la cita actual
-
-        if citas_conflicto.exists():
-            cita_conflicto = citas_conflicto.first()
+        try:
+            with transaction.atomic():
+                # Bloquear al veterinario serializa las reservas concurrentes de su agenda
+                Veterinario.objects.select_for_update().filter(id=cita.veterinario_id).exists()
+
+                # Verificar conflictos en el nuevo horario (excluyendo la cita actual)
+                agenda = AgendaDia(cita.veterinario, nueva_fecha_obj, excluir_cita_id=cita.id)
+                conflictos = agenda.conflictos(nueva_hora_obj, cita.servicio)
+                if conflictos:
+                    return Response(respuesta_conflicto(conflictos[0]), status=status.HTTP_409_CONFLICT)
+
+                # Ocupar el nuevo slot (si existe) con un UPDATE condicional
+                nuevo_slot_id = None
+                if not mismo_horario:
+                    nuevo_slot_id = SlotTiempo.objects.filter(
+                        veterinario=cita.veterinario,
+                        fecha=nueva_fecha_obj,
+                        hora_inicio=nueva_hora_obj
+                    ).values_list('id', flat=True).first()
+
+                    if nuevo_slot_id and not ocupar_slot(nuevo_slot_id):
+                        return Response(respuesta_slot_no_disponible(nuevo_slot_id), status=status.HTTP_409_CONFLICT)
+
+                # Liberar slot anterior
+                slot_anterior_id = None
+                if not mismo_horario:
+                    slot_anterior_id = liberar_slot(cita.veterinario, fecha_anterior, hora_anterior)
+
+                # Actualizar la cita
+                cita.fecha = nueva_fecha
+                cita.hora = nueva_hora
+                cita.estado = EstadoCita.REPROGRAMADA
+                cita.save()
+        except IntegrityError:
             return Response({
-                'error': f'El veterinario ya tiene una cita a las {cita_conflicto.hora}',
-                'error_code': 'TIME_CONFLICT',
-                'cita_existente': {
-                    'id': str(cita_conflicto.id),
-                    'hora': str(cita_conflicto.hora),
-                    'mascota': cita_conflicto.mascota.nombreMascota
-                }
+                'error': 'El veterinario ya tiene una cita registrada en ese horario',
+                'error_code': 'TIME_CONFLICT'
             }, status=status.HTTP_409_CONFLICT)
 
-        # Verificar disponibilidad del nuevo slot
-        nuevo_slot = SlotTiempo.objects.filter(
-            veterinario=cita.veterinario,
-            fecha=nueva_fecha_obj,
-            hora_inicio=nueva_hora_obj
-        ).first()
-
-        if nuevo_slot:
-            if not nuevo_slot.disponible:
-                return Response({
-                    'error': 'El nuevo slot no está disponible',
-                    'error_code': 'SLOT_NOT_AVAILABLE',
-                    'motivo': nuevo_slot.motivo_no_disponible
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-        # 1. Liberar slot anterior
-        slot_anterior = SlotTiempo.objects.filter(
-            veterinario=cita.veterinario,
-            fecha=fecha_anterior,
-            hora_inicio=hora_anterior
-        ).first()
-
-        if slot_anterior:
-            slot_anterior.disponible = True
-            slot_anterior.motivo_no_disponible = ''
-            slot_anterior.save()
-
-        # 2. Actualizar la cita
-        cita.fecha = nueva_fecha
-        cita.hora = nueva_hora
-        cita.estado = EstadoCita.REPROGRAMADA
-        cita.save()
-
-        # 3. Marcar nuevo slot como ocupado
-        if nuevo_slot:
-            nuevo_slot.disponible = False
-            nuevo_slot.motivo_no_disponible = 'ocupado'
-            nuevo_slot.reservado_hasta = None  # Limpiar reserva temporal si existe
-            nuevo_slot.save()
-
         return Response({
             'status': 'cita reprogramada',
             'mensaje': 'Cita reprogramada exitosamente',
-            'slot_anterior_liberado': str(slot_anterior.id) if slot_anterior else None,
-            'nuevo_slot_ocupado': str(nuevo_slot.id) if nuevo_slot else None,
+            'slot_anterior_liberado': str(slot_anterior_id) if slot_anterior_id else None,
+            'nuevo_slot_ocupado': str(nuevo_slot_id) if nuevo_slot_id else None,
             'nueva_fecha': nueva_fecha,
             'nueva_hora': nueva_hora
         }, status=status.HTTP_200_OK)
@@ -880,9 +820,97 @@ class CitaViewSet(viewsets.ModelViewSet):
         GET /api/citas/por-veterinario/{veterinario_id}/
         Devuelve solo las citas asignadas al veterinario con ID {veterinario_id}.
         """
-        citas_vet = Cita.objects.filter(veterinario__id=veterinario_id)
-        serializer = self.get_serializer(citas_vet, many=True)
-        return Response(serializer.data)
+        citas_vet = Cita.objects.filter(veterinario__id=veterinario_id).select_related(*CitaSerializer.RELACIONES)
+        return responder_lista(self, citas_vet)
+
+    @action(detail=False, methods=['get'], url_path='proximo-disponible')
+    def proximo_disponible(self, request):
+        """
+        GET /api/citas/proximo-disponible/?servicio=<uuid>&desde=YYYY-MM-DD&especialidad=<uuid>&limite=5
+
+        Busca hacia adelante, día por día y entre todos los veterinarios activos,
+        los primeros huecos donde cabe el servicio completo (preparación +
+        atención + limpieza). Si el servicio requiere consultorio especial, solo
+        se ofrecen horas con un SlotTiempo libre en un consultorio abierto.
+        """
+        from datetime import datetime
+        from .choices import Estado
+        from .disponibilidad import buscar_proximos
+
+        params = request.query_params
+        if not params.get('servicio'):
+            return Response({
+                'error': 'El parámetro servicio es requerido',
+                'error_code': 'MISSING_SERVICIO'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            servicio = Servicio.objects.get(id=params['servicio'])
+        except (Servicio.DoesNotExist, ValidationError):
+            return Response({
+                'error': 'Servicio no encontrado',
+                'error_code': 'SERVICIO_NOT_FOUND'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            desde = datetime.strptime(params['desde'], '%Y-%m-%d').date() if params.get('desde') else date.today()
+            limite = min(int(params.get('limite', 5)), 50)
+            horizonte = min(int(params.get('horizonte_dias', 60)), 120)
+        except ValueError:
+            return Response({
+                'error': 'Parámetros inválidos (desde YYYY-MM-DD, limite y horizonte_dias enteros)',
+                'error_code': 'INVALID_PARAMETERS'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        ahora = timezone.localtime()
+        if desde < ahora.date():
+            desde = ahora.date()
+        minuto_minimo = ahora.hour * 60 + ahora.minute if desde == ahora.date() else 0
+
+        veterinarios = Veterinario.objects.select_related('trabajador', 'especialidad').filter(
+            trabajador__estado=Estado.ACTIVO,
+            horarios_trabajo__activo=True
+        ).distinct()
+        if params.get('especialidad'):
+            try:
+                veterinarios = veterinarios.filter(especialidad_id=params['especialidad'])
+                veterinarios = list(veterinarios)
+            except ValidationError:
+                return Response({
+                    'error': 'ID de especialidad inválido',
+                    'error_code': 'INVALID_PARAMETERS'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        veterinarios = {v.id: v for v in veterinarios}
+
+        huecos = buscar_proximos(
+            servicio, veterinarios.keys(), desde,
+            limite=limite, horizonte_dias=horizonte, minuto_minimo=minuto_minimo
+        )
+
+        resultados = []
+        for fecha, minutos, veterinario_id in huecos:
+            veterinario = veterinarios[veterinario_id]
+            resultados.append({
+                'fecha': str(fecha),
+                'hora': f'{int(minutos) // 60:02d}:{int(minutos) % 60:02d}',
+                'veterinario_id': str(veterinario_id),
+                'veterinario': f'{veterinario.trabajador.nombres} {veterinario.trabajador.apellidos}',
+                'especialidad': veterinario.especialidad.nombre if veterinario.especialidad else None,
+            })
+
+        return Response({
+            'servicio': {
+                'id': str(servicio.id),
+                'nombre': servicio.nombre,
+                'duracion_total_minutos': servicio.duracion_total_minutos(),
+                'requiere_consultorio_especial': servicio.requiere_consultorio_especial
+            },
+            'desde': str(desde),
+            'horizonte_dias': horizonte,
+            'resultados': resultados,
+            'total': len(resultados),
+            'status': 'success'
+        })
 
     @action(detail=False, methods=['get'], url_path='mi-calendario')
     def mi_calendario(self, request):
@@ -913,56 +941,18 @@ class CitaViewSet(viewsets.ModelViewSet):
         else:
             fecha = date_class.today()
 
-        # Obtener veterinario del usuario autenticado
-        user = request.user
-
-        try:
-            # Intentar obtener el veterinario asociado al usuario
-            veterinario = user.trabajador.veterinario
-        except Exception as e:
+        # Obtener veterinario del usuario autenticado (resuelto en la autenticación)
+        veterinario = obtener_contexto(request).veterinario
+        if veterinario is None:
             return Response({
                 'error': 'Usuario no tiene un veterinario asociado',
                 'error_code': 'NO_VETERINARIO_ASOCIADO',
-                'detalle': str(e)
+                'detalle': 'El usuario no tiene trabajador o veterinario registrado'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Obtener citas del veterinario para esa fecha
-        citas = Cita.objects.filter(
-            veterinario=veterinario,
-            fecha=fecha
-        ).exclude(
-            estado='cancelada'
-        ).select_related(
-            'mascota', 'servicio', 'responsable'
-        ).order_by('hora')
-
-        # Construir respuesta con información detallada
-        citas_data = []
-        for cita in citas:
-            citas_data.append({
-                'id': str(cita.id),
-                'hora': str(cita.hora),
-                'estado': cita.estado,
-                'mascota': {
-                    'id': str(cita.mascota.id),
-                    'nombre': cita.mascota.nombreMascota,
-                    'especie': cita.mascota.especie,
-                    'raza': cita.mascota.raza
-                },
-                'responsable': {
-                    'id': str(cita.responsable.id),
-                    'nombre': f"{cita.responsable.nombres} {cita.responsable.apellidos}",
-                    'telefono': cita.responsable.telefono
-                },
-                'servicio': {
-                    'id': str(cita.servicio.id),
-                    'nombre': cita.servicio.nombre,
-                    'categoria': cita.servicio.categoria,
-                    'duracion_minutos': cita.servicio.duracion_total_minutos(),
-                    'precio': str(cita.servicio.precio)
-                },
-                'notas': cita.notas or ''
-            })
+        # Citas del veterinario para esa fecha (proyección values, sin instanciar modelos)
+        from .lecturas import calendario_veterinario
+        citas_data = calendario_veterinario(veterinario.id, fecha)
 
         return Response({
             'fecha': str(fecha),
@@ -1007,63 +997,9 @@ class CitaViewSet(viewsets.ModelViewSet):
         # Filtro opcional por veterinario
         veterinario_id = request.query_params.get('veterinario')
 
-        # Base query
-        citas_query = Cita.objects.filter(
-            fecha=fecha
-        ).exclude(
-            estado='cancelada'
-        ).select_related(
-            'veterinario', 'veterinario__trabajador', 'mascota', 'servicio', 'responsable'
-        ).order_by('veterinario', 'hora')
-
-        # Aplicar filtro de veterinario si existe
-        if veterinario_id:
-            citas_query = citas_query.filter(veterinario_id=veterinario_id)
-
-        citas = citas_query
-
-        # Agrupar por veterinario
-        veterinarios_dict = {}
-        for cita in citas:
-            vet_id = str(cita.veterinario.id)
-
-            if vet_id not in veterinarios_dict:
-                veterinarios_dict[vet_id] = {
-                    'veterinario': {
-                        'id': vet_id,
-                        'nombre': f"{cita.veterinario.trabajador.nombres} {cita.veterinario.trabajador.apellidos}",
-                        'especialidad': cita.veterinario.especialidad
-                    },
-                    'citas': []
-                }
-
-            veterinarios_dict[vet_id]['citas'].append({
-                'id': str(cita.id),
-                'hora': str(cita.hora),
-                'estado': cita.estado,
-                'mascota': {
-                    'id': str(cita.mascota.id),
-                    'nombre': cita.mascota.nombreMascota,
-                    'especie': cita.mascota.especie,
-                    'raza': cita.mascota.raza
-                },
-                'responsable': {
-                    'id': str(cita.responsable.id),
-                    'nombre': f"{cita.responsable.nombres} {cita.responsable.apellidos}",
-                    'telefono': cita.responsable.telefono
-                },
-                'servicio': {
-                    'id': str(cita.servicio.id),
-                    'nombre': cita.servicio.nombre,
-                    'categoria': cita.servicio.categoria,
-                    'duracion_minutos': cita.servicio.duracion_total_minutos(),
-                    'precio': str(cita.servicio.precio)
-                },
-                'notas': cita.notas or ''
-            })
-
-        # Convertir dict a lista
-        veterinarios_lista = list(veterinarios_dict.values())
+        # Citas agrupadas por veterinario (proyección values, sin instanciar modelos)
+        from .lecturas import calendario_recepcion
+        veterinarios_lista = calendario_recepcion(fecha, veterinario_id)
 
         # Calcular totales
         total_citas = sum(len(v['citas']) for v in veterinarios_lista)
@@ -1207,7 +1143,15 @@ class CitaViewSet(viewsets.ModelViewSet):
 
         serializer = ServicioAdicionalSerializer(data=data)
         if serializer.is_valid():
-            servicio_adicional = serializer.save()
+            # Si incluye producto, el signal descuenta el stock de forma atómica
+            try:
+                with transaction.atomic():
+                    servicio_adicional = serializer.save()
+            except StockInsuficiente as e:
+                return Response({
+                    'error': str(e),
+                    'error_code': 'SIN_STOCK'
+                }, status=status.HTTP_400_BAD_REQUEST)
 
             # Actualizar totales del detalle si existe
             if hasattr(cita, 'detalle'):
@@ -1251,6 +1195,11 @@ class CitaViewSet(viewsets.ModelViewSet):
 class LoginView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
     permission_classes = [AllowAny]
+
+
+class RefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
+    permission_classes = [AllowAny]
     
 class RegistrarTrabajadorView(APIView):
     permission_classes = [AllowAny]
@@ -1268,6 +1217,18 @@ class RegistrarTrabajadorView(APIView):
 
 # 🐾 VIEWSETS SISTEMA DE VACUNACIÓN
 
+def _es_cachorro(mascota):
+    """Menos de un año de edad (sin fecha de nacimiento se asume adulto)"""
+    return bool(mascota.fechaNacimiento) and (date.today() - mascota.fechaNacimiento).days <= 365
+
+
+def _dosis_previas(mascota_id, vacuna):
+    """Dosis ya aplicadas de la vacuna: deciden si rige la variante cachorro"""
+    return HistorialVacunacion.objects.filter(
+        mascota_id=mascota_id, vacuna=vacuna, estado__in=['aplicada', 'vigente', 'completado']
+    ).count()
+
+
 class VacunaViewSet(viewsets.ModelViewSet):
     """
     ViewSet para gestión del catálogo de vacunas
@@ -1298,25 +1259,21 @@ class VacunaViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         """Listado con estadísticas como especifica el frontend"""
         queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        filas, paginacion = paginar(self, queryset)
+        serializer = self.get_serializer(filas, many=True)
         
-        # Estadísticas para el frontend
-        total = Vacuna.objects.count()
-        activas = Vacuna.objects.filter(estado='Activo').count()
-        inactivas = Vacuna.objects.filter(estado='Inactivo').count()
-        obligatorias = Vacuna.objects.filter(es_obligatoria=True).count()
-        
-        return Response({
+        # Estadísticas para el frontend (una consulta agregada, cacheada)
+        from .estadisticas import estadisticas_vacunas
+
+        respuesta = {
             'data': serializer.data,
-            'estadisticas': {
-                'total': total,
-                'activas': activas, 
-                'inactivas': inactivas,
-                'obligatorias': obligatorias
-            },
+            'estadisticas': estadisticas_vacunas(),
             'message': 'Vacunas obtenidas exitosamente',
             'status': 'success'
-        })
+        }
+        if paginacion:
+            respuesta['paginacion'] = paginacion
+        return Response(respuesta)
     
     def create(self, request, *args, **kwargs):
         """Crear con formato de respuesta específico"""
@@ -1340,8 +1297,7 @@ class VacunaViewSet(viewsets.ModelViewSet):
     def activas(self, request):
         """Obtener solo vacunas activas"""
         vacunas_activas = Vacuna.objects.filter(estado__iexact='activo')
-        serializer = self.get_serializer(vacunas_activas, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, vacunas_activas)
     
     @action(detail=False, methods=['get'], url_path='obligatorias')
     def obligatorias(self, request):
@@ -1350,9 +1306,44 @@ class VacunaViewSet(viewsets.ModelViewSet):
             es_obligatoria=True,
             estado__iexact='activo'
         )
-        serializer = self.get_serializer(vacunas_obligatorias, many=True)
-        return Response(serializer.data)
-    
+        return responder_lista(self, vacunas_obligatorias)
+
+    @action(detail=False, methods=['get'], url_path='pronostico')
+    def pronostico(self, request):
+        """
+        📈 PRONÓSTICO DE DEMANDA: dosis esperadas por semana y vacuna frente al stock
+        URL: GET /api/vacunas/pronostico/?semanas=12
+        """
+        from .pronostico_vacunas import SEMANAS_DEFECTO, SEMANAS_MAXIMO, pronosticar
+
+        try:
+            semanas = int(request.query_params.get('semanas', SEMANAS_DEFECTO))
+        except (TypeError, ValueError):
+            semanas = 0
+        if not 1 <= semanas <= SEMANAS_MAXIMO:
+            return Response({
+                'success': False,
+                'message': f'El parámetro semanas debe ser un entero entre 1 y {SEMANAS_MAXIMO}',
+                'error_code': 'VALIDATION_ERROR',
+                'status': 'error'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        inicio, fin, vacunas = pronosticar(semanas)
+        return Response({
+            'data': vacunas,
+            'parametros': {
+                'semanas': semanas,
+                'desde': inicio,
+                'hasta': fin - timedelta(days=1)
+            },
+            'resumen': {
+                'total_dosis': sum(v['total_dosis'] for v in vacunas),
+                'vacunas_con_deficit': sum(1 for v in vacunas if not v['stock_suficiente'])
+            },
+            'message': 'Pronóstico de demanda generado exitosamente',
+            'status': 'success'
+        })
+
     @action(detail=True, methods=['patch'])
     def desactivar(self, request, pk=None):
         """Desactivar vacuna"""
@@ -1405,14 +1396,18 @@ class VacunaViewSet(viewsets.ModelViewSet):
             estado__iexact='activo'
         ).order_by('nombre')
         
-        serializer = self.get_serializer(vacunas, many=True)
-        return Response({
+        filas, paginacion = paginar(self, vacunas)
+        serializer = self.get_serializer(filas, many=True)
+        respuesta = {
             'data': serializer.data,
             'especie': especie,
             'total': vacunas.count(),
             'message': f'Vacunas para {especie} obtenidas exitosamente',
             'status': 'success'
-        })
+        }
+        if paginacion:
+            respuesta['paginacion'] = paginacion
+        return Response(respuesta)
 
     @action(detail=False, methods=['get'], url_path='productos-vacunas')
     def productos_vacunas(self, request):
@@ -1438,10 +1433,8 @@ class VacunaViewSet(viewsets.ModelViewSet):
                 Q(descripcion__icontains=search)
             )
         
-        # Sin límite - mostrar todos los productos disponibles
-        
-        serializer = ProductoSerializer(productos, many=True)
-        return Response(serializer.data)
+        # Sin límite - mostrar todos los productos disponibles (o por páginas si se solicita)
+        return responder_lista(self, productos, ProductoSerializer)
     
     @action(detail=True, methods=['post'], url_path='cambiar-estado')
     def cambiar_estado_vacuna(self, request, pk=None):
@@ -1528,13 +1521,6 @@ class VacunaViewSet(viewsets.ModelViewSet):
                     'status': 'error'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Determinar cuántas dosis se aplicaron
-            dosis_aplicadas = data.get('dosis_aplicadas', vacuna.dosis_total)
-            
-            # Validar que no exceda el protocolo
-            if dosis_aplicadas > vacuna.dosis_total:
-                dosis_aplicadas = vacuna.dosis_total
-
             # Validar existencia y compatibilidad de mascota
             try:
                 mascota_obj = Mascota.objects.get(id=data['mascota_id'])
@@ -1592,6 +1578,16 @@ class VacunaViewSet(viewsets.ModelViewSet):
                     'status': 'error'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
+            # Esquema efectivo para la mascota (cachorro sin dosis previas, complejo o estándar)
+            protocolo = obtener_protocolo(vacuna)
+            variante = protocolo.variante(
+                _es_cachorro(mascota_obj),
+                _dosis_previas(mascota_obj.id, vacuna)
+            )
+
+            # Determinar cuántas dosis se aplicaron (sin exceder el protocolo)
+            dosis_aplicadas = min(data.get('dosis_aplicadas', variante.dosis_total), variante.dosis_total)
+
             # Crear un solo registro que represente el protocolo completo
             from datetime import timedelta
             from dateutil.relativedelta import relativedelta
@@ -1599,21 +1595,30 @@ class VacunaViewSet(viewsets.ModelViewSet):
             observaciones_protocolo = data.get('observaciones', '') + f' (Protocolo completo: {dosis_aplicadas} dosis aplicadas)'
             
             # Calcular próxima fecha (refuerzo anual)
-            proxima_fecha = fecha_aplicacion + relativedelta(months=vacuna.frecuencia_meses)
+            proxima_fecha = protocolo.refuerzo(fecha_aplicacion)
             
-            # Crear registro único
-            historial_record = HistorialVacunacion.objects.create(
-                mascota_id=data['mascota_id'],
-                vacuna=vacuna,
-                fecha_aplicacion=fecha_aplicacion,
-                proxima_fecha=proxima_fecha,
-                veterinario=veterinario,
-                lote=data.get('lote', ''),
-                laboratorio=data.get('laboratorio', ''),
-                dosis_numero=dosis_aplicadas,  # Número total de dosis aplicadas
-                observaciones=observaciones_protocolo,
-                estado='aplicada'  # 🆕 Siempre aplicada al crear, el serializer calculará dinámicamente
-            )
+            # Crear registro único (el signal descuenta el stock del producto vinculado)
+            try:
+                with transaction.atomic():
+                    historial_record = HistorialVacunacion.objects.create(
+                        mascota_id=data['mascota_id'],
+                        vacuna=vacuna,
+                        fecha_aplicacion=fecha_aplicacion,
+                        proxima_fecha=proxima_fecha,
+                        veterinario=veterinario,
+                        lote=data.get('lote', ''),
+                        laboratorio=data.get('laboratorio', ''),
+                        dosis_numero=dosis_aplicadas,  # Número total de dosis aplicadas
+                        observaciones=observaciones_protocolo,
+                        estado='aplicada'  # 🆕 Siempre aplicada al crear, el serializer calculará dinámicamente
+                    )
+            except StockInsuficiente:
+                return Response({
+                    'success': False,
+                    'message': f'Sin stock disponible para "{vacuna.nombre}". Registra un nuevo lote en Inventario para continuar.',
+                    'error_code': 'SIN_STOCK',
+                    'status': 'error'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
             return Response({
                 'success': True,
@@ -1626,8 +1631,8 @@ class VacunaViewSet(viewsets.ModelViewSet):
                     'mensaje_usuario': f'Protocolo completo aplicado ({dosis_aplicadas} dosis). Próximo refuerzo en {vacuna.frecuencia_meses} meses',
                     'protocolo_info': {
                         'dosis_aplicadas': dosis_aplicadas,
-                        'dosis_total': vacuna.dosis_total,
-                        'dosis_total_protocolo': vacuna.dosis_total,
+                        'dosis_total': variante.dosis_total,
+                        'dosis_total_protocolo': variante.dosis_total,
                         'es_protocolo_completo': True,
                         'proxima_accion': 'refuerzo_anual'
                     }
@@ -1757,6 +1762,68 @@ class VacunaViewSet(viewsets.ModelViewSet):
                 'status': 'error'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=True, methods=['post'], url_path='aplicar-lote')
+    def aplicar_lote(self, request, pk=None):
+        """
+        💉 JORNADA DE VACUNACIÓN: aplicar la vacuna a muchas mascotas en una sola llamada
+        URL: POST /api/vacunas/{id}/aplicar-lote/
+        Body: {
+            "veterinario_id": "uuid",             // Opcional: valor común para todos los elementos
+            "lote": "ABC123",                     // Opcional: valor común para todos los elementos
+            "aplicaciones": [
+                {"mascota_id": "uuid", "fecha": "2025-01-15", "lote": "ABC123", "veterinario_id": "uuid"},
+                ...
+            ]
+        }
+        Devuelve un resultado por elemento; los inválidos no impiden aplicar los demás.
+        """
+        from .vacunacion_lote import MAX_LOTE, aplicar_lote
+
+        vacuna = self.get_object()
+        if vacuna.estado != 'Activo':
+            return Response({
+                'success': False,
+                'message': f'La vacuna "{vacuna.nombre}" está inactiva y no puede aplicarse.',
+                'error_code': 'VACCINE_INACTIVE',
+                'status': 'error'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        data = request.data
+        items = data if isinstance(data, list) else data.get('aplicaciones')
+        if not isinstance(items, list) or not items:
+            return Response({
+                'success': False,
+                'message': 'Se requiere una lista "aplicaciones" con al menos un elemento.',
+                'error_code': 'MISSING_REQUIRED_FIELD',
+                'status': 'error'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > MAX_LOTE:
+            return Response({
+                'success': False,
+                'message': f'Máximo {MAX_LOTE} aplicaciones por lote.',
+                'error_code': 'BATCH_TOO_LARGE',
+                'status': 'error'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        defaults = {}
+        if isinstance(data, dict):
+            defaults = {campo: data[campo] for campo in ('veterinario_id', 'lote', 'laboratorio', 'fecha_aplicacion') if data.get(campo)}
+
+        with transaction.atomic():
+            resultados, aplicadas = aplicar_lote(vacuna, items, defaults)
+
+        errores = len(resultados) - aplicadas
+        return Response({
+            'success': aplicadas > 0,
+            'message': f'{aplicadas} aplicaciones de {vacuna.nombre} registradas, {errores} con errores',
+            'data': {
+                'aplicadas': aplicadas,
+                'errores': errores,
+                'resultados': resultados
+            },
+            'status': 'success' if aplicadas > 0 else 'error'
+        }, status=status.HTTP_201_CREATED if aplicadas > 0 else status.HTTP_400_BAD_REQUEST)
+
     def _aplicar_protocolo_completo_integrado(self, vacuna, data):
         """Aplicar protocolo completo dentro del endpoint principal"""
         try:
@@ -1871,12 +1938,15 @@ class VacunaViewSet(viewsets.ModelViewSet):
                     'status': 'warning'
                 }, status=status.HTTP_409_CONFLICT)
 
-            # Determinar cuántas dosis se aplicaron
-            dosis_aplicadas = data.get('dosis_aplicadas', vacuna.dosis_total)
-            
-            # Validar que no exceda el protocolo
-            if dosis_aplicadas > vacuna.dosis_total:
-                dosis_aplicadas = vacuna.dosis_total
+            # Esquema efectivo para la mascota (cachorro sin dosis previas, complejo o estándar)
+            protocolo = obtener_protocolo(vacuna)
+            variante = protocolo.variante(
+                _es_cachorro(mascota_proto),
+                _dosis_previas(mascota_proto.id, vacuna)
+            )
+
+            # Determinar cuántas dosis se aplicaron (sin exceder el protocolo)
+            dosis_aplicadas = min(data.get('dosis_aplicadas', variante.dosis_total), variante.dosis_total)
             
             # Obtener veterinario
             try:
@@ -1901,21 +1971,30 @@ class VacunaViewSet(viewsets.ModelViewSet):
             observaciones_protocolo = f'{observaciones_base} (Protocolo completo: {dosis_aplicadas} dosis aplicadas)'.strip()
             
             # Calcular próxima fecha (refuerzo anual)
-            proxima_fecha = fecha_aplicacion + relativedelta(months=vacuna.frecuencia_meses)
+            proxima_fecha = protocolo.refuerzo(fecha_aplicacion)
             
-            # Crear registro único que representa el protocolo completo
-            historial_record = HistorialVacunacion.objects.create(
-                mascota_id=data['mascota_id'],
-                vacuna=vacuna,
-                fecha_aplicacion=fecha_aplicacion,
-                proxima_fecha=proxima_fecha,
-                veterinario=veterinario,
-                lote=data.get('lote', ''),
-                laboratorio=data.get('laboratorio', ''),
-                dosis_numero=vacuna.dosis_total,  # CORREGIDO: Usar dosis_total de la vacuna
-                observaciones=observaciones_protocolo,
-                estado='aplicada'  # 🆕 Siempre aplicada al crear, el serializer calculará dinámicamente
-            )
+            # Crear registro único que representa el protocolo completo (el signal descuenta el stock)
+            try:
+                with transaction.atomic():
+                    historial_record = HistorialVacunacion.objects.create(
+                        mascota_id=data['mascota_id'],
+                        vacuna=vacuna,
+                        fecha_aplicacion=fecha_aplicacion,
+                        proxima_fecha=proxima_fecha,
+                        veterinario=veterinario,
+                        lote=data.get('lote', ''),
+                        laboratorio=data.get('laboratorio', ''),
+                        dosis_numero=vacuna.dosis_total,  # CORREGIDO: Usar dosis_total de la vacuna
+                        observaciones=observaciones_protocolo,
+                        estado='aplicada'  # 🆕 Siempre aplicada al crear, el serializer calculará dinámicamente
+                    )
+            except StockInsuficiente:
+                return Response({
+                    'success': False,
+                    'message': f'Sin stock disponible para "{vacuna.nombre}". Registra un nuevo lote en Inventario para continuar.',
+                    'error_code': 'SIN_STOCK',
+                    'status': 'error'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
             return Response({
                 'success': True,
@@ -1928,8 +2007,8 @@ class VacunaViewSet(viewsets.ModelViewSet):
                     'mensaje_usuario': f'Protocolo completo aplicado ({dosis_aplicadas} dosis). Próximo refuerzo en {vacuna.frecuencia_meses} meses',
                     'protocolo_info': {
                         'dosis_aplicadas': dosis_aplicadas,
-                        'dosis_total': vacuna.dosis_total,
-                        'dosis_total_protocolo': vacuna.dosis_total,
+                        'dosis_total': variante.dosis_total,
+                        'dosis_total_protocolo': variante.dosis_total,
                         'es_protocolo_completo': True,
                         'proxima_accion': 'refuerzo_anual'
                     }
@@ -2230,61 +2309,13 @@ class VacunaViewSet(viewsets.ModelViewSet):
                 es_cachorro = False
             
             # 3. DETERMINAR PROTOCOLO EFECTIVO PRIMERO (ORDEN DE PRECEDENCIA ESTRICTO)
-            protocolo_info = {
-                'tipo': '',
-                'dosis_total': vacuna.dosis_total,
-                'intervalos': []
-            }
+            # complejo > cachorro (sin dosis previas) > estándar, compilado y cacheado por vacuna
+            protocolo = obtener_protocolo(vacuna)
+            variante = protocolo.variante(es_cachorro, historial_count)
             
             # Variables para verificación de atraso inteligente
             reiniciar_protocolo = False
             
-            # PRECEDENCIA 1: Protocolo complejo JSON (más específico)
-            if vacuna.protocolo_dosis and len(vacuna.protocolo_dosis) > 0:
-                protocolo_info['tipo'] = 'PROTOCOLO_COMPLEJO'
-                protocolo_info['dosis_total'] = len(vacuna.protocolo_dosis)
-                
-                # Validar y extraer intervalos
-                for i, dosis_info in enumerate(vacuna.protocolo_dosis):
-                    if isinstance(dosis_info, dict) and 'semanas_siguiente' in dosis_info:
-                        semanas = dosis_info.get('semanas_siguiente', vacuna.intervalo_dosis_semanas)
-                        if semanas > 0:
-                            protocolo_info['intervalos'].append(semanas)
-                        else:
-                            protocolo_info['intervalos'].append(vacuna.intervalo_dosis_semanas)
-                    else:
-                        protocolo_info['intervalos'].append(vacuna.intervalo_dosis_semanas)
-            
-            # PRECEDENCIA 2: Protocolo cachorro (si aplica)
-            elif (vacuna.protocolo_cachorro and 
-                  isinstance(vacuna.protocolo_cachorro, dict) and 
-                  len(vacuna.protocolo_cachorro) > 0 and 
-                  es_cachorro and 
-                  historial_count == 0):
-                
-                protocolo_info['tipo'] = 'PROTOCOLO_CACHORRO'
-                p_cachorro = vacuna.protocolo_cachorro
-                
-                dosis_total_cachorro = p_cachorro.get('dosis_total', vacuna.dosis_total)
-                if dosis_total_cachorro > 0:
-                    protocolo_info['dosis_total'] = dosis_total_cachorro
-                
-                intervalos_cachorro = p_cachorro.get('intervalos', [])
-                if intervalos_cachorro and isinstance(intervalos_cachorro, list):
-                    for intervalo in intervalos_cachorro:
-                        if intervalo > 0:
-                            protocolo_info['intervalos'].append(intervalo)
-                        else:
-                            protocolo_info['intervalos'].append(vacuna.intervalo_dosis_semanas)
-                else:
-                    protocolo_info['intervalos'] = [vacuna.intervalo_dosis_semanas] * (dosis_total_cachorro - 1)
-            
-            # PRECEDENCIA 3: Protocolo estándar (fallback siempre)
-            else:
-                protocolo_info['tipo'] = 'PROTOCOLO_ESTANDAR'
-                protocolo_info['dosis_total'] = vacuna.dosis_total
-                protocolo_info['intervalos'] = [vacuna.intervalo_dosis_semanas] * (vacuna.dosis_total - 1)
-            
             # 4. 🔥 VERIFICAR DOSIS ATRASADAS CON PROTOCOLO INTELIGENTE
             ultima_aplicacion = historial_previo_query.last()
 
@@ -2292,16 +2323,8 @@ class VacunaViewSet(viewsets.ModelViewSet):
                 # 🚨 FIX CRÍTICO: Comparar con próxima_fecha esperada, NO con fecha_aplicacion
                 dias_desde_proxima_esperada = (fecha_aplicacion - ultima_aplicacion.proxima_fecha).days
 
-                # Calcular máximo atraso permitido según el protocolo actual
-                dosis_previa = historial_count  # La dosis anterior (1-based)
-
-                if protocolo_info['intervalos'] and dosis_previa <= len(protocolo_info['intervalos']):
-                    # Usar intervalo específico del protocolo
-                    intervalo_esperado_semanas = protocolo_info['intervalos'][dosis_previa - 1]
-                    max_atraso_dinamico = (intervalo_esperado_semanas * 7) + 21  # Intervalo + 3 semanas tolerancia
-                else:
-                    # Fallback: usar configuración base
-                    max_atraso_dinamico = vacuna.max_dias_atraso
+                # Máximo atraso permitido según el intervalo de la dosis anterior (1-based)
+                max_atraso_dinamico = protocolo.max_atraso(historial_count, variante)
 
                 # 🔥 LÓGICA CORREGIDA: Usar días desde próxima fecha esperada
                 if dias_desde_proxima_esperada > max_atraso_dinamico:
@@ -2315,48 +2338,10 @@ class VacunaViewSet(viewsets.ModelViewSet):
                     dosis_real_en_protocolo = 1  # Reiniciar como dosis 1
             
             # 5. CALCULAR PRÓXIMA FECHA (ALGORITMO UNIVERSAL)
-            dosis_total_efectiva = protocolo_info['dosis_total']
-            
-            try:
-                if dosis_real_en_protocolo == 1 and dosis_total_efectiva == 1:
-                    # ESCENARIO 1: VACUNA DOSIS ÚNICA
-                    proxima_fecha = fecha_aplicacion + relativedelta(months=vacuna.frecuencia_meses)
-                    es_dosis_final = True
-                    intervalo_usado = f"{vacuna.frecuencia_meses} meses"
-                    
-                elif dosis_real_en_protocolo < dosis_total_efectiva:
-                    # ESCENARIO 2: PROTOCOLO INCOMPLETO
-                    indice_intervalo = dosis_real_en_protocolo - 1  # 0-based
-                    
-                    if protocolo_info['intervalos'] and indice_intervalo < len(protocolo_info['intervalos']):
-                        intervalo_semanas = protocolo_info['intervalos'][indice_intervalo]
-                    else:
-                        intervalo_semanas = vacuna.intervalo_dosis_semanas
-                    
-                    # Validación final del intervalo
-                    if intervalo_semanas <= 0:
-                        intervalo_semanas = vacuna.intervalo_dosis_semanas
-                    
-                    proxima_fecha = fecha_aplicacion + timedelta(weeks=intervalo_semanas)
-                    es_dosis_final = False
-                    intervalo_usado = f"{intervalo_semanas} semanas"
-                    
-                else:
-                    # ESCENARIO 3: PROTOCOLO COMPLETO - REFUERZO ANUAL
-                    proxima_fecha = fecha_aplicacion + relativedelta(months=vacuna.frecuencia_meses)
-                    es_dosis_final = True
-                    intervalo_usado = f"{vacuna.frecuencia_meses} meses"
-                
-                # Validar fecha calculada
-                if proxima_fecha <= fecha_aplicacion:
-                    raise ValueError(f"Fecha calculada inválida: {proxima_fecha}")
-                    
-            except Exception as calc_error:
-                # FALLBACK DE EMERGENCIA: Refuerzo anual
-                proxima_fecha = fecha_aplicacion + relativedelta(months=vacuna.frecuencia_meses)
-                es_dosis_final = True
-                intervalo_usado = f"{vacuna.frecuencia_meses} meses (fallback)"
-                print(f"WARNING: Usando fallback por error: {str(calc_error)}")
+            dosis_total_efectiva = variante.dosis_total
+            proxima_fecha, es_dosis_final, intervalo_usado = protocolo.proxima_fecha(
+                fecha_aplicacion, dosis_real_en_protocolo, variante
+            )
             
             # 🔒 VERIFICACIÓN FINAL ANTI-RACE CONDITION: Verificar duplicados otra vez
             # Esta verificación ocurre dentro de la transacción atómica
@@ -2396,20 +2381,26 @@ class VacunaViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_400_BAD_REQUEST)
 
             try:
-                historial = HistorialVacunacion.objects.create(
-                    mascota_id=data['mascota_id'],
-                    vacuna=vacuna,
-                    fecha_aplicacion=fecha_aplicacion,
-                    proxima_fecha=proxima_fecha,
-                    veterinario_id=data['veterinario_id'],
-                    dosis_numero=dosis_real_en_protocolo,  # Usar dosis calculada
-                    lote=data.get('lote', ''),
-                    observaciones=data.get('observaciones', ''),
-                    estado='aplicada'  # 🆕 Siempre aplicada al crear, el serializer calculará dinámicamente
-                )
-                # Descontar 1 unidad del stock del producto vinculado
-                producto.stock -= 1
-                producto.save()
+                # El signal descuenta 1 unidad del producto vinculado con un UPDATE condicional
+                with transaction.atomic():
+                    historial = HistorialVacunacion.objects.create(
+                        mascota_id=data['mascota_id'],
+                        vacuna=vacuna,
+                        fecha_aplicacion=fecha_aplicacion,
+                        proxima_fecha=proxima_fecha,
+                        veterinario_id=data['veterinario_id'],
+                        dosis_numero=dosis_real_en_protocolo,  # Usar dosis calculada
+                        lote=data.get('lote', ''),
+                        observaciones=data.get('observaciones', ''),
+                        estado='aplicada'  # 🆕 Siempre aplicada al crear, el serializer calculará dinámicamente
+                    )
+            except StockInsuficiente:
+                return Response({
+                    'success': False,
+                    'message': f'Sin stock disponible para "{vacuna.nombre}". Registra un nuevo lote en Inventario para continuar.',
+                    'error_code': 'SIN_STOCK',
+                    'status': 'error'
+                }, status=status.HTTP_400_BAD_REQUEST)
             except IntegrityError as e:
                 return Response({
                     'success': False,
@@ -2442,12 +2433,12 @@ class VacunaViewSet(viewsets.ModelViewSet):
                     'mensaje_usuario': mensaje_usuario,
                     'protocolo_info': {
                         'dosis_actual': dosis_real_en_protocolo,
-                        'dosis_total': vacuna.dosis_total,
+                        'dosis_total': dosis_total_efectiva,
                         'dosis_total_original': vacuna.dosis_total,
                         'dosis_total_efectiva': dosis_total_efectiva,
                         'es_dosis_final': es_dosis_final,
                         'intervalo_usado': intervalo_usado,
-                        'protocolo_usado': protocolo_info['tipo'],
+                        'protocolo_usado': variante.tipo,
                         'reinicio_por_atraso': reiniciar_protocolo,
                         'es_cachorro': es_cachorro,
                         'edad_dias': edad_actual_dias
@@ -2504,25 +2495,16 @@ class HistorialVacunacionViewSet(viewsets.ModelViewSet):
         """
         🧠 ALGORITMO INTELIGENTE: Calcula próxima fecha según protocolo de vacunación
         
-        LÓGICA:
-        - Si dosis_numero < dosis_total: Próxima dosis del mismo ciclo (+intervalo_dosis_semanas)
+        LÓGICA (protocolo compilado, ver api/protocolos.py):
+        - Si dosis_numero < dosis_total: Próxima dosis del mismo ciclo (intervalo del protocolo)
         - Si dosis_numero >= dosis_total: Último refuerzo anual (+frecuencia_meses)
         
         EJEMPLOS:
         - Rabia (1 dosis, refuerzo anual): Dosis 1 → +12 meses
         - Triple (3 dosis + refuerzo): Dosis 1,2 → +4 semanas | Dosis 3 → +12 meses
         """
-        from datetime import timedelta
-        from dateutil.relativedelta import relativedelta
-        
-        if dosis_numero < vacuna.dosis_total:
-            # 📅 Próxima dosis del mismo ciclo inicial
-            proxima_fecha = fecha_aplicacion + timedelta(weeks=vacuna.intervalo_dosis_semanas)
-            return proxima_fecha
-        else:
-            # 📅 Último refuerzo: próximo ciclo anual
-            proxima_fecha = fecha_aplicacion + relativedelta(months=vacuna.frecuencia_meses)
-            return proxima_fecha
+        proxima_fecha, _, _ = obtener_protocolo(vacuna).proxima_fecha(fecha_aplicacion, dosis_numero)
+        return proxima_fecha
 
     def calcular_estado_inicial(self, proxima_fecha):
         """
@@ -2583,7 +2565,6 @@ class HistorialVacunacionViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         import uuid
-        from datetime import date, timedelta
         qs = HistorialVacunacion.objects.all()
         params = self.request.query_params
 
@@ -2603,17 +2584,9 @@ class HistorialVacunacionViewSet(viewsets.ModelViewSet):
             uid = parse_uuid(params['veterinario_id'])
             qs = qs.filter(veterinario__id=uid) if uid else qs.none()
         estado_param = params.get('estado')
-        if estado_param:
-            hoy = date.today()
-            en_30_dias = hoy + timedelta(days=30)
-            if estado_param == 'vencida':
-                qs = qs.filter(proxima_fecha__lt=hoy, vacuna__dosis_total=1)
-            elif estado_param == 'vencida_reinicio':
-                qs = qs.filter(proxima_fecha__lt=hoy - timedelta(days=60), vacuna__dosis_total__gt=1)
-            elif estado_param == 'proxima':
-                qs = qs.filter(proxima_fecha__gte=hoy, proxima_fecha__lte=en_30_dias)
-            elif estado_param == 'vigente':
-                qs = qs.filter(proxima_fecha__gt=en_30_dias)
+        if estado_param in dict(EstadoVacunaMascota.ESTADO_CHOICES):
+            # Registro vigente de cada (mascota, vacuna) con ese estado en la proyección
+            qs = qs.filter(estado_proyectado__estado=estado_param)
         return qs
 
     @action(detail=False, methods=['get'], url_path='por-mascota/(?P<mascota_id>[^/.]+)')
@@ -2622,30 +2595,23 @@ class HistorialVacunacionViewSet(viewsets.ModelViewSet):
         historial = HistorialVacunacion.objects.filter(
             mascota__id=mascota_id
         ).order_by('-fecha_aplicacion')
-        serializer = self.get_serializer(historial, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, historial)
     
     @action(detail=False, methods=['get'], url_path='vencidas')
     def vencidas(self, request):
-        """Obtener vacunas vencidas"""
-        from datetime import date
+        """Obtener vacunas vencidas (registro vigente de cada mascota y vacuna)"""
         historial_vencido = HistorialVacunacion.objects.filter(
-            proxima_fecha__lt=date.today()
-        ).order_by('proxima_fecha')
-        serializer = self.get_serializer(historial_vencido, many=True)
-        return Response(serializer.data)
+            estado_proyectado__estado__in=['vencida', 'vencida_reinicio']
+        ).select_related('mascota', 'vacuna', 'veterinario__trabajador').order_by('proxima_fecha')
+        return responder_lista(self, historial_vencido)
     
     @action(detail=False, methods=['get'], url_path='proximas')
     def proximas(self, request):
         """Obtener vacunas próximas a vencer (próximos 30 días)"""
-        from datetime import date, timedelta
-        fecha_limite = date.today() + timedelta(days=30)
         historial_proximo = HistorialVacunacion.objects.filter(
-            proxima_fecha__gte=date.today(),
-            proxima_fecha__lte=fecha_limite
-        ).order_by('proxima_fecha')
-        serializer = self.get_serializer(historial_proximo, many=True)
-        return Response(serializer.data)
+            estado_proyectado__estado='proxima'
+        ).select_related('mascota', 'vacuna', 'veterinario__trabajador').order_by('proxima_fecha')
+        return responder_lista(self, historial_proximo)
     
     @action(detail=False, methods=['get'], url_path='alertas')
     def alertas(self, request):
@@ -2654,14 +2620,13 @@ class HistorialVacunacionViewSet(viewsets.ModelViewSet):
         Devuelve vacunas vencidas y próximas a vencer con información completa
         """
         from datetime import date, timedelta
-        from django.db.models import Q
         
         # Vacunas vencidas o próximas a vencer (próximos 7 días)
         fecha_limite = date.today() + timedelta(days=7)
         
-        alertas_query = HistorialVacunacion.objects.filter(
-            Q(proxima_fecha__lt=date.today()) |  # Vencidas
-            Q(proxima_fecha__lte=fecha_limite)   # Próximas a vencer
+        alertas_query = EstadoVacunaMascota.objects.filter(
+            estado__in=['vencida', 'vencida_reinicio', 'proxima'],
+            proxima_fecha__lte=fecha_limite
         ).select_related('mascota', 'vacuna', 'mascota__responsable').order_by('proxima_fecha')
         
         alertas_data = []
@@ -2682,27 +2647,60 @@ class HistorialVacunacionViewSet(viewsets.ModelViewSet):
         
         serializer = VacunasAlertaSerializer(alertas_data, many=True)
         return Response(serializer.data)
-    
-    @action(detail=False, methods=['get'], url_path='estadisticas')
-    def estadisticas(self, request):
-        """Estadísticas generales de vacunación"""
-        from datetime import date, timedelta
-        
-        total_vacunas = HistorialVacunacion.objects.count()
-        vencidas = HistorialVacunacion.objects.filter(
-            proxima_fecha__lt=date.today()
-        ).count()
-        proximas_30_dias = HistorialVacunacion.objects.filter(
-            proxima_fecha__gte=date.today(),
-            proxima_fecha__lte=date.today() + timedelta(days=30)
-        ).count()
-        
+
+    @action(detail=False, methods=['get'], url_path='alertas-paginadas')
+    def alertas_paginadas(self, request):
+        """
+        🚨 ALERTAS PAGINADAS: vencidas y próximas ordenadas por (proxima_fecha, id)
+        URL: GET /api/historial-vacunacion/alertas-paginadas/?limite=50&cursor=...
+        Filtros: estado (vencida,vencida_reinicio,proxima), especie, vacuna, veterinario, es_obligatoria
+        """
+        from .alertas_vacunacion import FiltroInvalido, LIMITE_DEFECTO, LIMITE_MAXIMO, filtrar_alertas, pagina, totales
+
+        params = request.query_params
+        try:
+            limite = int(params.get('limite', LIMITE_DEFECTO))
+        except (TypeError, ValueError):
+            limite = 0
+        if not 1 <= limite <= LIMITE_MAXIMO:
+            return Response({
+                'success': False,
+                'message': f'El parámetro limite debe ser un entero entre 1 y {LIMITE_MAXIMO}',
+                'error_code': 'VALIDATION_ERROR',
+                'status': 'error'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            qs = filtrar_alertas(params)
+            alertas_data, siguiente_cursor = pagina(qs, params.get('cursor'), limite)
+        except FiltroInvalido as e:
+            return Response({
+                'success': False,
+                'message': str(e),
+                'error_code': 'INVALID_CURSOR' if e.parametro == 'cursor' else 'VALIDATION_ERROR',
+                'status': 'error'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        estadisticas = totales(qs)
+        estadisticas['fecha_consulta'] = date.today().isoformat()
         return Response({
-            'total_vacunas_aplicadas': total_vacunas,
-            'vacunas_vencidas': vencidas,
-            'vacunas_proximas_30_dias': proximas_30_dias,
-            'porcentaje_cumplimiento': round((total_vacunas - vencidas) / total_vacunas * 100, 2) if total_vacunas > 0 else 0
+            'data': alertas_data,
+            'estadisticas': estadisticas,
+            'paginacion': {
+                'limite': limite,
+                'siguiente_cursor': siguiente_cursor,
+                'tiene_mas': siguiente_cursor is not None
+            },
+            'message': f'{len(alertas_data)} alertas de vacunación en esta página',
+            'status': 'success'
         })
+
+    @action(detail=False, methods=['get'], url_path='estadisticas')
+    def estadisticas(self, request):
+        """Estadísticas generales de vacunación (una consulta agregada, cacheada)"""
+        from .estadisticas import estadisticas_vacunacion
+
+        return Response(estadisticas_vacunacion())
     
     @action(detail=False, methods=['post'], url_path='aplicar-vacuna')
     def aplicar_vacuna(self, request):
@@ -2788,10 +2786,11 @@ class HistorialVacunacionViewSet(viewsets.ModelViewSet):
                     'error_code': 'INVALID_DOSIS_NUMERO',
                     'status': 'error'
                 }, status=status.HTTP_400_BAD_REQUEST)
-            if dosis_numero > vacuna.dosis_total:
+            protocolo = obtener_protocolo(vacuna)
+            if dosis_numero > protocolo.adulto.dosis_total:
                 return Response({
                     'success': False,
-                    'message': f'El número de dosis ({dosis_numero}) supera el total del protocolo ({vacuna.dosis_total}).',
+                    'message': f'El número de dosis ({dosis_numero}) supera el total del protocolo ({protocolo.adulto.dosis_total}).',
                     'error_code': 'DOSIS_EXCEEDS_PROTOCOL',
                     'status': 'error'
                 }, status=status.HTTP_400_BAD_REQUEST)
@@ -2858,7 +2857,9 @@ class HistorialVacunacionViewSet(viewsets.ModelViewSet):
                         'status': 'error'
                     }, status=status.HTTP_404_NOT_FOUND)
 
-            proxima_fecha = self.calcular_proxima_fecha(vacuna, fecha_aplicacion, dosis_numero)
+            proxima_fecha, es_dosis_final, intervalo_usado = protocolo.proxima_fecha(
+                fecha_aplicacion, dosis_numero
+            )
 
             # ✅ VALIDACIÓN DE STOCK (antes del chequeo de duplicado)
             producto = vacuna.producto_inventario
@@ -2918,10 +2919,8 @@ class HistorialVacunacionViewSet(viewsets.ModelViewSet):
 
                 serializer = self.get_serializer(data=historial_data)
                 if serializer.is_valid():
+                    # El signal descuenta 1 unidad del stock (dentro del atomic para rollback si falla)
                     historial = serializer.save()
-                    # Descontar 1 unidad del stock (dentro del atomic para rollback si falla)
-                    producto.stock -= 1
-                    producto.save()
                 else:
                     return Response({
                         'success': False,
@@ -2930,10 +2929,10 @@ class HistorialVacunacionViewSet(viewsets.ModelViewSet):
                         'status': 'error'
                     }, status=status.HTTP_400_BAD_REQUEST)
 
-            if dosis_numero < vacuna.dosis_total:
-                mensaje_usuario = f"Próxima dosis (#{dosis_numero + 1}) en {vacuna.intervalo_dosis_semanas} semanas"
+            if not es_dosis_final:
+                mensaje_usuario = f"Próxima dosis (#{dosis_numero + 1}) en {intervalo_usado}"
             else:
-                mensaje_usuario = f"Próximo refuerzo en {vacuna.frecuencia_meses} meses"
+                mensaje_usuario = f"Próximo refuerzo en {intervalo_usado}"
 
             return Response({
                 'success': True,
@@ -2945,9 +2944,9 @@ class HistorialVacunacionViewSet(viewsets.ModelViewSet):
                     'mensaje_usuario': mensaje_usuario,
                     'protocolo_info': {
                         'dosis_actual': dosis_numero,
-                        'dosis_total': vacuna.dosis_total,
-                        'es_dosis_final': dosis_numero >= vacuna.dosis_total,
-                        'intervalo_usado': f"{vacuna.intervalo_dosis_semanas} semanas" if dosis_numero < vacuna.dosis_total else f"{vacuna.frecuencia_meses} meses"
+                        'dosis_total': protocolo.adulto.dosis_total,
+                        'es_dosis_final': es_dosis_final,
+                        'intervalo_usado': intervalo_usado
                     }
                 },
                 'status': 'success'
@@ -2960,6 +2959,13 @@ class HistorialVacunacionViewSet(viewsets.ModelViewSet):
                 'error_code': 'VACCINE_NOT_FOUND',
                 'status': 'error'
             }, status=status.HTTP_404_NOT_FOUND)
+        except StockInsuficiente:
+            return Response({
+                'success': False,
+                'message': f'Sin stock disponible para "{vacuna.nombre}". Registra un nuevo lote en Inventario para continuar.',
+                'error_code': 'SIN_STOCK',
+                'status': 'error'
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             import logging, traceback
             logging.getLogger(__name__).error(f"Error en aplicar_vacuna: {traceback.format_exc()}")
@@ -2978,149 +2984,15 @@ def alertas_dashboard(request):
     URL: GET /api/dashboard/alertas-vacunacion/
     Devuelve vacunas vencidas y próximas a vencer con información completa
     """
-    from datetime import date, timedelta
-    from django.db.models import Q
+    from datetime import date
     
+    # Solo lectura: las transiciones de estado (vencida, proxima, completado y
+    # progresión multi-dosis) las aplica `python manage.py actualizar_estados_vacunacion`
     try:
-        # LIMPIEZA Y ACTUALIZACIÓN AUTOMÁTICA DE ESTADOS
-        fecha_limpieza = date.today() - timedelta(days=7)
-        fecha_hoy = date.today()
-        fecha_proxima = date.today() + timedelta(days=7)
-        
-        # 1. Limpiar alertas vencidas hace más de 1 semana
-        HistorialVacunacion.objects.filter(
-            proxima_fecha__lte=fecha_limpieza,
-            estado='vencida'
-        ).update(estado='completado')
-        
-        # 2. Actualizar estados según fechas actuales
-        # Definir límites de tiempo para clasificación
-        fecha_reinicio = date.today() - timedelta(days=180)  # 6 meses = reinicio
-        fecha_critica = date.today() + timedelta(days=7)
-
-        # PRIMERO: Marcar como vencidas normales las que pasaron su fecha (pero <180 días)
-        HistorialVacunacion.objects.filter(
-            proxima_fecha__lt=fecha_hoy,
-            proxima_fecha__gte=fecha_reinicio,
-            estado='aplicada'
-        ).update(estado='vencida')
-
-        # DESPUÉS: Marcar como vencida_reinicio las muy vencidas (>180 días) - SOBRESCRIBE vencidas normales si es necesario
-        HistorialVacunacion.objects.filter(
-            proxima_fecha__lt=fecha_reinicio,
-            estado__in=['aplicada', 'vencida']
-        ).update(estado='vencida_reinicio')
-
-        # Marcar como próximas las críticas (0-7 días) — 'critica' no es un estado válido
-        HistorialVacunacion.objects.filter(
-            proxima_fecha__lte=fecha_critica,
-            proxima_fecha__gte=fecha_hoy,
-            estado='aplicada'
-        ).exclude(
-            estado='vencida_reinicio'
-        ).update(estado='proxima')
-
-        # Marcar como próximas las que están en rango normal (8-30 días)
-        fecha_proxima_normal = date.today() + timedelta(days=30)
-        HistorialVacunacion.objects.filter(
-            proxima_fecha__lte=fecha_proxima_normal,
-            proxima_fecha__gt=fecha_critica,
-            estado='aplicada'
-        ).exclude(
-            estado='vencida_reinicio'
-        ).update(estado='proxima')
+        # 🎯 CONSULTA SIMPLE - Solo vencidas y próximas, desde la proyección (values, sin instanciar modelos)
+        from .lecturas import alertas_dashboard as leer_alertas
+        alertas_data, vencidas_count, proximas_count = leer_alertas(date.today())
 
-        # 3. PROGRESIÓN AUTOMÁTICA DE MULTI-DOSIS (FIX GIARDIA)
-        # Encontrar vacunas vencidas que necesitan pasar a la siguiente dosis
-        from dateutil.relativedelta import relativedelta
-        from django.db.models import F
-
-        vacunas_multidosis_vencidas = HistorialVacunacion.objects.filter(
-            proxima_fecha__lt=fecha_hoy,
-            estado='vencida',
-            dosis_numero__lt=F('vacuna__dosis_total')  # Dose < total required
-        ).select_related('vacuna', 'mascota', 'veterinario')
-
-        for registro_vencido in vacunas_multidosis_vencidas:
-            # Check if next dose already exists
-            siguiente_dosis_existente = HistorialVacunacion.objects.filter(
-                mascota=registro_vencido.mascota,
-                vacuna=registro_vencido.vacuna,
-                dosis_numero=registro_vencido.dosis_numero + 1
-            ).exists()
-
-            if not siguiente_dosis_existente:
-                # Create next dose record
-                siguiente_dosis = HistorialVacunacion.objects.create(
-                    mascota=registro_vencido.mascota,
-                    vacuna=registro_vencido.vacuna,
-                    fecha_aplicacion=None,  # NULL - to be applied when actually administered
-                    proxima_fecha=fecha_hoy + timedelta(weeks=registro_vencido.vacuna.intervalo_dosis_semanas),
-                    veterinario=registro_vencido.veterinario,
-                    dosis_numero=registro_vencido.dosis_numero + 1,
-                    estado='proxima',  # Next dose is pending
-                    observaciones=f'Dosis {registro_vencido.dosis_numero + 1} creada automáticamente tras vencimiento de dosis {registro_vencido.dosis_numero}'
-                )
-
-                # Mark the previous dose as completed (replaced by next dose)
-                registro_vencido.estado = 'completado'
-                registro_vencido.save()
-
-                pass  # Auto-progresión aplicada
-        
-        # 🎯 CONSULTA SIMPLE - Solo vencidas y próximas (como solicitó el usuario)
-        fecha_limite = date.today() + timedelta(days=30)  # 30 días hacia futuro
-        fecha_limite_vencidas = date.today() - timedelta(days=180)  # No más de 180 días vencidas
-
-        alertas_query = HistorialVacunacion.objects.filter(
-            proxima_fecha__gte=fecha_limite_vencidas,  # No más de 180 días vencidas
-            proxima_fecha__lte=fecha_limite  # No más de 30 días futuras
-        ).exclude(
-            estado='completado'
-        ).select_related(
-            'mascota', 'vacuna', 'mascota__responsable', 'veterinario'
-        ).order_by('proxima_fecha')
-
-        # 📊 CLASIFICACIÓN SIMPLE - Solo dos categorías
-        alertas_data = []
-        vencidas_count = 0
-        proximas_count = 0
-
-        for item in alertas_query:
-            dias_restantes = (item.proxima_fecha - date.today()).days
-
-            # 🎯 SOLO DOS ESTADOS como solicitó el usuario
-            if dias_restantes < 0:  # Vencida (pero no más de 180 días)
-                estado_alert = 'vencida'
-                vencidas_count += 1
-                prioridad = 'alta'
-                color = 'red'
-            else:  # Próxima (0-30 días)
-                estado_alert = 'proxima'
-                proximas_count += 1
-                prioridad = 'media'
-                color = 'yellow'
-            
-            alertas_data.append({
-                'id': str(item.id),
-                'mascota_id': str(item.mascota.id),
-                'mascota_nombre': item.mascota.nombreMascota,
-                'mascota_especie': item.mascota.especie,
-                'vacuna_id': str(item.vacuna.id),
-                'vacuna_nombre': item.vacuna.nombre,
-                'es_obligatoria': item.vacuna.es_obligatoria,
-                'fecha_aplicacion': item.fecha_aplicacion,
-                'proxima_fecha': item.proxima_fecha,
-                'dias_restantes': dias_restantes,
-                'estado': estado_alert,  # Estado calculado en tiempo real
-                'prioridad': prioridad,
-                'dosis_numero': item.dosis_numero,
-                'responsable_nombre': f"{item.mascota.responsable.nombres} {item.mascota.responsable.apellidos}",
-                'responsable_telefono': item.mascota.responsable.telefono,
-                'veterinario_nombre': f"{item.veterinario.trabajador.nombres} {item.veterinario.trabajador.apellidos}" if item.veterinario else None,
-                'color': color
-            })
-        
         # 📊 ESTADÍSTICAS SIMPLES - Solo dos categorías
         mascotas_con_alertas = len(set([item['mascota_id'] for item in alertas_data]))
 
@@ -3146,6 +3018,23 @@ def alertas_dashboard(request):
         }, status=500)
 
 
+# 📊 CONTADORES DEL DASHBOARD EN UNA SOLA LLAMADA
+@api_view(['GET'])
+def contadores_dashboard(request):
+    """
+    Todos los contadores del dashboard principal
+    URL: GET /api/dashboard/contadores/
+    """
+    from .estadisticas import contadores
+
+    return Response({
+        'data': contadores(),
+        'fecha_consulta': date.today().isoformat(),
+        'message': 'Contadores obtenidos exitosamente',
+        'status': 'success'
+    })
+
+
 @api_view(['GET'])
 def get_veterinario_externo(request):
     """
@@ -3209,15 +3098,13 @@ class HistorialMedicoViewSet(viewsets.ModelViewSet):
         historial = HistorialMedico.objects.filter(
             mascota__id=mascota_id
         ).order_by('-fecha')
-        serializer = self.get_serializer(historial, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, historial)
     
     @action(detail=False, methods=['get'], url_path='por-tipo/(?P<tipo>[^/.]+)')
     def por_tipo(self, request, tipo=None):
         """Obtener historiales por tipo de atención"""
         historial = HistorialMedico.objects.filter(tipo=tipo).order_by('-fecha')
-        serializer = self.get_serializer(historial, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, historial)
     
     @action(detail=False, methods=['get'], url_path='resumen-mascota/(?P<mascota_id>[^/.]+)')
     def resumen_mascota(self, request, mascota_id=None):
@@ -3289,8 +3176,7 @@ class HorarioTrabajoViewSet(viewsets.ModelViewSet):
             activo=True
         ).order_by('dia_semana')
 
-        serializer = self.get_serializer(horarios, many=True)
-        return Response(serializer.data)
+        return responder_lista(self, horarios)
 
     @action(detail=False, methods=['get'])
     def disponibilidad_semana(self, request):
@@ -3416,69 +3302,13 @@ class SlotTiempoViewSet(viewsets.ModelViewSet):
                 'error_code': 'INVALID_DATE_FORMAT'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        slots_creados = 0
-        slots_omitidos = 0
-        fecha_actual = fecha_inicio
-
-        while fecha_actual <= fecha_fin:
-            dia_semana_numero = fecha_actual.weekday()  # 0=Lunes, 6=Domingo
-
-            # Buscar horario de trabajo para este día
-            horario = HorarioTrabajo.objects.filter(
-                veterinario=veterinario,
-                dia_semana=dia_semana_numero,
-                activo=True
-            ).first()
-
-            if horario:
-                # Generar slots para este día
-                hora_actual = datetime.combine(fecha_actual, horario.hora_inicio)
-                hora_fin_dia = datetime.combine(fecha_actual, horario.hora_fin)
-
-                while hora_actual < hora_fin_dia:
-                    hora_fin_slot = hora_actual + timedelta(minutes=duracion_slot)
-
-                    # No generar slots que pasen del horario de fin
-                    if hora_fin_slot.time() > horario.hora_fin:
-                        break
-
-                    # Verificar que no coincida con horario de descanso
-                    en_descanso = False
-                    if horario.tiene_descanso and horario.hora_inicio_descanso and horario.hora_fin_descanso:
-                        if (hora_actual.time() >= horario.hora_inicio_descanso and
-                            hora_actual.time() < horario.hora_fin_descanso):
-                            en_descanso = True
-
-                    if not en_descanso:
-                        # Verificar si no existe ya este slot
-                        slot_existente = SlotTiempo.objects.filter(
-                            veterinario=veterinario,
-                            fecha=fecha_actual,
-                            hora_inicio=hora_actual.time()
-                        ).first()
-
-                        if not slot_existente:
-                            SlotTiempo.objects.create(
-                                veterinario=veterinario,
-                                fecha=fecha_actual,
-                                hora_inicio=hora_actual.time(),
-                                hora_fin=hora_fin_slot.time(),
-                                duracion_minutos=duracion_slot,
-                                disponible=True,
-                                generado_automaticamente=True
-                            )
-                            slots_creados += 1
-                        else:
-                            slots_omitidos += 1
-
-                    hora_actual = hora_fin_slot
-
-            fecha_actual += timedelta(days=1)
+        resultado = generar_slots_veterinario(veterinario, fecha_inicio, fecha_fin, duracion_slot)
 
         return Response({
             'mensaje': f'Slots generados exitosamente para {veterinario.trabajador.nombres} {veterinario.trabajador.apellidos}',
-            'slots_creados': slots_creados,
-            'slots_omitidos': slots_omitidos,
+            'slots_creados': resultado['slots_creados'],
+            'slots_omitidos': resultado['slots_omitidos'],
+            'tiempos_ms': resultado['tiempos_ms'],
             'periodo': {
                 'inicio': str(fecha_inicio),
                 'fin': str(fecha_fin)
@@ -3506,24 +3336,16 @@ class SlotTiempoViewSet(viewsets.ModelViewSet):
         """
         from datetime import date, datetime
 
-        # Liberar slots con reserva temporal expirada
-        slots_expirados = SlotTiempo.objects.filter(
-            reservado_hasta__lt=timezone.now()
-        ).exclude(reservado_hasta__isnull=True)
-
-        for slot in slots_expirados:
-            slot.reservado_hasta = None
-            slot.save()
-
         # Filtrar slots disponibles
         queryset = self.get_queryset().filter(
             disponible=True
         )
 
-        # Excluir slots reservados temporalmente
+        # Excluir slots reservados temporalmente (las reservas vencidas cuentan
+        # como libres; el barrido `liberar_reservas_expiradas` las limpia aparte)
         queryset = queryset.filter(
             Q(reservado_hasta__isnull=True) |
-            Q(reservado_hasta__lt=timezone.now())
+            Q(reservado_hasta__lte=timezone.now())
         )
 
         # Filtro por veterinario
@@ -3545,12 +3367,16 @@ class SlotTiempoViewSet(viewsets.ModelViewSet):
         if solo_futuro.lower() == 'true':
             queryset = queryset.filter(fecha__gte=date.today())
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
+        filas, paginacion = paginar(self, queryset)
+        serializer = self.get_serializer(filas, many=True)
+        respuesta = {
             'data': serializer.data,
             'total': queryset.count(),
             'status': 'success'
-        })
+        }
+        if paginacion:
+            respuesta['paginacion'] = paginacion
+        return Response(respuesta)
 
     @action(detail=True, methods=['post'], url_path='reservar-temporal')
     def reservar_temporal(self, request, pk=None):
@@ -3564,32 +3390,21 @@ class SlotTiempoViewSet(viewsets.ModelViewSet):
             "minutos": 5  // default: 5
         }
         """
-        slot = self.get_object()
-
-        # Verificar si está disponible
-        if not slot.disponible:
-            return Response({
-                'error': 'El slot no está disponible',
-                'error_code': 'SLOT_NOT_AVAILABLE'
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-        # Verificar si ya está reservado
-        if slot.esta_reservado_temporalmente():
-            return Response({
-                'error': f'El slot ya está reservado hasta {slot.reservado_hasta}',
-                'error_code': 'SLOT_ALREADY_RESERVED',
-                'reservado_hasta': slot.reservado_hasta
-            }, status=status.HTTP_409_CONFLICT)
-
-        # Reservar temporalmente
         minutos = int(request.data.get('minutos', 5))
-        slot.reservado_hasta = timezone.now() + timedelta(minutes=minutos)
-        slot.save()
+
+        # Un solo UPDATE condicional: solo un usuario puede tomar el slot
+        try:
+            reservado_hasta = reservar_slot_temporal(pk, minutos)
+        except ValidationError:
+            reservado_hasta = None
+        if reservado_hasta is None:
+            slot = self.get_object()  # 404 si no existe
+            return Response(respuesta_slot_no_disponible(slot.id), status=status.HTTP_409_CONFLICT)
 
         return Response({
             'mensaje': 'Slot reservado temporalmente',
-            'slot_id': str(slot.id),
-            'reservado_hasta': slot.reservado_hasta,
+            'slot_id': str(pk),
+            'reservado_hasta': reservado_hasta,
             'minutos_restantes': minutos,
             'status': 'success'
         }, status=status.HTTP_200_OK)
@@ -3624,14 +3439,10 @@ class SlotTiempoViewSet(viewsets.ModelViewSet):
         POST /api/slots-tiempo/liberar-expirados/
 
         Libera automáticamente todos los slots con reserva expirada
-        (Este endpoint se puede llamar desde un cron job)
+        (Este endpoint se puede llamar desde un cron job; equivale a
+        `python manage.py liberar_reservas_expiradas`)
         """
-        slots_expirados = SlotTiempo.objects.filter(
-            reservado_hasta__lt=timezone.now()
-        ).exclude(reservado_hasta__isnull=True)
-
-        count = slots_expirados.count()
-        slots_expirados.update(reservado_hasta=None)
+        count = liberar_reservas_expiradas()
 
         return Response({
             'mensaje': f'Se liberaron {count} slots con reserva expirada',
@@ -3647,46 +3458,82 @@ class SlotTiempoViewSet(viewsets.ModelViewSet):
         Obtiene slots en formato calendario visual
 
         Query params:
-        - veterinario: UUID del veterinario (requerido)
+        - veterinario: UUID del veterinario (requerido). Acepta varios
+          (?veterinario=a&veterinario=b o ?veterinario=a,b)
         - fecha: Fecha específica (YYYY-MM-DD) o default hoy
-        """
-        from datetime import date, datetime
+        - fecha_desde / fecha_hasta: Rango de fechas (máximo 31 días)
 
-        veterinario_id = request.query_params.get('veterinario')
-        if not veterinario_id:
+        Slots y citas del rango se obtienen en dos consultas y se cruzan en memoria.
+        Con un solo veterinario y un solo día se mantiene el formato original.
+        """
+        from datetime import date, datetime, timedelta
+
+        veterinario_ids = [
+            vet_id.strip()
+            for valor in request.query_params.getlist('veterinario')
+            for vet_id in valor.split(',')
+            if vet_id.strip()
+        ]
+        if not veterinario_ids:
             return Response({
                 'error': 'El parámetro veterinario es requerido',
                 'error_code': 'MISSING_VETERINARIO'
             }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            veterinario_ids = list(dict.fromkeys(str(uuid.UUID(vet_id)) for vet_id in veterinario_ids))
+        except ValueError:
+            return Response({
+                'error': 'ID de veterinario inválido',
+                'error_code': 'INVALID_VETERINARIO'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         fecha_param = request.query_params.get('fecha')
-        if fecha_param:
-            try:
-                fecha = datetime.strptime(fecha_param, '%Y-%m-%d').date()
-            except ValueError:
-                return Response({
-                    'error': 'Formato de fecha inválido. Use YYYY-MM-DD',
-                    'error_code': 'INVALID_DATE_FORMAT'
-                }, status=status.HTTP_400_BAD_REQUEST)
-        else:
-            fecha = date.today()
+        fecha_desde_param = request.query_params.get('fecha_desde') or fecha_param
+        fecha_hasta_param = request.query_params.get('fecha_hasta') or fecha_desde_param
+        try:
+            fecha_desde = datetime.strptime(fecha_desde_param, '%Y-%m-%d').date() if fecha_desde_param else date.today()
+            fecha_hasta = datetime.strptime(fecha_hasta_param, '%Y-%m-%d').date() if fecha_hasta_param else fecha_desde
+        except ValueError:
+            return Response({
+                'error': 'Formato de fecha inválido. Use YYYY-MM-DD',
+                'error_code': 'INVALID_DATE_FORMAT'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if fecha_hasta < fecha_desde:
+            return Response({
+                'error': 'fecha_hasta debe ser posterior o igual a fecha_desde',
+                'error_code': 'INVALID_DATE_RANGE'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if (fecha_hasta - fecha_desde).days > 30:
+            return Response({
+                'error': 'El rango máximo es de 31 días',
+                'error_code': 'DATE_RANGE_TOO_LARGE'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Obtener slots del día
+        # 1. Todos los slots del rango
         slots = SlotTiempo.objects.filter(
-            veterinario__id=veterinario_id,
-            fecha=fecha
-        ).order_by('hora_inicio')
+            veterinario__id__in=veterinario_ids,
+            fecha__range=(fecha_desde, fecha_hasta)
+        ).order_by('veterinario_id', 'fecha', 'hora_inicio')
+
+        # 2. Todas las citas no canceladas del rango, indexadas por (veterinario, fecha, hora)
+        citas_por_hora = {}
+        citas = Cita.objects.filter(
+            veterinario__id__in=veterinario_ids,
+            fecha__range=(fecha_desde, fecha_hasta)
+        ).exclude(
+            estado=EstadoCita.CANCELADA
+        ).select_related('mascota', 'servicio').only(
+            'id', 'veterinario_id', 'fecha', 'hora', 'estado',
+            'mascota__nombreMascota', 'servicio__nombre'
+        )
+        for cita in citas:
+            citas_por_hora.setdefault((cita.veterinario_id, cita.fecha, cita.hora), cita)
 
-        # Agrupar por estado
-        calendario_data = []
+        # Agrupar por veterinario y día
+        bloques = {}
         for slot in slots:
-            # Verificar si hay cita asociada
-            from .models import Cita
-            cita = Cita.objects.filter(
-                veterinario__id=veterinario_id,
-                fecha=fecha,
-                hora=slot.hora_inicio
-            ).exclude(estado='CANCELADA').first()
+            cita = citas_por_hora.get((slot.veterinario_id, slot.fecha, slot.hora_inicio))
 
             estado_slot = 'disponible'
             detalle = None
@@ -3710,7 +3557,7 @@ class SlotTiempoViewSet(viewsets.ModelViewSet):
                     'motivo': slot.motivo_no_disponible
                 }
 
-            calendario_data.append({
+            bloques.setdefault((str(slot.veterinario_id), slot.fecha), []).append({
                 'slot_id': str(slot.id),
                 'hora_inicio': slot.hora_inicio.strftime('%H:%M'),
                 'hora_fin': slot.hora_fin.strftime('%H:%M'),
@@ -3719,17 +3566,166 @@ class SlotTiempoViewSet(viewsets.ModelViewSet):
                 'detalle': detalle
             })
 
+        def resumen_dia(veterinario_id, fecha, calendario_data):
+            return {
+                'fecha': str(fecha),
+                'veterinario_id': veterinario_id,
+                'slots': calendario_data,
+                'total_slots': len(calendario_data),
+                'disponibles': len([s for s in calendario_data if s['estado'] == 'disponible']),
+                'ocupados': len([s for s in calendario_data if s['estado'] == 'ocupado']),
+            }
+
+        # Formato original: un veterinario, un día
+        if len(veterinario_ids) == 1 and fecha_desde == fecha_hasta:
+            calendario_data = bloques.get((veterinario_ids[0], fecha_desde), [])
+            respuesta = resumen_dia(veterinario_ids[0], fecha_desde, calendario_data)
+            respuesta['status'] = 'success'
+            return Response(respuesta)
+
+        dias = []
+        fecha_actual = fecha_desde
+        while fecha_actual <= fecha_hasta:
+            for veterinario_id in veterinario_ids:
+                dias.append(resumen_dia(
+                    veterinario_id, fecha_actual, bloques.get((veterinario_id, fecha_actual), [])
+                ))
+            fecha_actual += timedelta(days=1)
+
         return Response({
-            'fecha': str(fecha),
-            'veterinario_id': veterinario_id,
-            'slots': calendario_data,
-            'total_slots': len(calendario_data),
-            'disponibles': len([s for s in calendario_data if s['estado'] == 'disponible']),
-            'ocupados': len([s for s in calendario_data if s['estado'] == 'ocupado']),
+            'fecha_desde': str(fecha_desde),
+            'fecha_hasta': str(fecha_hasta),
+            'veterinarios': veterinario_ids,
+            'dias': dias,
+            'total_slots': sum(d['total_slots'] for d in dias),
+            'disponibles': sum(d['disponibles'] for d in dias),
+            'ocupados': sum(d['ocupados'] for d in dias),
             'status': 'success'
         })
 
 
+# 🗓️ DISPONIBILIDAD EN MEMORIA (MAPAS DE BITS)
+@api_view(['GET'])
+@permission_classes([make_permiso_api('citas')])
+def disponibilidad(request):
+    """
+    GET /api/disponibilidad/
+
+    Tramos libres por veterinario y día, calculados con el motor de mapas de
+    bits (jornada - descanso - citas) en lugar de recorrer SlotTiempo.
+
+    Query params:
+    - fecha: YYYY-MM-DD (default hoy), o fecha_desde / fecha_hasta (máximo 31 días)
+    - veterinario: uno o varios UUID (default: todos los activos con horario)
+    - especialidad: UUID para filtrar veterinarios
+    - servicio: UUID; devuelve las horas donde cabe el servicio completo
+    - duracion: minutos, alternativa a servicio
+    - hora: HH:MM; solo devuelve los veterinarios libres a esa hora
+    """
+    from datetime import datetime
+    from .disponibilidad import (
+        GRANULO_MINUTOS, obtener_mapas, intervalos_libres, huecos_servicio,
+        inicios_libres, posiciones, bloque_libre
+    )
+    from .conflictos import a_minutos, intervalo_servicio
+    from .choices import Estado
+
+    params = request.query_params
+    fecha_param = params.get('fecha')
+    fecha_desde_param = params.get('fecha_desde') or fecha_param
+    fecha_hasta_param = params.get('fecha_hasta') or fecha_desde_param
+    try:
+        fecha_desde = datetime.strptime(fecha_desde_param, '%Y-%m-%d').date() if fecha_desde_param else date.today()
+        fecha_hasta = datetime.strptime(fecha_hasta_param, '%Y-%m-%d').date() if fecha_hasta_param else fecha_desde
+        hora = datetime.strptime(params['hora'], '%H:%M').time() if params.get('hora') else None
+        duracion = int(params['duracion']) if params.get('duracion') else None
+    except ValueError:
+        return Response({
+            'error': 'Formato inválido en fecha (YYYY-MM-DD), hora (HH:MM) o duracion (minutos)',
+            'error_code': 'INVALID_PARAMETERS'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if fecha_hasta < fecha_desde or (fecha_hasta - fecha_desde).days > 30:
+        return Response({
+            'error': 'Rango de fechas inválido (máximo 31 días)',
+            'error_code': 'INVALID_DATE_RANGE'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    servicio = None
+    if params.get('servicio'):
+        try:
+            servicio = Servicio.objects.get(id=params['servicio'])
+        except (Servicio.DoesNotExist, ValidationError):
+            return Response({
+                'error': 'Servicio no encontrado',
+                'error_code': 'SERVICIO_NOT_FOUND'
+            }, status=status.HTTP_404_NOT_FOUND)
+
+    veterinarios = Veterinario.objects.select_related('trabajador').filter(
+        trabajador__estado=Estado.ACTIVO,
+        horarios_trabajo__activo=True
+    ).distinct()
+    veterinario_ids = [
+        vet_id.strip()
+        for valor in params.getlist('veterinario')
+        for vet_id in valor.split(',')
+        if vet_id.strip()
+    ]
+    try:
+        if veterinario_ids:
+            veterinarios = veterinarios.filter(id__in=veterinario_ids)
+        if params.get('especialidad'):
+            veterinarios = veterinarios.filter(especialidad_id=params['especialidad'])
+        veterinarios = {v.id: v for v in veterinarios}
+    except ValidationError:
+        return Response({
+            'error': 'ID de veterinario o especialidad inválido',
+            'error_code': 'INVALID_PARAMETERS'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    mapas = obtener_mapas(veterinarios.keys(), fecha_desde, fecha_hasta)
+
+    def formato(minutos):
+        return f'{int(minutos) // 60:02d}:{int(minutos) % 60:02d}'
+
+    resultados = []
+    for (veterinario_id, fecha), mapa in sorted(mapas.items(), key=lambda x: (x[0][1], str(x[0][0]))):
+        if hora:
+            if servicio:
+                libre = bloque_libre(mapa, *intervalo_servicio(hora, servicio))
+            else:
+                libre = bloque_libre(mapa, a_minutos(hora), a_minutos(hora) + (duracion or GRANULO_MINUTOS))
+            if not libre:
+                continue
+
+        veterinario = veterinarios[veterinario_id]
+        item = {
+            'veterinario_id': str(veterinario_id),
+            'veterinario': f'{veterinario.trabajador.nombres} {veterinario.trabajador.apellidos}',
+            'fecha': str(fecha),
+            'intervalos_libres': [
+                {'inicio': formato(inicio), 'fin': formato(fin)}
+                for inicio, fin in intervalos_libres(mapa)
+            ],
+        }
+        if servicio:
+            item['horas_disponibles'] = [formato(m) for m in huecos_servicio(mapa, servicio)]
+        elif duracion:
+            item['horas_disponibles'] = [
+                formato(p * GRANULO_MINUTOS) for p in posiciones(inicios_libres(mapa, duracion))
+            ]
+        resultados.append(item)
+
+    return Response({
+        'fecha_desde': str(fecha_desde),
+        'fecha_hasta': str(fecha_hasta),
+        'granulo_minutos': GRANULO_MINUTOS,
+        'resultados': resultados,
+        'total': len(resultados),
+        'status': 'success'
+    })
+
+
 class CitaProfesionalViewSet(viewsets.ModelViewSet):
     """
     ViewSet extendido para gestión profesional de citas
@@ -3760,27 +3756,14 @@ class CitaProfesionalViewSet(viewsets.ModelViewSet):
             from datetime import date
             fecha = date.today().strftime('%Y-%m-%d')
 
-        queryset = self.get_queryset().filter(fecha=fecha)
-        if veterinario_id:
-            queryset = queryset.filter(veterinario__id=veterinario_id)
-
-        # Organizar por veterinario
-        agenda = {}
-        for cita in queryset.order_by('veterinario', 'hora'):
-            vet_key = str(cita.veterinario.id)
-            if vet_key not in agenda:
-                agenda[vet_key] = {
-                    'veterinario': cita.veterinario.__str__(),
-                    'citas': []
-                }
-
-            serializer = self.get_serializer(cita)
-            agenda[vet_key]['citas'].append(serializer.data)
+        # Organizar por veterinario (proyección values, sin serializer por cita)
+        from .lecturas import agenda_dia as leer_agenda
+        agenda, total_citas = leer_agenda(fecha, veterinario_id)
 
         return Response({
             'fecha': fecha,
             'agenda': agenda,
-            'total_citas': queryset.count()
+            'total_citas': total_citas
         })
 
     @action(detail=False, methods=['post'])
@@ -3793,30 +3776,39 @@ class CitaProfesionalViewSet(viewsets.ModelViewSet):
         fecha = data.get('fecha')
         hora = data.get('hora')
         duracion = int(data.get('duracion_minutos', 30))
+        servicio_id = data.get('servicio')
 
         if not all([veterinario_id, fecha, hora]):
             return Response({
                 'error': 'veterinario, fecha y hora son requeridos'
             }, status=400)
 
-        from datetime import datetime, timedelta
+        from datetime import datetime
         try:
             fecha_obj = datetime.strptime(fecha, '%Y-%m-%d').date()
             hora_obj = datetime.strptime(hora, '%H:%M').time()
-            fecha_hora_inicio = datetime.combine(fecha_obj, hora_obj)
-            fecha_hora_fin = fecha_hora_inicio + timedelta(minutes=duracion)
         except ValueError as e:
             return Response({'error': f'Error en formato de fecha/hora: {e}'}, status=400)
 
-        # Buscar citas existentes que puedan generar conflicto
-        citas_conflicto = Cita.objects.filter(
-            veterinario__id=veterinario_id,
-            fecha=fecha_obj,
-            hora__range=(
-                (fecha_hora_inicio - timedelta(minutes=30)).time(),
-                (fecha_hora_fin + timedelta(minutes=30)).time()
-            )
-        ).exclude(estado='CANCELADA')
+        # Ids mal formados: 400 en vez del ValidationError del ORM al filtrar
+        excluir_cita_id = data.get('excluir_cita')
+        for campo, valor in (('veterinario', veterinario_id), ('servicio', servicio_id), ('excluir_cita', excluir_cita_id)):
+            if valor:
+                try:
+                    uuid.UUID(str(valor))
+                except ValueError:
+                    return Response({'error': f'{campo} debe ser un UUID válido'}, status=400)
+
+        # Si se indica el servicio se usa su duración completa (preparación + limpieza)
+        servicio = None
+        if servicio_id:
+            try:
+                servicio = Servicio.objects.get(id=servicio_id)
+            except Servicio.DoesNotExist:
+                return Response({'error': 'Servicio no encontrado'}, status=404)
+
+        agenda = AgendaDia(veterinario_id, fecha_obj, excluir_cita_id=excluir_cita_id)
+        citas_conflicto = agenda.conflictos(hora_obj, servicio, duracion_minutos=duracion)
 
         conflictos = []
         for cita in citas_conflicto:
@@ -3842,8 +3834,7 @@ class CitaProfesionalViewSet(viewsets.ModelViewSet):
         slots_disponibles = SlotTiempo.objects.filter(
             veterinario__id=veterinario_id,
             fecha=fecha,
-            disponible=True,
-            bloqueado=False
+            disponible=True
         ).order_by('hora_inicio')
 
         recomendaciones = []
@@ -3971,9 +3962,10 @@ def obtener_info_usuario(request):
         'is_staff': usuario.is_staff
     }
 
-    # Agregar datos del trabajador si existe
-    try:
-        trabajador = usuario.trabajador
+    # Agregar datos del trabajador si existe (trabajador y veterinario ya resueltos en la autenticación)
+    contexto = obtener_contexto(request)
+    trabajador = contexto.trabajador
+    if trabajador is not None:
         response_data['trabajador'] = {
             'id': str(trabajador.id),
             'nombres': trabajador.nombres,
@@ -3985,19 +3977,15 @@ def obtener_info_usuario(request):
         }
 
         # Si es veterinario, agregar datos adicionales
-        if usuario.rol == Rol.VETERINARIO:
-            try:
-                veterinario = Veterinario.objects.get(trabajador=trabajador)
-                response_data['veterinario'] = {
-                    'id': str(veterinario.id),
-                    'especialidad': veterinario.especialidad,
-                    'registro_profesional': veterinario.registro_profesional,
-                    'anios_experiencia': veterinario.anios_experiencia
-                }
-            except Veterinario.DoesNotExist:
-                pass
-
-    except Trabajador.DoesNotExist:
+        veterinario = contexto.veterinario
+        if usuario.rol == Rol.VETERINARIO and veterinario is not None:
+            especialidad = contexto.especialidad
+            response_data['veterinario'] = {
+                'id': str(veterinario.id),
+                'especialidad': especialidad.nombre if especialidad else None,
+                'especialidad_id': str(especialidad.id) if especialidad else None
+            }
+    else:
         response_data['trabajador'] = None
 
     return Response(response_data, status=status.HTTP_200_OK)
@@ -4109,6 +4097,8 @@ class PermisoRolViewSet(viewsets.ModelViewSet):
                 else:
                     actualizados.append(modulo)
 
+        invalidar_permisos()
+
         return Response({
             'mensaje': 'Permisos actualizados correctamente',
             'rol': rol,
@@ -4205,6 +4195,8 @@ class PermisoRolViewSet(viewsets.ModelViewSet):
                     else:
                         actualizados += 1
 
+        invalidar_permisos()
+
         return Response({
             'mensaje': 'Permisos inicializados correctamente',
             'creados': creados,
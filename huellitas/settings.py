@@ -44,11 +44,27 @@ INSTALLED_APPS = [
 ]
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT + contexto del usuario (trabajador/veterinario) en una sola consulta
+        'api.contexto.JWTAuthenticationContexto',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Paginación por cursor opcional: solo con `X-Paginacion: cursor` o `?paginar=cursor`
+    'DEFAULT_PAGINATION_CLASS': 'api.paginacion.PaginacionCursorOpcional',
+    'PAGE_SIZE': 50,
+    # ?fields= / ?omit=: poda select_related/only() según los campos pedidos
+    'DEFAULT_FILTER_BACKENDS': ['api.campos_dinamicos.PodaCamposFilter'],
+    # JSON con orjson si está instalado (misma salida que JSONRenderer/JSONParser de DRF)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.json_rapido.JSONRendererRapido',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.json_rapido.JSONParserRapido',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -57,6 +73,18 @@ SIMPLE_JWT = {
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
 }
 
+# Embebe el mapa de permisos, su versión y los ids de trabajador/veterinario en el
+# access token: make_permiso_api autoriza desde los claims sin cargar la matriz.
+# Opcional: requiere la migración 0029 (versión de permisos compartida en la BD)
+PERMISOS_EN_TOKEN = False
+
+# Cada cuántos segundos relee cada proceso la versión de permisos de la BD:
+# plazo máximo para que un cambio de PermisoRol rija en los demás workers
+PERMISOS_SEGUNDOS_VERIFICACION = 5
+
+# Máximo de `?page_size=` en la paginación por cursor
+PAGINACION_TAMANO_MAXIMO = 200
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -91,6 +119,7 @@ CORS_ALLOW_HEADERS = [
       'accept-encoding',
       'accept-language',
       'origin',
+      'x-paginacion',
   ]
 
 CORS_ALLOW_CREDENTIALS = True
@@ -130,6 +159,22 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Mapas de disponibilidad por (veterinario, fecha): 20 veterinarios x 90 días
+# superan el límite por defecto de 300 entradas de LocMemCache.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'huellitas',
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 